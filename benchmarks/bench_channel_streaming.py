@@ -0,0 +1,79 @@
+# Compares analyze_channel with json.load and with streaming on a generated channel export.
+# Each mode runs in its own interpreter so that peak RSS is measured independently.
+#
+#   python -m benchmarks.bench_channel_streaming --posts 2000000
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_export import write_channel_export
+from modules import locales
+
+MODES = ('load', 'streaming')
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def load_texts(language='en'):
+    return locales.load_texts(language)
+
+def run_child(mode, path):
+    import config
+    from modules.analyzer_channels import analyze_channel
+
+    # Neither mode may replay or write a cache, index or state of the other, nor leave them
+    # next to an export given with --file.
+    run_config = vars(config).copy()
+    run_config.update(analysis_cache=False, analysis_index=False, incremental_analysis=False)
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis_results, _ = analyze_channel(
+            path, run_config, load_texts(), use_streaming=(mode == 'streaming')
+        )
+    elapsed = time.perf_counter() - start_time
+    print(json.dumps({
+        'mode': mode,
+        'seconds': elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        'messages': analysis_results.get('total_messages', 0),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS and wall time of analyze_channel with json.load and with streaming.")
+    parser.add_argument('--posts', type=int, default=2000000)
+    parser.add_argument('--file', help='Use an existing export instead of generating one')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.file)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp_dir, 'result.json')
+            print(f"Generating {args.posts} posts...")
+            write_channel_export(path, args.posts)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"Export: {path} ({size_mb:.1f} MB)")
+        print(f"{'mode':<10} {'seconds':>10} {'peak RSS, MB':>14} {'messages':>12}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_channel_streaming', '--child', mode, '--file', path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<10} {result['seconds']:>10.2f} {result['peak_rss_mb']:>14.1f} {result['messages']:>12}")
+
+if __name__ == '__main__':
+    main()
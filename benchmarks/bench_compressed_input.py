@@ -0,0 +1,75 @@
+# Compares analyze_channel on a generated channel export stored plain and compressed with
+# gzip, bz2, xz and (if the zstandard package is installed) zstd.
+#
+#   python -m benchmarks.bench_compressed_input --posts 200000
+#   python -m benchmarks.bench_compressed_input --file result.json
+import argparse
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_channel_streaming import load_texts
+from benchmarks.synthetic_export import write_channel_export
+
+def compressors():
+    formats = [('gzip', gzip.open), ('bz2', bz2.open), ('xz', lzma.open)]
+    try:
+        import zstandard
+    except ImportError:
+        return formats
+    formats.append(('zstd', lambda path, mode: zstandard.ZstdCompressor().stream_writer(open(path, mode))))
+    return formats
+
+def compress(path, target, opener):
+    with open(path, 'rb') as source, opener(target, 'wb') as f:
+        shutil.copyfileobj(source, f, 1024 * 1024)
+
+def measure(path, config):
+    from modules.analyzer_channels import analyze_channel
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis_results, _ = analyze_channel(path, config, load_texts(), use_streaming=True)
+    return time.perf_counter() - start_time, analysis_results.get('total_messages', 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Analysis time of a plain export against its compressed copies.")
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--file', help='Use an existing export instead of generating one')
+    parser.add_argument('--repeat', type=int, default=3, help='Best of N runs per format')
+    args = parser.parse_args()
+
+    import config
+    # Only the parsing is compared: no cache, no saved state, one process.
+    run_config = vars(config).copy()
+    run_config.update(analysis_cache=False, incremental_analysis=False, analysis_workers=1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp_dir, 'result.json')
+            print(f"Generating {args.posts} posts...")
+            write_channel_export(path, args.posts)
+        files = [('plain', path)]
+        for name, opener in compressors():
+            target = os.path.join(tmp_dir, f'result.json.{name}')
+            compress(path, target, opener)
+            files.append((name, target))
+
+        print(f"{'format':<8} {'size, MB':>10} {'seconds':>10} {'vs plain':>10} {'messages':>10}")
+        plain_seconds = None
+        for name, file_path in files:
+            seconds, count = min(measure(file_path, run_config) for _ in range(args.repeat))
+            if plain_seconds is None:
+                plain_seconds = seconds
+            size_mb = os.path.getsize(file_path) / (1024 * 1024)
+            print(f"{name:<8} {size_mb:>10.1f} {seconds:>10.2f} {seconds / plain_seconds:>9.2f}x {count:>10}")
+
+if __name__ == '__main__':
+    main()
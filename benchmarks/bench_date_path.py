@@ -0,0 +1,89 @@
+# Per-message cost of the date bookkeeping of the aggregates: the named path that built weekday
+# and "month year" strings and a strftime("%Y-%m") key for every message, against the integer
+# keys (weekday(), year * 12 + month - 1) that the report names at the end.
+# Also times parsing the local "date" string against decoding "date_unixtime".
+#
+#   python -m benchmarks.bench_date_path --messages 10000000
+import argparse
+import collections
+import datetime
+import itertools
+import time
+
+import config
+
+def make_dates(count):
+    # count ISO dates one minute and a few seconds apart, as Telegram exports write them.
+    start = datetime.datetime(2019, 3, 1, 8, 0, 0)
+    dates = []
+    unix_times = []
+    for i in range(count):
+        date_time = start + datetime.timedelta(seconds=i * 67)
+        dates.append(date_time.isoformat())
+        unix_times.append(str(int(date_time.replace(tzinfo=datetime.timezone.utc).timestamp())))
+    return dates, unix_times
+
+def run_named(dates, messages, day_names, month_names, offset):
+    weekdays = collections.Counter()
+    months = collections.Counter()
+    posts_by_date = {}
+    for date in itertools.islice(itertools.cycle(dates), messages):
+        date_time = datetime.datetime.fromisoformat(date) + offset
+        weekdays[day_names[date_time.weekday()]] += 1
+        months[f"{month_names[date_time.month - 1]} {date_time.year}"] += 1
+        date_month = date_time.strftime("%Y-%m")
+        if date_month not in posts_by_date:
+            posts_by_date[date_month] = collections.Counter()
+        posts_by_date[date_month]['user'] += 1
+
+def run_keyed(dates, messages, offset):
+    weekdays = collections.Counter()
+    months = collections.Counter()
+    posts_by_date = {}
+    for date in itertools.islice(itertools.cycle(dates), messages):
+        date_time = datetime.datetime.fromisoformat(date) + offset
+        weekdays[date_time.weekday()] += 1
+        month_key = date_time.year * 12 + date_time.month - 1
+        months[month_key] += 1
+        if month_key not in posts_by_date:
+            posts_by_date[month_key] = collections.Counter()
+        posts_by_date[month_key]['user'] += 1
+
+def run_parse_iso(dates, messages):
+    for date in itertools.islice(itertools.cycle(dates), messages):
+        datetime.datetime.fromisoformat(date)
+
+def run_parse_unixtime(unix_times, messages):
+    fromtimestamp = datetime.datetime.fromtimestamp
+    utc = datetime.timezone.utc
+    for unix_time in itertools.islice(itertools.cycle(unix_times), messages):
+        fromtimestamp(int(unix_time), utc)
+
+def main():
+    parser = argparse.ArgumentParser(description="Seconds per 1M messages of the date bookkeeping, named against integer keys.")
+    parser.add_argument('--messages', type=int, default=10000000)
+    parser.add_argument('--distinct', type=int, default=1000000, help='Distinct dates, cycled up to --messages')
+    parser.add_argument('--language', default='en')
+    args = parser.parse_args()
+
+    dates, unix_times = make_dates(min(args.distinct, args.messages))
+    day_names = config.day_names.get(args.language, config.day_names['en'])
+    month_names = config.month_names.get(args.language, config.month_names['en'])
+    offset = datetime.timedelta(hours=config.time_offset)
+
+    stages = [
+        ('named keys', lambda: run_named(dates, args.messages, day_names, month_names, offset)),
+        ('integer keys', lambda: run_keyed(dates, args.messages, offset)),
+        ('fromisoformat', lambda: run_parse_iso(dates, args.messages)),
+        ('date_unixtime', lambda: run_parse_unixtime(unix_times, args.messages)),
+    ]
+    print(f"{args.messages} messages, {len(dates)} distinct dates")
+    print(f"{'stage':<14} {'seconds':>10} {'s/1M messages':>14}")
+    for name, run in stages:
+        start_time = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start_time
+        print(f"{name:<14} {seconds:>10.3f} {seconds * 1e6 / args.messages:>14.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# Measures read throughput of every available JSON backend on the same export.
+#
+#   python -m benchmarks.bench_json_backends --posts 200000
+#   python -m benchmarks.bench_json_backends --file result.json
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic_export import write_channel_export
+from modules.analyzer_common import ExportReader
+from modules.json_backend import available_backends
+
+def measure(path, backend):
+    start_time = time.perf_counter()
+    count = 0
+    with ExportReader(path, backend) as reader:
+        for _ in reader.messages():
+            count += 1
+    return time.perf_counter() - start_time, count
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of each JSON backend (MB/s and messages/s).")
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--file', help='Use an existing export instead of generating one')
+    parser.add_argument('--repeat', type=int, default=3, help='Best of N runs per backend')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp_dir, 'result.json')
+            print(f"Generating {args.posts} posts...")
+            write_channel_export(path, args.posts)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"Export: {path} ({size_mb:.1f} MB)")
+        print(f"{'backend':<12} {'seconds':>10} {'MB/s':>10} {'messages/s':>12}")
+        for backend in available_backends():
+            seconds, count = min(measure(path, backend) for _ in range(args.repeat))
+            print(f"{backend:<12} {seconds:>10.2f} {size_mb / seconds:>10.1f} {count / seconds:>12.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Per-message cost of the normalization stage (raw message -> MessageRecord) and of the counters
+# that read the records, on posts of a generated channel export already decoded into memory.
+#
+#   python -m benchmarks.bench_message_record --posts 100000
+#   python -m benchmarks.bench_message_record --file result.json
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_channel_streaming import load_texts
+from benchmarks.synthetic_export import write_channel_export
+from modules.analyzer_channels import ChannelAggregate, channel_options
+from modules.analyzer_common import ExportReader, message_counter, new_message_counts
+from modules.analyzer_utils import MESSAGE, extract_message, process_message
+
+def best_of(repeat, run):
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Microseconds per message of extract_message and the record counters.")
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--file', help='Use an existing export instead of generating one')
+    parser.add_argument('--repeat', type=int, default=5, help='Best of N runs per stage')
+    args = parser.parse_args()
+
+    import config
+    config_dict = vars(config).copy()
+    options = channel_options(config_dict, load_texts())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp_dir, 'result.json')
+            write_channel_export(path, args.posts)
+        with ExportReader(path) as reader:
+            messages = list(reader.messages())
+    records = [extract_message(message, channel=True) for message in messages]
+    text_records = [record for record in records if record.kind == MESSAGE]
+    stop_words = options['stop_words']
+
+    def run_process_message():
+        # The single-function path: every call flattens, lowercases and tokenizes on its own.
+        for message in messages:
+            if isinstance(message, dict) and message.get('type') == 'message' and 'text' in message:
+                process_message(message, config_dict, stop_words, options['profanity_words'],
+                                options['commands_identifiers'], options['emoji_pattern'])
+
+    def run_extract():
+        for message in messages:
+            extract_message(message, channel=True)
+
+    def run_count():
+        count_message = message_counter(new_message_counts(), options)
+        for record in text_records:
+            count_message(record)
+
+    def run_consume():
+        ChannelAggregate(options).consume_records(records)
+
+    stages = [
+        ('process_message', run_process_message),
+        ('extract_message', run_extract),
+        ('count_message', run_count),
+        ('consume_records', run_consume),
+    ]
+    print(f"{len(messages)} messages, {len(text_records)} with text")
+    print(f"{'stage':<16} {'seconds':>10} {'us/message':>12}")
+    for name, run in stages:
+        seconds = best_of(args.repeat, run)
+        print(f"{name:<16} {seconds:>10.3f} {seconds * 1e6 / len(messages):>12.2f}")
+
+if __name__ == '__main__':
+    main()
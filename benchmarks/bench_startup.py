@@ -0,0 +1,138 @@
+# Cold start of start.py: the time from launching the interpreter to the first menu prompt, and
+# to the end of each menu action on a small generated export. Every run is a fresh interpreter
+# in a fresh folder (so no cache or index of an earlier run helps), fed its answers on stdin as
+# a user would type them. The best of --repeat runs is reported, optionally compared against a
+# baseline saved by an earlier --save.
+#
+#   python -m benchmarks.bench_startup --save startup.json
+#   python -m benchmarks.bench_startup --baseline startup.json --repeat 10
+#
+# The times of the actions include their work on the export, which at the default 1000 messages
+# is small next to the imports. `python -X importtime start.py` shows where a slow path goes.
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_suite import export_path
+from modules.locales import available_languages, load_texts
+
+START_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'start.py')
+WORDS_DIR = os.path.join(os.path.dirname(START_PY), 'words')
+
+# name: (export copied into the folder, answers on stdin, arguments, prompt that ends the path,
+# how many times it appears by then). A prompt of None waits for the process to exit.
+PATHS = {
+    'menu': (None, '', [], 'prompt_choice', 1),
+    'language': (None, '0\n', [], 'prompt_choice', 2),
+    'analyze_group': ('private_supergroup', '1\n1\n\n', [], 'press_enter_to_return', 1),
+    'analyze_personal': ('personal_chat', '1\n1\n\n', [], 'press_enter_to_return', 1),
+    'analyze_channel': ('public_channel', '1\n1\n\n', [], 'press_enter_to_return', 1),
+    'analyze_json': ('private_supergroup', '2\n1\n\n', [], 'press_enter_to_return', 1),
+    'merge': ('parts', '3\n', [], 'press_enter_to_return', 1),
+    'batch_help': (None, '', ['--help'], None, 0),
+    'batch': ('private_supergroup', '', ['result.json', '--format', 'txt', 'json', 'plots'], None, 0),
+}
+
+def prompts(key):
+    # The prompt in every language, as start.py prints it.
+    return [load_texts(language)[key].encode('utf-8') for language in available_languages()]
+
+def run_path(name, export, timeout):
+    # Seconds from starting start.py to the end of path name, in a new folder holding export.
+    kind, answers, arguments, prompt, count = PATHS[name]
+    with tempfile.TemporaryDirectory(prefix='startup-') as folder:
+        shutil.copytree(WORDS_DIR, os.path.join(folder, 'words'))
+        if kind == 'parts':
+            for filename in os.listdir(export):
+                shutil.copy(os.path.join(export, filename), folder)
+        elif kind is not None:
+            shutil.copy(export, os.path.join(folder, 'result.json'))
+        env = dict(os.environ, PYTHONIOENCODING='utf-8', PYTHONUNBUFFERED='1')
+        markers = prompts(prompt) if prompt else []
+        start_time = time.perf_counter()
+        process = subprocess.Popen([sys.executable, START_PY] + arguments, cwd=folder, env=env,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # A run that hangs is killed, which ends its output.
+        watchdog = threading.Timer(timeout, process.kill)
+        watchdog.start()
+        try:
+            # The answers are all written up front; once they run out, input() ends the process.
+            process.stdin.write(answers.encode('utf-8'))
+            process.stdin.close()
+            output = b''
+            while True:
+                chunk = os.read(process.stdout.fileno(), 65536)
+                if chunk:
+                    output += chunk
+                    if markers and sum(output.count(marker) for marker in markers) >= count:
+                        return time.perf_counter() - start_time
+                    continue
+                process.wait()
+                if markers or process.returncode:
+                    error = process.stderr.read().decode('utf-8', 'replace').strip().splitlines()
+                    raise RuntimeError(f"start.py stopped before the end of '{name}': "
+                                       f"{error[-1] if error else 'killed after %g s' % timeout}")
+                return time.perf_counter() - start_time
+        finally:
+            watchdog.cancel()
+            process.kill()
+            process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start time of each menu path of start.py.")
+    parser.add_argument('--paths', nargs='+', choices=list(PATHS), default=list(PATHS))
+    parser.add_argument('--messages', type=int, default=1000, help='Messages of the generated exports (default: 1000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Best of N runs per path (default: 5)')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'testelestat-bench'),
+                        help='Folder for the generated exports, kept between runs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120.0, help='Seconds a single run may take')
+    parser.add_argument('--save', help='Write the results to this JSON file, to compare later runs against')
+    parser.add_argument('--baseline', help='Results saved by an earlier --save to compare against')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = {result['path']: result for result in json.load(f)['results']}
+    os.makedirs(args.data_dir, exist_ok=True)
+    exports = {kind: export_path(args.data_dir, kind, args.messages, args.seed)
+               for kind in sorted({PATHS[name][0] for name in args.paths} - {None})}
+
+    header = f"{'path':<20} {'seconds':>9}"
+    if baseline:
+        header += f" {'baseline':>9} {'speedup':>8}"
+    print(header)
+    results = []
+    for name in args.paths:
+        kind = PATHS[name][0]
+        try:
+            seconds = min(run_path(name, exports.get(kind), args.timeout) for _ in range(args.repeat))
+        except RuntimeError as e:
+            print(f"{name:<20} failed: {e}")
+            results.append({'path': name, 'error': str(e)})
+            continue
+        line = f"{name:<20} {seconds:>9.3f}"
+        previous = baseline.get(name)
+        if previous and 'seconds' in previous:
+            line += f" {previous['seconds']:>9.3f} {previous['seconds'] / seconds:>7.2f}x"
+        print(line)
+        results.append({'path': name, 'seconds': seconds})
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'messages': args.messages, 'results': results}, f, ensure_ascii=False, indent=4)
+        print(f"Results saved to '{args.save}'.")
+
+if __name__ == '__main__':
+    main()
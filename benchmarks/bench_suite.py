@@ -0,0 +1,245 @@
+# Throughput and peak memory of the main entry points on generated exports of a given size,
+# optionally compared against the results of an earlier run saved as a baseline.
+# Each measurement runs in its own interpreter, so that its peak RSS is its own. The exports
+# are generated once into --data-dir and reused by later runs.
+#
+#   python -m benchmarks.bench_suite --sizes 10k 1M --save baseline.json
+#   python -m benchmarks.bench_suite --sizes 10k 1M --baseline baseline.json
+#   python -m benchmarks.bench_suite --sizes 10M --targets analyze_messages analyze_channel
+#
+# Peak memory of generate_text_report and of the plots includes the analysis that produces
+# their input. load_json_file_streaming keeps every message in memory, so at 10M messages it
+# needs tens of GB.
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_channel_streaming import load_texts, peak_rss_mb
+from benchmarks.synthetic_export import write_export, write_export_parts
+
+# Export each target runs on.
+TARGETS = {
+    'load_json_file_streaming': 'private_supergroup',
+    'process_message': 'private_supergroup',
+    'analyze_messages': 'private_supergroup',
+    'analyze_channel': 'public_channel',
+    'merge_json_files': 'parts',
+    'generate_text_report': 'private_supergroup',
+    'generate_personal_chat_plots': 'personal_chat',
+    'generate_group_chat_plots': 'private_supergroup',
+    'generate_channel_plots': 'public_channel',
+}
+# Parts the merge_json_files export is split into.
+MERGE_PARTS = 4
+# Messages handed to process_message at a time; only the calls are timed, not the parsing.
+PROCESS_CHUNK = 10000
+
+def parse_size(text):
+    # '10k', '1M', '10M' or a plain number.
+    multipliers = {'k': 1000, 'm': 1000000}
+    try:
+        if text[-1].lower() in multipliers:
+            return int(float(text[:-1]) * multipliers[text[-1].lower()])
+        return int(text)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"expected a message count like 10k or 1M, got '{text}'")
+
+def format_size(messages):
+    if messages >= 1000000 and messages % 1000000 == 0:
+        return f'{messages // 1000000}M'
+    if messages >= 1000 and messages % 1000 == 0:
+        return f'{messages // 1000}k'
+    return str(messages)
+
+def export_path(data_dir, kind, messages, seed):
+    # Generates the export (or the folder of parts) unless an earlier run already did.
+    name = f'{kind}_{format_size(messages)}_{seed}'
+    path = os.path.join(data_dir, name if kind == 'parts' else name + '.json')
+    if os.path.exists(path):
+        return path
+    print(f"Generating {kind} export of {format_size(messages)} messages...", flush=True)
+    # Written under a temporary name, so an interrupted run does not leave half an export behind.
+    partial = path + '.partial'
+    if kind == 'parts':
+        shutil.rmtree(partial, ignore_errors=True)
+        write_export_parts(partial, MERGE_PARTS, 'private_supergroup', messages, seed=seed)
+    else:
+        write_export(partial, kind, messages, seed=seed)
+    os.replace(partial, path)
+    return path
+
+def bench_config(workers):
+    # config.py with everything that would make a later run faster than the first turned off.
+    import config
+    from modules.analyzer_common import plain_config
+    run_config = plain_config(vars(config))
+    run_config.update(analysis_cache=False, incremental_analysis=False, analysis_index=False,
+                      analysis_workers=workers, profile=False)
+    return run_config
+
+def _analyze(path, run_config, current_texts):
+    from modules.analyzer_chats import analyze_messages
+    from modules.analyzer_channels import analyze_channel
+
+    with open(path, 'rb') as f:
+        head = f.read(4096).decode('utf-8', 'ignore')
+    if '"public_channel"' in head or '"private_channel"' in head:
+        return analyze_channel(path, run_config, current_texts, use_streaming=True)[0]
+    return analyze_messages(path, run_config, current_texts, '"personal_chat"' in head, use_streaming=True)[0]
+
+def run_target(target, path, workers, messages):
+    # Runs target once on path (an export of messages messages); returns (seconds, messages
+    # processed).
+    run_config = bench_config(workers)
+    current_texts = load_texts()
+
+    if target == 'load_json_file_streaming':
+        from modules.data_loader import load_json_file_streaming
+        start_time = time.perf_counter()
+        data = load_json_file_streaming(path, backend=run_config.get('json_backend'))
+        return time.perf_counter() - start_time, len(data['messages'])
+
+    if target == 'process_message':
+        from modules.analyzer_common import ExportReader
+        from modules.analyzer_utils import process_message
+        from modules.analyzer_chats import chat_options
+        options = chat_options(run_config, current_texts, False)
+        args = (run_config, options['stop_words'], options['profanity_words'], options['commands_identifiers'],
+                options['emoji_pattern'])
+        seconds = 0.0
+        count = 0
+        with ExportReader(path, run_config.get('json_backend')) as reader:
+            stream = reader.messages()
+            while True:
+                chunk = [message for message in itertools.islice(stream, PROCESS_CHUNK)
+                         if message.get('type') == 'message' and 'text' in message]
+                if not chunk:
+                    break
+                start_time = time.perf_counter()
+                for message in chunk:
+                    process_message(message, *args)
+                seconds += time.perf_counter() - start_time
+                count += len(chunk)
+        return seconds, count
+
+    if target in ('analyze_messages', 'analyze_channel'):
+        start_time = time.perf_counter()
+        results = _analyze(path, run_config, current_texts)
+        return time.perf_counter() - start_time, results.get('total_messages', 0)
+
+    if target == 'merge_json_files':
+        from modules.data_loader import merge_json_files
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(path)) as tmp_dir:
+            output_file = os.path.join(tmp_dir, 'merged.json')
+            start_time = time.perf_counter()
+            if not merge_json_files(path, output_file, current_texts, run_config.get('json_backend'), workers):
+                raise RuntimeError('merge_json_files failed')
+            seconds = time.perf_counter() - start_time
+        return seconds, messages
+
+    results = _analyze(path, run_config, current_texts)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start_time = time.perf_counter()
+        if target == 'generate_text_report':
+            from modules.report_generator import generate_text_report
+            generate_text_report(results, run_config, current_texts, os.path.join(tmp_dir, 'report.txt'), '', '',
+                                 is_personal_chat=False)
+        else:
+            from modules import visualization
+            getattr(visualization, target)(results, os.path.join(tmp_dir, 'plot_<year>.png'), run_config, current_texts)
+        seconds = time.perf_counter() - start_time
+    return seconds, results.get('total_messages', 0)
+
+def run_child(target, path, workers, repeat, messages):
+    # Best of repeat runs; prints the result as the last line of output.
+    best = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            seconds, processed = run_target(target, path, workers, messages)
+            best = seconds if best is None else min(best, seconds)
+    print(json.dumps({'seconds': best, 'messages': processed, 'peak_rss_mb': peak_rss_mb()}))
+
+def measure(target, path, workers, repeat, messages):
+    process = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_suite', '--child', target, '--file', path,
+         '--workers', str(workers), '--repeat', str(repeat), '--messages', str(messages)],
+        capture_output=True, text=True
+    )
+    if process.returncode:
+        return {'error': (process.stderr.strip().splitlines() or ['exit status %d' % process.returncode])[-1]}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def load_baseline(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    return {(result['target'], result['size']): result for result in saved['results']}
+
+def comparison(result, baseline):
+    # "  0.93x    +12%": throughput relative to the baseline and change of peak memory.
+    if baseline is None or 'error' in baseline or 'error' in result:
+        return ''
+    speed = result['messages_per_second'] / baseline['messages_per_second'] if baseline['messages_per_second'] else 0
+    memory = result['peak_rss_mb'] / baseline['peak_rss_mb'] - 1 if baseline['peak_rss_mb'] else 0
+    return f"{speed:>7.2f}x {memory:>+7.0%}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and peak memory of the analysis entry points on generated exports.")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[10000],
+                        help='Messages per export, e.g. 10k 1M 10M (default: 10k)')
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'testelestat-bench'),
+                        help='Folder for the generated exports, kept between runs')
+    parser.add_argument('--workers', type=int, default=1, help='analysis_workers of the analysis (default: 1)')
+    parser.add_argument('--repeat', type=int, default=1, help='Best of N runs per measurement')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='Write the results to this JSON file, to compare later runs against')
+    parser.add_argument('--baseline', help='Results saved by an earlier --save to compare against')
+    parser.add_argument('--child', choices=list(TARGETS), help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    parser.add_argument('--messages', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.file, args.workers, args.repeat, args.messages)
+        return
+
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    header = f"{'target':<30} {'size':>6} {'seconds':>10} {'messages/s':>12} {'peak RSS, MB':>13}"
+    if baseline:
+        header += f" {'speed':>8} {'memory':>7}"
+    for messages in args.sizes:
+        size = format_size(messages)
+        paths = {kind: export_path(args.data_dir, kind, messages, args.seed)
+                 for kind in sorted({TARGETS[target] for target in args.targets})}
+        print(header)
+        for target in args.targets:
+            result = measure(target, paths[TARGETS[target]], args.workers, args.repeat, messages)
+            result.update(target=target, size=size)
+            if 'error' in result:
+                print(f"{target:<30} {size:>6} failed: {result['error']}")
+            else:
+                result['messages_per_second'] = result['messages'] / result['seconds'] if result['seconds'] else 0
+                print(f"{target:<30} {size:>6} {result['seconds']:>10.2f} {result['messages_per_second']:>12.0f} "
+                      f"{result['peak_rss_mb']:>13.1f} {comparison(result, baseline.get((target, size)))}".rstrip())
+            results.append(result)
+        print()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'results': results}, f, ensure_ascii=False, indent=4)
+        print(f"Results saved to '{args.save}'.")
+
+if __name__ == '__main__':
+    main()
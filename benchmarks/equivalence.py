@@ -0,0 +1,380 @@
+# Differential check of the analysis engines: every engine runs on the same exports and each
+# field of its analysis_results (and error_info) is diffed against the reference, the json.load
+# path of analyze_messages / analyze_channel with no cache, state, index or workers.
+# The exports are generated edge cases (missing and broken dates, null messages, list-form
+# text, bots, date ranges, time offsets, empty chats), or a real export given with --file.
+# Approximate counting is checked against the bound it reports instead of for equality.
+# Before the cases, the 'bulk' decoder reads top-level numbers and escaped strings in blocks of 1
+# to 32 bytes, so that they are cut at every position by the end of a block, and has to give up on
+# a broken message without reading the rest of the export.
+#
+#   python -m benchmarks.equivalence --cases 30
+#   python -m benchmarks.equivalence --engines parallel cached --messages 20000
+#   python -m benchmarks.equivalence --file result.json
+#
+# modules/analyzer.py is not a reference: nothing uses it any more and it predates the
+# aggregates (weekday names as keys, no top posts...), so it differs by design.
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+from collections.abc import Mapping
+
+import numpy as np
+
+from benchmarks.bench_channel_streaming import load_texts
+from benchmarks.synthetic_export import CHANNEL_TYPES, export_messages
+from modules import analyzer_parallel, json_backend
+from modules.analyzer_channels import analyze_channel
+from modules.analyzer_chats import analyze_messages
+from modules.analyzer_common import ExportReader, plain_config
+from modules.json_backend import available_backends
+
+CHAT_TYPES = ('personal_chat', 'private_group', 'private_supergroup', 'public_channel')
+# Share of the export the incremental engine analyzes before the rest is appended.
+INCREMENTAL_PREFIX = 0.6
+# Differences printed per engine and case.
+MAX_DIFFS = 10
+
+def reference_config():
+    import config
+    run_config = plain_config(vars(config))
+    run_config.update(analysis_cache=False, incremental_analysis=False, analysis_index=False, analysis_workers=1,
+                      token_counting='exact', profile=False)
+    return run_config
+
+def analyze(path, case, run_config, use_streaming=True):
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case['chat_type'] in CHANNEL_TYPES:
+            return analyze_channel(path, run_config, case['texts'], start_date=case['start_date'],
+                                   end_date=case['end_date'], use_streaming=use_streaming)
+        return analyze_messages(path, run_config, case['texts'], case['chat_type'] == 'personal_chat',
+                                use_streaming=use_streaming, start_date=case['start_date'], end_date=case['end_date'])
+
+def write_json_export(path, header, messages):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(header, messages=messages), f, ensure_ascii=False, indent=1)
+
+def _copy(case, name):
+    # The export in a folder of its own, for engines that write files next to it.
+    folder = os.path.join(case['work_dir'], name)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'result.json')
+    shutil.copyfile(case['path'], path)
+    return path
+
+# Engines: each returns (analysis_results, error_info) for the case.
+
+def run_reference(case, run_config):
+    return analyze(case['path'], case, run_config, use_streaming=False)
+
+def streaming_engine(backend):
+    def run(case, run_config):
+        return analyze(case['path'], case, dict(run_config, json_backend=backend))
+    return run
+
+def run_parallel(case, run_config):
+    # The size thresholds are lowered so that even a small export is cut into several chunks.
+    saved = analyzer_parallel.PARALLEL_MIN_SIZE, analyzer_parallel.CHUNK_MIN_SIZE
+    analyzer_parallel.PARALLEL_MIN_SIZE = 0
+    analyzer_parallel.CHUNK_MIN_SIZE = 16 * 1024
+    try:
+        return analyze(case['path'], case, dict(run_config, analysis_workers=4))
+    finally:
+        analyzer_parallel.PARALLEL_MIN_SIZE, analyzer_parallel.CHUNK_MIN_SIZE = saved
+
+def run_cached(case, run_config):
+    # A run without a range builds the cache, the run with the range reads it. Without a range
+    # both runs are the same and must match.
+    path = _copy(case, 'cached')
+    cached_config = dict(run_config, analysis_cache=True)
+    first = analyze(path, dict(case, start_date=None, end_date=None), cached_config)
+    second = analyze(path, case, cached_config)
+    if case['start_date'] is None and _diffs(first, second, {}):
+        raise AssertionError('the run that read the cache differs from the run that built it')
+    return second
+
+def run_incremental(case, run_config):
+    # Analyzes a prefix of the export, then the whole export from the saved state.
+    path = os.path.join(case['work_dir'], 'incremental', 'result.json')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    incremental_config = dict(run_config, incremental_analysis=True)
+    messages = case['messages']
+    write_json_export(path, case['header'], messages[:int(len(messages) * INCREMENTAL_PREFIX)])
+    analyze(path, case, incremental_config)
+    write_json_export(path, case['header'], messages)
+    return analyze(path, case, incremental_config)
+
+def run_indexed(case, run_config):
+    # A run without a range builds the index, the run with the range reads only its part.
+    path = _copy(case, 'indexed')
+    indexed_config = dict(run_config, analysis_index=True)
+    analyze(path, dict(case, start_date=None, end_date=None), indexed_config)
+    return analyze(path, case, indexed_config)
+
+def run_approximate(case, run_config):
+    # The smallest summary token_capacity allows: the size of the top lists.
+    return analyze(case['path'], case, dict(run_config, token_counting='approximate', approximate_counting_capacity=0))
+
+def engines():
+    found = {'streaming_' + backend: streaming_engine(backend) for backend in available_backends()}
+    found.update(parallel=run_parallel, cached=run_cached, incremental=run_incremental, indexed=run_indexed,
+                 approximate=run_approximate)
+    return found
+
+def normalize(value):
+    # Plain Python values of a result field: mappings (Counter, DailySeries, named views...)
+    # become dicts, tuples lists and NumPy scalars numbers.
+    if isinstance(value, Mapping):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return normalize(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def diff(a, b, path):
+    # Yields 'path: a != b' for every difference of two normalized values.
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in a.keys() | b.keys():
+            if key not in b:
+                yield f"{path}[{key!r}]: {a[key]!r} missing"
+            elif key not in a:
+                yield f"{path}[{key!r}]: unexpected {b[key]!r}"
+            else:
+                yield from diff(a[key], b[key], f"{path}[{key!r}]")
+    elif isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+        for i, (x, y) in enumerate(zip(a, b)):
+            yield from diff(x, y, f"{path}[{i}]")
+    elif isinstance(a, float) or isinstance(b, float):
+        if not (isinstance(a, (int, float)) and isinstance(b, (int, float)) and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)):
+            yield f"{path}: {a!r} != {b!r}"
+    elif a != b or type(a) is not type(b):
+        yield f"{path}: {a!r} != {b!r}"
+
+def within_error(field, error_field):
+    # Tolerance of a top list counted approximately: every count is at most error_field below
+    # the exact one and never above it, and every token whose exact count keeps it above the
+    # last approximate count even after the error is in the list.
+    def check(reference, results):
+        exact = dict(reference.get(field, []))
+        approximate = results.get(field, [])
+        error = results.get(error_field, 0)
+        lowest_exact = min(exact.values(), default=0)
+        lowest = approximate[-1][1] if approximate else 0
+        for token, count in approximate:
+            if token in exact:
+                if not exact[token] - error <= count <= exact[token]:
+                    yield f"{field}[{token!r}]: {count} not within {error} below {exact[token]}"
+            elif count > lowest_exact:
+                yield f"{field}[{token!r}]: {count} above every count missing from the exact list"
+        listed = {token for token, _ in approximate}
+        for token, count in exact.items():
+            if token not in listed and count - error > lowest:
+                yield f"{field}[{token!r}]: missing although {count} - {error} > {lowest}"
+    return check
+
+# Fields checked by a tolerance instead of for equality, per engine.
+TOLERANCES = {
+    'approximate': {
+        'common_words': within_error('common_words', 'common_words_error'),
+        'common_phrases': within_error('common_phrases', 'common_phrases_error'),
+        'common_words_error': None,
+        'common_phrases_error': None,
+    },
+}
+
+def _diffs(reference, outcome, tolerances):
+    (reference_results, reference_errors), (results, errors) = reference, outcome
+    found = []
+    a, b = normalize(reference_results), normalize(results)
+    for field in sorted(a.keys() | b.keys()):
+        if field in tolerances:
+            if tolerances[field] is not None:
+                found.extend(tolerances[field](a, b))
+        elif field not in b:
+            found.append(f"{field}: missing")
+        elif field not in a:
+            found.append(f"{field}: unexpected")
+        else:
+            found.extend(diff(a[field], b[field], field))
+    found.extend(diff(normalize(reference_errors), normalize(errors), 'error_info'))
+    return found
+
+def message_dates(messages):
+    # Dates of the messages that have a valid one, in export order.
+    dates = []
+    for message in messages:
+        try:
+            dates.append(datetime.datetime.fromisoformat(message['date']).replace(tzinfo=None))
+        except (TypeError, KeyError, ValueError):
+            pass
+    return dates
+
+def edge_case(rng, messages):
+    # A random export with the awkward parts of real ones, and the settings to analyze it with.
+    chat_type = rng.choice(CHAT_TYPES)
+    count = rng.choice([0, 1, rng.randint(2, 50), messages, messages])
+    generated = list(export_messages(
+        chat_type, count, participants=rng.choice([2, 5, 30]), text_median_words=rng.choice([1, 6, 30]),
+        russian_share=rng.random(), reaction_share=rng.random(), forward_share=rng.random() * 0.3,
+        reply_share=rng.random() * 0.5, service_share=rng.choice([0.0, 0.05, 1.0]),
+        link_share=rng.choice([0.0, 0.3, 1.0]), command_share=rng.random() * 0.1,
+        days=rng.choice([1, 90, 2000]), seed=rng.randrange(1 << 30)))
+    for message in generated:
+        roll = rng.random()
+        if roll < 0.01:
+            del message['date']
+        elif roll < 0.02:
+            message['date'] = 'not a date'
+        elif roll < 0.025:
+            message['text'] = None
+        elif roll < 0.03:
+            del message['text']
+        elif roll < 0.035 and chat_type not in CHANNEL_TYPES:
+            message['from'] = None
+    if generated and rng.random() < 0.3:
+        # Null items, as broken exports have them.
+        for _ in range(rng.randint(1, 3)):
+            generated.insert(rng.randrange(len(generated) + 1), None)
+    settings = {'exclude_bots': rng.random() < 0.7, 'time_offset': rng.choice([0, 0, 3, -5])}
+    start_date = end_date = None
+    dated = message_dates(generated)
+    if dated and rng.random() < 0.5:
+        first, last = dated[0], dated[-1]
+        start_date = first + (last - first) * rng.uniform(-0.1, 0.6)
+        end_date = start_date + (last - first) * rng.uniform(0, 0.6)
+        start_date, end_date = [datetime.datetime(d.year, d.month, d.day) for d in (start_date, end_date)]
+    header = {'name': f'Edge case {chat_type}', 'type': chat_type, 'id': 1000000001}
+    return header, generated, settings, start_date, end_date
+
+def describe(case, settings):
+    dates = ''
+    if case['start_date']:
+        dates = f", {case['start_date']:%d.%m.%Y}-{case['end_date']:%d.%m.%Y}"
+    extra = ''.join(f", {key}={value}" for key, value in sorted(settings.items()))
+    return f"{case['chat_type']}, {len(case['messages'])} messages{dates}{extra}"
+
+# Top-level values the 'bulk' decoder reads itself, numbers of every form and escaped strings among them.
+CUT_VALUES_EXPORT = {'name': 'Values', 'type': 'public_channel', 'id': 1234567890, 'ratio': -12.75, 'large': 1e300,
+                     'small': -0.5e-3, 'exponent': 25E+10, 'flag': True,
+                     'messages': [17, -3.5, 1.25e-2, 0, None, {'id': 1, 'views': 2.5}, 6E3, float('-inf'),
+                                  {'text': 'quote " backslash \\ tab \t é \U0001F600'}, 'end']}
+
+def check_cut_values():
+    # Returns the block sizes at which BulkStream decodes CUT_VALUES_EXPORT differently from json.loads.
+    raw = json.dumps(CUT_VALUES_EXPORT).encode('utf-8')
+    expected = [message for message in CUT_VALUES_EXPORT['messages'] if message is not None]
+    failed = []
+    for read_size in range(1, 33):
+        stream = json_backend.BulkStream(io.BytesIO(raw))
+        stream._read_size = read_size
+        header = {}
+        try:
+            stream.read_header(header)
+            messages = list(stream.messages(header))
+        except ValueError:
+            failed.append(read_size)
+            continue
+        if messages != expected or header.get('id') != CUT_VALUES_EXPORT['id']:
+            failed.append(read_size)
+    return failed
+
+def check_broken_message():
+    # Whether BulkStream fails on a broken message within a few blocks of it, instead of reading on
+    # in the hope that more data completes it.
+    messages = [{'id': number, 'text': 'text ' * 20} for number in range(2000)]
+    raw = json.dumps({'name': 'Broken', 'messages': messages}).encode('utf-8')
+    broken_at = raw.index(b'"id": 10,')
+    raw = raw[:broken_at] + b'#' + raw[broken_at + 1:]
+    f = io.BytesIO(raw)
+    stream = json_backend.BulkStream(f)
+    stream._read_size = 1024
+    header = {}
+    try:
+        stream.read_header(header)
+        for _ in stream.messages(header):
+            pass
+    except ValueError:
+        return f.tell() <= broken_at + 4 * stream._read_size
+    return False
+
+def check_case(case, settings, selected):
+    # Runs the selected engines on the case; returns {engine: [differences]}.
+    run_config = reference_config()
+    run_config.update(settings)
+    reference = run_reference(case, run_config)
+    report = {}
+    for name, engine in selected.items():
+        try:
+            outcome = engine(case, run_config)
+        except Exception as e:
+            report[name] = [f"raised {type(e).__name__}: {e}"]
+            continue
+        report[name] = _diffs(reference, outcome, TOLERANCES.get(name, {}))
+    return report
+
+def main():
+    available = engines()
+    parser = argparse.ArgumentParser(description="Diffs the results of every analysis engine against the reference one.")
+    parser.add_argument('--cases', type=int, default=20, help='Random edge-case exports to check (default: 20)')
+    parser.add_argument('--messages', type=int, default=3000, help='Messages of the larger generated exports')
+    parser.add_argument('--engines', nargs='+', choices=list(available), default=list(available))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--file', help='Check this export (without and with a date range) instead of generated ones')
+    args = parser.parse_args()
+
+    selected = {name: available[name] for name in args.engines}
+    texts = load_texts()
+    rng = random.Random(args.seed)
+    failed = 0
+    if 'bulk' in available_backends():
+        cut = check_cut_values()
+        print(f"values cut by a block end: {'FAILED at block sizes ' + str(cut) if cut else 'ok'}", flush=True)
+        broken = check_broken_message()
+        print(f"broken message: {'ok' if broken else 'FAILED, read on past it'}", flush=True)
+        failed += bool(cut) + (not broken)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.file:
+            with ExportReader(args.file) as reader:
+                header = dict(reader.complete_header())
+                messages = list(reader.messages())
+            header.pop('messages', None)
+            inputs = [(header, messages, {}, None, None)]
+            dated = message_dates(messages)
+            if len(dated) > 1:
+                # The middle third of the chat's time span.
+                first, last = min(dated), max(dated)
+                inputs.append((header, messages, {}, first + (last - first) / 3, first + (last - first) * 2 / 3))
+        else:
+            inputs = (edge_case(rng, args.messages) for _ in range(args.cases))
+        for number, (header, messages, settings, start_date, end_date) in enumerate(inputs, 1):
+            work_dir = os.path.join(tmp_dir, f'case{number}')
+            os.makedirs(work_dir)
+            case = {'path': os.path.join(work_dir, 'result.json'), 'work_dir': work_dir, 'header': header,
+                    'messages': messages, 'chat_type': header.get('type', 'group'), 'texts': texts,
+                    'start_date': start_date, 'end_date': end_date}
+            write_json_export(case['path'], header, messages)
+            report = check_case(case, settings, selected)
+            bad = {name: found for name, found in report.items() if found}
+            print(f"case {number}: {describe(case, settings)}: {'FAILED' if bad else 'ok'}", flush=True)
+            for name, found in bad.items():
+                print(f"  {name}: {len(found)} difference(s)")
+                for line in found[:MAX_DIFFS]:
+                    print(f"    {line}")
+            failed += bool(bad)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"{failed} case(s) with differences" if failed else "All engines match the reference.")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
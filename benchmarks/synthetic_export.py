@@ -0,0 +1,231 @@
+import bisect
+import collections
+import datetime
+import itertools
+import json
+import math
+import os
+import random
+
+WORDS_RU = ['привет', 'канал', 'новости', 'сегодня', 'завтра', 'работа', 'проект', 'код', 'релиз', 'обновление',
+            'пост', 'вопрос', 'ответ', 'время', 'день', 'неделя', 'город', 'люди', 'идея', 'статья']
+WORDS_EN = ['hello', 'channel', 'news', 'today', 'release', 'update', 'project', 'code', 'python', 'telegram',
+            'post', 'question', 'answer', 'time', 'week', 'people', 'idea', 'article', 'data', 'stats']
+REACTION_EMOJIS = ['👍', '❤', '🔥', '😁', '🤔', '👏']
+
+def _post(rng, message_id, date_time, authors):
+    words = [rng.choice(WORDS_RU if rng.random() < 0.6 else WORDS_EN) for _ in range(rng.randint(3, 40))]
+    text = ' '.join(words)
+    message = {
+        'id': message_id,
+        'type': 'message',
+        'date': date_time.isoformat(),
+        'date_unixtime': str(int(date_time.replace(tzinfo=datetime.timezone.utc).timestamp())),
+        'from': 'Synthetic Channel',
+        'from_id': 'channel1000000001',
+        'author': rng.choice(authors),
+        'text': text,
+        'text_entities': [{'type': 'plain', 'text': text}],
+    }
+    if rng.random() < 0.3:
+        message['photo'] = f'photos/photo_{message_id}.jpg'
+        message['width'] = 1280
+        message['height'] = 720
+    if rng.random() < 0.6:
+        message['reactions'] = [
+            {'type': 'emoji', 'count': rng.randint(1, 200), 'emoji': emoji, 'recent': []}
+            for emoji in rng.sample(REACTION_EMOJIS, rng.randint(1, 3))
+        ]
+    return message
+
+def write_channel_export(path, posts, seed=0):
+    # Writes a public channel export with the given number of posts.
+    # Posts are serialized one at a time, so generating millions of them needs no memory.
+    rng = random.Random(seed)
+    authors = [f'Author {i}' for i in range(1, 6)]
+    date_time = datetime.datetime(2015, 1, 1, 9, 0, 0)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n "name": "Synthetic Channel",\n "type": "public_channel",\n "id": 1000000001,\n "messages": [\n')
+        for message_id in range(1, posts + 1):
+            date_time += datetime.timedelta(seconds=rng.randint(60, 7200))
+            if message_id > 1:
+                f.write(',\n')
+            f.write(json.dumps(_post(rng, message_id, date_time, authors), ensure_ascii=False))
+        f.write('\n ]\n}\n')
+
+
+# Exports of any chat type for the benchmark suite. Everything that shapes the work of the
+# analysis can be tuned; the defaults are close to an active group chat.
+CHAT_NAMES = {'personal_chat': 'Synthetic Friend', 'private_group': 'Synthetic Group',
+              'private_supergroup': 'Synthetic Supergroup', 'public_channel': 'Synthetic Channel',
+              'private_channel': 'Synthetic Channel'}
+CHANNEL_TYPES = ('public_channel', 'private_channel')
+FIRST_NAMES = ['Анна', 'Иван', 'Мария', 'Дмитрий', 'Ольга', 'Сергей', 'Alice', 'Bob', 'Carol', 'Dave', 'Eve', 'Frank']
+LINKS = ['https://github.com/TheTeslak/TesTeleStat', 'https://t.me/tesla_tech', 'https://example.com/article',
+         'https://www.youtube.com/watch?v=dQw4w9WgXcQ']
+SERVICE_ACTIONS = {'personal_chat': ['phone_call', 'pin_message'],
+                   'channel': ['pin_message', 'edit_chat_photo', 'create_channel'],
+                   'group': ['invite_members', 'remove_members', 'join_group_by_link', 'pin_message', 'edit_group_title']}
+# Share of messages with each kind of media; the rest are text only.
+DEFAULT_MEDIA_MIX = {'photo': 0.08, 'sticker': 0.06, 'animation': 0.02, 'video_file': 0.02, 'video_message': 0.01,
+                     'voice_message': 0.03, 'audio_file': 0.005, 'document': 0.01, 'poll': 0.002}
+MEDIA_FILES = {'sticker': ('stickers/sticker.webp', 'image/webp'), 'animation': ('video_files/anim.gif.mp4', 'video/mp4'),
+               'video_file': ('video_files/video.mp4', 'video/mp4'), 'video_message': ('round_video_messages/round.mp4', 'video/mp4'),
+               'voice_message': ('voice_messages/audio.ogg', 'audio/ogg'), 'audio_file': ('files/track.mp3', 'audio/mpeg'),
+               'document': ('files/report.pdf', 'application/pdf')}
+
+def _participants(chat_type, count):
+    # (name, from_id) of each participant; a channel posts as itself and only signs with names.
+    count = 2 if chat_type == 'personal_chat' else max(1, count)
+    people = []
+    for i in range(count):
+        name = FIRST_NAMES[i % len(FIRST_NAMES)]
+        if i >= len(FIRST_NAMES):
+            name = f'{name} {i // len(FIRST_NAMES)}'
+        people.append((name, f'user{100000 + i}'))
+    if chat_type not in CHANNEL_TYPES and count > 3:
+        # A bot answering commands, as most groups have one.
+        people[-1] = ('Synthetic Helper Bot', f'user{100000 + count - 1}')
+    return people
+
+def _text(rng, words, russian_share, text_median_words, text_sigma, link_share, mention_names):
+    # Message text as Telegram writes it: a plain string, or a list of parts when it has entities.
+    # Word counts follow a log-normal distribution: mostly short messages and a long tail.
+    count = min(500, int(rng.lognormvariate(math.log(text_median_words), text_sigma)))
+    language = WORDS_RU if rng.random() < russian_share else WORDS_EN
+    text = ' '.join(rng.choice(language if rng.random() < 0.85 else words) for _ in range(count))
+    if rng.random() < 0.05:
+        text = f'{text} 😀' if text else '👍'
+    if rng.random() < link_share:
+        link = rng.choice(LINKS)
+        mention = f'@{rng.choice(mention_names)}'
+        parts = [text + ' ', {'type': 'link', 'text': link}, ' ', {'type': 'mention', 'text': mention}]
+        entities = [{'type': 'plain', 'text': text + ' '}, {'type': 'link', 'text': link},
+                    {'type': 'plain', 'text': ' '}, {'type': 'mention', 'text': mention}]
+        return parts, entities
+    return text, [{'type': 'plain', 'text': text}] if text else []
+
+def export_messages(chat_type='private_supergroup', messages=10000, participants=20, text_median_words=6,
+                    text_sigma=1.0, russian_share=0.6, media_mix=None, reaction_share=0.2, forward_share=0.05,
+                    reply_share=0.15, service_share=0.02, link_share=0.05, command_share=0.01, days=1095, seed=0):
+    # Yields the messages of a synthetic export one at a time. Participants post with a Zipf-like
+    # activity (the first one most), the messages are spread over about days days with quiet
+    # nights, and the ids are consecutive from 1.
+    rng = random.Random(seed)
+    channel = chat_type in CHANNEL_TYPES
+    people = _participants(chat_type, participants)
+    weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(people) + 1)))
+    media = sorted((media_mix if media_mix is not None else DEFAULT_MEDIA_MIX).items())
+    media_weights = list(itertools.accumulate(share for _, share in media))
+    actions = SERVICE_ACTIONS['personal_chat' if chat_type == 'personal_chat' else 'channel' if channel else 'group']
+    # Words beyond the base lists, so that the top-word counters see a realistic vocabulary.
+    # They are made of letters only, as the tokenizer drops words with digits.
+    words = [first + second[:3] for first in WORDS_RU + WORDS_EN for second in WORDS_RU + WORDS_EN]
+    mention_names = [f'user_{i}' for i in range(50)]
+    chat_name = CHAT_NAMES.get(chat_type, 'Synthetic Chat')
+    date_time = datetime.datetime(2015, 1, 1, 9, 0, 0)
+    # Nights are skipped, so the mean gap is that of 16 hours a day.
+    gap = days * 16 * 3600 / max(1, messages)
+    for message_id in range(1, messages + 1):
+        date_time += datetime.timedelta(seconds=int(rng.expovariate(1 / gap)) + 1)
+        if date_time.hour < 8:
+            date_time = date_time.replace(hour=8)
+        name, from_id = rng.choices(people, cum_weights=weights)[0]
+        message = {
+            'id': message_id,
+            'type': 'message',
+            'date': date_time.isoformat(),
+            'date_unixtime': str(int(date_time.replace(tzinfo=datetime.timezone.utc).timestamp())),
+        }
+        if rng.random() < service_share:
+            message['type'] = 'service'
+            message['actor'] = chat_name if channel else name
+            message['actor_id'] = 'channel1000000001' if channel else from_id
+            message['action'] = rng.choice(actions)
+            message['text'] = ''
+            message['text_entities'] = []
+            yield message
+            continue
+        if channel:
+            message['from'] = chat_name
+            message['from_id'] = 'channel1000000001'
+            if rng.random() < 0.7:
+                message['author'] = name
+        else:
+            message['from'] = name
+            message['from_id'] = from_id
+        if rng.random() < forward_share:
+            message['forwarded_from'] = rng.choice(FIRST_NAMES + ['Synthetic News'])
+        if rng.random() < reply_share and message_id > 1:
+            message['reply_to_message_id'] = max(1, message_id - int(rng.expovariate(1 / 5)) - 1)
+        kind = None
+        point = rng.random()
+        if media_weights and point < media_weights[-1]:
+            kind = media[bisect.bisect_right(media_weights, point)][0]
+        if kind == 'photo':
+            message['photo'] = f'photos/photo_{message_id}.jpg'
+            message['width'] = 1280
+            message['height'] = 720
+        elif kind == 'poll':
+            message['poll'] = {'question': 'Когда встречаемся?', 'closed': False, 'total_voters': 3,
+                               'answers': [{'text': 'Сегодня', 'voters': 2, 'chosen': False},
+                                           {'text': 'Завтра', 'voters': 1, 'chosen': False}]}
+        elif kind is not None:
+            message['file'], message['mime_type'] = MEDIA_FILES[kind]
+            message['media_type'] = kind
+            if kind == 'sticker':
+                message['sticker_emoji'] = '😁'
+        if kind in ('sticker', 'voice_message', 'video_message', 'poll'):
+            text, entities = '', []
+        elif kind is not None and rng.random() < 0.6:
+            # Most media go without a caption.
+            text, entities = '', []
+        elif rng.random() < command_share:
+            text = rng.choice(['/start', '/help', '/stats', '!rules'])
+            entities = [{'type': 'bot_command', 'text': text}]
+        else:
+            text, entities = _text(rng, words, russian_share, text_median_words, text_sigma, link_share, mention_names)
+        message['text'] = text
+        message['text_entities'] = entities
+        if rng.random() < reaction_share:
+            message['reactions'] = [
+                {'type': 'emoji', 'count': max(1, int(rng.paretovariate(1.5))), 'emoji': emoji, 'recent': []}
+                for emoji in rng.sample(REACTION_EMOJIS, rng.randint(1, 3))
+            ]
+        yield message
+
+def _write_messages(f, header, messages):
+    f.write(json.dumps(header, ensure_ascii=False, indent=1)[:-2] + ',\n "messages": [\n')
+    for i, message in enumerate(messages):
+        if i:
+            f.write(',\n')
+        f.write('  ')
+        f.write(json.dumps(message, ensure_ascii=False))
+    f.write('\n ]\n}\n')
+
+def _header(chat_type):
+    return {'name': CHAT_NAMES.get(chat_type, 'Synthetic Chat'), 'type': chat_type, 'id': 1000000001}
+
+def write_export(path, chat_type='private_supergroup', messages=10000, **settings):
+    # Writes a result.json of chat_type; settings are those of export_messages. Messages are
+    # serialized one at a time, so generating millions of them needs no memory.
+    with open(path, 'w', encoding='utf-8') as f:
+        _write_messages(f, _header(chat_type), export_messages(chat_type, messages, **settings))
+
+def write_export_parts(folder, parts, chat_type='private_supergroup', messages=10000, overlap=100, **settings):
+    # Writes the export as result1.json ... result<parts>.json in folder, the way an export made
+    # in several sittings comes out: each part starts overlap messages before the previous one
+    # ended, so merge_json_files has repeated ids to drop. Returns the paths.
+    os.makedirs(folder, exist_ok=True)
+    header = _header(chat_type)
+    size = -(-messages // parts)
+    stream = export_messages(chat_type, messages, **settings)
+    paths = []
+    tail = collections.deque(maxlen=max(0, overlap))
+    for part in range(1, parts + 1):
+        chunk = itertools.chain(list(tail), itertools.islice(stream, size))
+        path = os.path.join(folder, f'result{part}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            _write_messages(f, header, (tail.append(message) or message for message in chunk))
+        paths.append(path)
+    return paths
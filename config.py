@@ -39,6 +39,8 @@ emojis = {
     'command': '❗',
     'emoji': '😊',
     'profanity': '💢',
+    'mention': '👤',
+    'hashtag': '#️⃣',
     'links': '🔗',
     'poll': '📊',
 }
@@ -46,6 +48,16 @@ emojis = {
 # Number of top days to show in "Most active days" section.
 top_days_count = 10
 
+# Number of profanity words to show in the "Top profanity" section, by the number of messages they appear in.
+top_profanity_count = 10
+
+# Number of @mentions and #hashtags to show in the "Top mentions" and "Top hashtags" sections.
+top_mentions_count = 10
+top_hashtags_count = 10
+
+# Number of posts to show in the "Top posts by reactions" section, with their date, author and the start of their text.
+top_posts_count = 10
+
 # Whether to display non-consecutive message counts (counts where user changed, resetting the chain).
 show_non_consecutive_counts = True
 
@@ -94,4 +106,49 @@ words_dir = 'words'
 time_offset = 0
 
 # If True, when plotting personal chat data, non-consecutive messages are used instead of total counts.
-plot_non_consecutive_messages = False
\ No newline at end of file
+plot_non_consecutive_messages = False
+
+# JSON parser used to read exports. 'auto' picks the fastest one available:
+# 'bulk' (whole messages decoded by the json module), 'yajl2_c' (ijson C backend), 'yajl2_cffi', 'yajl2', 'python'.
+json_backend = 'auto'
+
+# Number of processes used to analyze large exports (16 MB and more) and to read the resultX.json files
+# when merging. 1 keeps the single-process analysis, 0 uses every CPU core. The result is the same either way.
+analysis_workers = 1
+
+# Keep a columnar cache of every analyzed export next to it (<export>.cache.npz and <export>.tokens).
+# Later analyses of the same, unchanged file read the cache instead of the JSON; changing stop words,
+# dates or top-N settings does not invalidate it. The run that builds the cache is single-process and
+# has no date range.
+# Off by default: the cache takes about a third of the export's size and <export>.tokens holds the
+# text of every message in plain text, next to the export.
+analysis_cache = False
+
+# Save the analysis state next to the export (<export>.state). When the export is re-exported with new
+# messages appended, the next analysis only processes the messages after the saved checkpoint.
+# Changing settings that affect the counts (stop words, bots, dates, time offset...) rebuilds the state.
+incremental_analysis = False
+
+# Keep a sparse date index of every analyzed export next to it (<export>.index), written by a single-process
+# analysis of the whole file without a date range. Later analyses with a date range then only parse the part
+# of the export around the range instead of all of it.
+# Off by default, like analysis_cache: it writes a file next to the export.
+analysis_index = False
+
+# Counting of words and phrases for the top lists. 'exact' counts every distinct word, bigram and trigram,
+# so memory grows with the size of the export. 'approximate' keeps at most twice approximate_counting_capacity
+# of each (Misra–Gries summary): memory stays fixed, every frequent word is still found, and the report shows
+# how much its counts may be too low. 'auto' counts exactly unless the JSON of the export is
+# approximate_counting_threshold_mb or larger. For a compressed export that size is estimated as its file size
+# times a fixed ratio per format (gzip 10, bz2 16, xz 16, zstd 12), so a 100 MB result.json.xz counts as 1.6 GB.
+token_counting = 'auto'
+approximate_counting_threshold_mb = 1024
+approximate_counting_capacity = 100000
+
+# Write a profile of the analysis next to the report (<report>_profile.json): wall and CPU time of each
+# stage (header, parse, normalize, aggregate, finalize, reports, plots) and the messages it handled.
+# profile_memory adds the peak memory of each stage (tracemalloc, which makes the analysis several times
+# slower); profile_cprofile also writes a cProfile dump (<report>_profile.prof) for snakeviz or pstats.
+profile = False
+profile_memory = False
+profile_cprofile = False
\ No newline at end of file
@@ -18,6 +18,7 @@ texts = {
     'select_action': "Select an action:",
     'prompt_choice': "Enter your choice number and press Enter (default is 1): ",
     'start_analysis': "Starting analysis...",
+    'json_backend_active': "JSON parser: {0}",
     'start_analysis_save': "Starting analysis and duplicating result in JSON...",
     'file_not_found': "❌ File '{0}' not found. Ensure you've selected a proper JSON export (not HTML). If exporting is not available, try using the 64Gram Telegram client.",
     'file_size_warning': "⚠️ File size is {0} MB, processing may take time.",
@@ -27,11 +28,17 @@ texts = {
     'invalid_date_range': "❌ Invalid date range format.",
     'no_messages_in_range': "No messages found in the specified date range.",
     'no_messages': "No messages found for analysis.",
+    'batch_file_done': "✅ {0}: {1} messages in {2:.2f} s ({3} messages/s, peak memory {4}). Results saved to '{5}'.",
+    'batch_file_empty': "⚠️ {0}: no messages found for analysis.",
+    'batch_file_failed': "❌ {0}: {1}",
+    'profile_saved': "📈 Profile of the analysis saved to '{0}'.",
+    'batch_summary': "Finished in {0:.2f} seconds: {1} of {2} exports analyzed, {3} failed.",
     'processing_file': "Processing file: {0}",
     'no_files_found_pattern': "No files matching 'result*.json' pattern found.",
     'no_messages_found_merge': "No messages found to merge.",
     'no_header_data_merge': "No header data found. Cannot save merged file.",
     'error_writing_merged_file': "Error writing merged file: {0}",
+    'merge_file_done': "Read {0}: {1} messages, {2:.1f} MB in {3:.2f} s ({4:.1f} MB/s)",
     'processing_completed': "✅ Analysis completed in {0:.2f} seconds. Results saved to '{1}'. The result will be saved to a TXT file.",
     'press_enter_to_return': "Press Enter to return to the main menu...",
     'config_prompt': "1. Use standard settings from config.py\n2. Configure in console\nEnter your choice (default 1): ",
@@ -80,6 +87,10 @@ texts = {
     'top_participants': "Top participants",
     'top_words': "Top words",
     'top_phrases': "Top phrases",
+    'top_profanity': "Top profanity",
+    'top_mentions': "Top mentions",
+    'top_hashtags': "Top hashtags",
+    'approximate_counts_note': "(approximate counts: each may be up to {0} too low)",
     'times': "",
     'activity': "Activity",
     'most_active_days': "Most active days",
@@ -91,6 +102,8 @@ texts = {
     'chat_statistics': "Chat statistics “{0}” {1}",
     'invite_top': "Top inviters",
     'processing': "Processed {0} messages... {1}",
+    'processing_progress': "{0:5.1f}% · {1} messages · {2} MB/s · {3} messages/s · {4} left",
+    'processing_done': "Processed {0} messages in {1} ({2} messages/s).",
     'authors_by_posts': "Authors by number of posts:",
     'posts_by_month_and_author': "Posts by month and author:",
     'no_name': "No name",
@@ -18,6 +18,7 @@ texts = {
     'select_action': "Выберите действие:",
     'prompt_choice': "Введите номер выбора и нажмите Enter (по умолчанию 1): ",
     'start_analysis': "Запуск анализа...",
+    'json_backend_active': "JSON-парсер: {0}",
     'start_analysis_save': "Запуск анализа и дублирование результата в JSON...",
     'file_not_found': "❌ Файл '{0}' не найден. Убедитесь, что файл JSON выбран правильно, а не HTML. Если нет функции экспорта, попробуйте клиент 64Gram.",
     'file_size_warning': "⚠️ Размер файла {0} МБ, обработка займёт время.",
@@ -27,11 +28,17 @@ texts = {
     'invalid_date_range': "❌ Неверный формат диапазона дат.",
     'no_messages_in_range': "В указанном диапазоне дат нет сообщений.",
     'no_messages': "Файл не содержит сообщений для анализа.",
+    'batch_file_done': "✅ {0}: {1} сообщений за {2:.2f} с ({3} сообщений/с, пик памяти {4}). Результаты сохранены в файл '{5}'.",
+    'batch_file_empty': "⚠️ {0}: нет сообщений для анализа.",
+    'batch_file_failed': "❌ {0}: {1}",
+    'profile_saved': "📈 Профиль анализа сохранён в файл '{0}'.",
+    'batch_summary': "Готово за {0:.2f} секунд: проанализировано {1} из {2} экспортов, с ошибкой {3}.",
     'processing_file': "Обработка файла: {0}",
     'no_files_found_pattern': "Не найдено ни одного файла, соответствующего шаблону 'result*.json'.",
     'no_messages_found_merge': "Не найдено сообщений для объединения.",
     'no_header_data_merge': "Не найдены данные заголовка. Невозможно сохранить объединённый файл.",
     'error_writing_merged_file': "Ошибка при записи объединённого файла: {0}",
+    'merge_file_done': "Прочитан {0}: {1} сообщений, {2:.1f} МБ за {3:.2f} с ({4:.1f} МБ/с)",
     'processing_completed': "✅ Анализ завершён за {0:.2f} секунд. Результаты сохранены в файл '{1}'. Результат будет сохранен в TXT файл.",
     'press_enter_to_return': "Нажмите Enter, чтобы вернуться в главное меню...",
     'config_prompt': "1. Использовать стандартную настройку из config.py\n2. Настроить в консоли\nВведите номер выбора (по умолчанию 1): ",
@@ -80,6 +87,10 @@ texts = {
     'top_participants': "Топ участников",
     'top_words': "Топ слов",
     'top_phrases': "Топ фраз",
+    'top_profanity': "Топ мата",
+    'top_mentions': "Топ упоминаний",
+    'top_hashtags': "Топ хештегов",
+    'approximate_counts_note': "(приблизительный подсчёт: каждое значение может быть занижено не более чем на {0})",
     'times': "",
     'activity': "Активность",
     'most_active_days': "Самые активные дни",
@@ -91,6 +102,8 @@ texts = {
     'chat_statistics': "Статистика чата «{0}» {1}",
     'invite_top': "Топ пригласивших",
     'processing': "Обработано {0} сообщений... {1}",
+    'processing_progress': "{0:5.1f}% · {1} сообщений · {2} МБ/с · {3} сообщений/с · осталось {4}",
+    'processing_done': "Обработано {0} сообщений за {1} ({2} сообщений/с).",
     'authors_by_posts': "Список авторов по количеству постов:",
     'posts_by_month_and_author': "Посты по месяцам и авторам:",
     'no_name': "Без названия",
@@ -0,0 +1,210 @@
+import base64
+import collections
+import datetime
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from .authors import AuthorRegistry
+from .daily_series import DailySeries, DailyUserSeries
+from .heavy_hitters import HeavyHitters
+from .top_posts import TopPosts
+
+# Incremental analysis: the aggregate of the last run is saved next to the export, and the
+# next run over a re-exported (appended) file only feeds it the messages after the checkpoint.
+# A state is only reused when STATE_VERSION, the aggregate class, the chat and the fingerprint
+# of the analysis options all match. Bump STATE_VERSION whenever an aggregate's fields change
+# meaning, so that old state files are rebuilt instead of mixed with new counters.
+#
+# The state file sits next to an export that may come from somebody else, so it is plain JSON
+# and never pickle: loading one only builds builtin values, Counters, dates, numeric NumPy
+# arrays and the aggregate plus STATE_CLASSES, whatever the file says. Every value that is not
+# a list, a string, a number, a bool or None is stored as a one-key object naming its type.
+STATE_VERSION = 11
+# Classes an aggregate may contain. They are rebuilt from their __dict__ without running
+# __init__.
+STATE_CLASSES = (AuthorRegistry, DailySeries, DailyUserSeries, HeavyHitters, TopPosts)
+# Kinds of arrays a state may hold: booleans, integers and floats.
+_ARRAY_KINDS = 'biuf'
+# Values stored as they are.
+_PLAIN = (str, int, float, bool, type(None))
+
+class StaleStateError(Exception):
+    # The export does not continue the one the state was built from.
+    pass
+
+def state_path(input_file):
+    return input_file + '.state'
+
+def options_fingerprint(options):
+    # Hash of every option that changes what consume() counts. options['config'] is left out:
+    # it is only read by results() (top-N settings), which runs after every resume anyway.
+    items = []
+    for key in sorted(options):
+        if key == 'config':
+            continue
+        value = options[key]
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        elif isinstance(value, re.Pattern):
+            value = (value.pattern, value.flags)
+        elif isinstance(value, dict):
+            value = sorted(value.items())
+        items.append((key, value))
+    return hashlib.blake2b(repr(items).encode('utf-8'), digest_size=16).hexdigest()
+
+def _chat_key(header):
+    return [header.get('id'), header.get('type')]
+
+def _encode(value, classes):
+    # JSON-ready form of value; raises TypeError for anything a state cannot hold.
+    kind = type(value)
+    if kind in _PLAIN:
+        return value
+    if kind is list:
+        return _encode_items(value, classes)
+    if kind in (tuple, set, frozenset):
+        return {kind.__name__: _encode_items(value, classes)}
+    if kind in (dict, collections.Counter):
+        # Keys and values as two lists: word counts, the bulk of a state, are then two lists of
+        # plain strings and numbers.
+        return {kind.__name__: [_encode_items(value.keys(), classes), _encode_items(value.values(), classes)]}
+    if kind in (datetime.datetime, datetime.date):
+        return {kind.__name__: value.isoformat()}
+    if kind is np.ndarray and value.dtype.kind in _ARRAY_KINDS:
+        data = base64.b64encode(np.ascontiguousarray(value).tobytes()).decode('ascii')
+        return {'ndarray': [value.dtype.str, list(value.shape), data]}
+    if isinstance(value, np.generic) and value.dtype.kind in _ARRAY_KINDS:
+        return value.item()
+    if classes.get(kind.__name__) is kind:
+        return {'object': [kind.__name__, _encode(value.__getstate__(), classes)]}
+    raise TypeError(f"{kind.__name__} cannot be stored in an analysis state")
+
+def _encode_items(items, classes):
+    items = list(items)
+    if all(type(item) in _PLAIN for item in items):
+        return items
+    return [_encode(item, classes) for item in items]
+
+def _decode_items(items, classes):
+    if type(items) is not list:
+        raise TypeError(f"expected a list in the analysis state, got {type(items).__name__}")
+    if all(type(item) in _PLAIN for item in items):
+        return items
+    return [_decode(item, classes) for item in items]
+
+def _decode(value, classes):
+    # Inverse of _encode; raises ValueError, KeyError or TypeError for anything it did not write.
+    if type(value) in _PLAIN:
+        return value
+    if type(value) is list:
+        return _decode_items(value, classes)
+    (kind, data), = value.items()
+    if kind in ('tuple', 'set', 'frozenset'):
+        items = _decode_items(data, classes)
+        return tuple(items) if kind == 'tuple' else set(items) if kind == 'set' else frozenset(items)
+    if kind in ('dict', 'Counter'):
+        keys, values = data
+        items = dict(zip(_decode_items(keys, classes), _decode_items(values, classes)))
+        return collections.Counter(items) if kind == 'Counter' else items
+    if kind == 'datetime':
+        return datetime.datetime.fromisoformat(data)
+    if kind == 'date':
+        return datetime.date.fromisoformat(data)
+    if kind == 'ndarray':
+        dtype_name, shape, encoded = data
+        dtype = np.dtype(dtype_name)
+        if dtype.kind not in _ARRAY_KINDS:
+            raise ValueError(f"arrays of {dtype} cannot be loaded from an analysis state")
+        return np.frombuffer(base64.b64decode(encoded), dtype=dtype).reshape(shape).copy()
+    if kind == 'object':
+        name, state = data
+        cls = classes[name]
+        state = _decode(state, classes)
+        if not isinstance(state, dict) or not all(isinstance(key, str) for key in state):
+            raise ValueError(f"broken {name} in the analysis state")
+        instance = cls.__new__(cls)
+        instance.__dict__.update(state)
+        return instance
+    raise ValueError(f"unknown value type '{kind}' in the analysis state")
+
+def _classes(aggregate_class):
+    return {cls.__name__: cls for cls in (aggregate_class, *STATE_CLASSES)}
+
+def load_analysis_state(input_file, aggregate_class, options, header):
+    # Returns the saved aggregate of input_file with its options restored, or None if there is
+    # no usable state.
+    try:
+        with open(state_path(input_file), 'r', encoding='utf-8', errors='surrogatepass') as f:
+            state = json.load(f)
+    except (OSError, ValueError, RecursionError):
+        return None
+    if (not isinstance(state, dict) or state.get('version') != STATE_VERSION
+            or state.get('aggregate_class') != aggregate_class.__name__
+            or state.get('chat') != _chat_key(header)
+            or state.get('fingerprint') != options_fingerprint(options)):
+        return None
+    try:
+        aggregate = _decode(state['aggregate'], _classes(aggregate_class))
+    except (KeyError, TypeError, ValueError, RecursionError):
+        return None
+    # Fields added to the aggregate without a version bump still force a rebuild.
+    if not isinstance(aggregate, aggregate_class) or set(vars(aggregate)) != set(vars(aggregate_class(options))):
+        return None
+    aggregate.options = options
+    return aggregate
+
+def save_analysis_state(input_file, aggregate, options, header):
+    # Failing to write the state only costs the next run a full analysis.
+    state = {
+        'version': STATE_VERSION,
+        'aggregate_class': type(aggregate).__name__,
+        'chat': _chat_key(header),
+        'fingerprint': options_fingerprint(options),
+    }
+    path = state_path(input_file)
+    try:
+        state['aggregate'] = _encode(aggregate, _classes(type(aggregate)))
+        # surrogatepass: texts can hold lone surrogates from \u escapes of the export.
+        with open(path + '.tmp', 'w', encoding='utf-8', errors='surrogatepass') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+    except (OSError, TypeError, ValueError):
+        try:
+            os.remove(path + '.tmp')
+        except OSError:
+            pass
+        return False
+    return True
+
+def _message_date(message):
+    # Same parse as extract_message: None for a missing or broken date.
+    try:
+        return datetime.datetime.fromisoformat(message.get('date'))
+    except (TypeError, ValueError):
+        return None
+
+def messages_after(messages, aggregate):
+    # Yields the messages that come after the aggregate's checkpoint (the text message with the
+    # highest id it has seen). Raises StaleStateError before yielding anything if the checkpoint
+    # message is not in the export with the same date, i.e. the export was not just appended to.
+    last_id, last_date = aggregate.last_id, aggregate.last_checkpoint_date
+    messages = iter(messages)
+    found = last_id is None
+    for message in messages:
+        message_id = message.get('id') if isinstance(message, dict) else None
+        if type(message_id) is int and (last_id is None or message_id > last_id):
+            if not found:
+                raise StaleStateError(f"message {last_id} of the previous analysis is missing")
+            yield message
+            break
+        if message_id == last_id and _message_date(message) == last_date:
+            found = True
+    else:
+        if not found:
+            raise StaleStateError(f"message {last_id} of the previous analysis is missing")
+        return
+    yield from messages
@@ -1,262 +1,366 @@
 import datetime
-import re
-import json
-import os
 import collections
-from .analyzer_common import parse_messages_streaming, load_json_file, load_word_list, is_bot, format_number
-from .analyzer_utils import process_message
-
-def analyze_channel(input_file, config, current_texts, start_date=None, end_date=None, language='en'):
-    data = load_json_file(input_file)
-    messages = data.get("messages", [])
-    chat_name = data.get("name", current_texts.get('no_name','Name'))
-    chat_type = data.get("type", "public_channel")
-
-    day_names_list = config['day_names'].get(language, config['day_names']['en'])
-    month_names_list = config['month_names'].get(language, config['month_names']['en'])
-
-    user_counts = collections.Counter()
-    user_symbols = collections.Counter()
-    words = []
-    phrases_2 = []
-    phrases_3 = []
-    hours = collections.Counter()
-    weekdays = collections.Counter()
-    months = collections.Counter()
-    years = collections.Counter()
-    dates = collections.Counter()
-    date_messages = collections.defaultdict(int)
-    date_symbols = collections.defaultdict(int)
-    includes_media = 0
-    unprocessed_messages = 0
-    error_count = 0
-    errors = []
-    message_counts = {
-        'text': 0,
-        'sticker': 0,
-        'picture': 0,
-        'video': 0,
-        'gif': 0,
-        'voice_message': 0,
-        'audio': 0,
-        'file': 0,
-        'commands': 0,
-        'forwards': 0,
-        'emojis': 0,
-        'profanity': 0,
-        'replies': 0,
-        'poll': 0,
-        'links': 0,
+from .analyzer_common import (load_stop_words, load_profanity_words, message_counter, new_message_counts,
+                              plain_config, is_bot, format_number, run_analysis)
+from .analyzer_utils import NO_AUTHOR, PROCESS_ERROR, REACTIONS_ERROR, SKIPPED
+from .heavy_hitters import count_error, token_counter
+from .authors import AuthorRegistry, rekeyed
+from .daily_series import DailySeries
+from .top_posts import TopPosts
+from .date_range import date_range, extract_in_range, records_in_range
+from .profiler import profile_stage, profiled
+
+def channel_options(config, current_texts, start_date=None, end_date=None, language='en'):
+    # Everything ChannelAggregate needs from the config, resolved once per analysis.
+    return {
+        'current_texts': current_texts,
+        'start_date': start_date,
+        'end_date': end_date,
+        # Weekdays and months are counted by number; the report names them in this language.
+        'language': language,
+        'stop_words': load_stop_words(config),
+        'profanity_words': load_profanity_words(config),
+        'commands_identifiers': set(config.get('commands_identifiers', [])),
+        'emoji_pattern': config['emoji_pattern'],
+        'exclude_bots': config.get('exclude_bots', True),
+        'bot_identifiers': config.get('bot_identifiers', []),
+        'time_offset': config.get('time_offset', 0),
+        # Exact word and phrase counts; analyze_* sets the summary size when the export needs approximate ones.
+        'token_capacity': None,
+        # Size of the top posts by reactions list, which is kept while counting.
+        'top_posts_count': config.get('top_posts_count', 10),
+        'config': plain_config(config),
     }
-    user_ids = {}
-    emoji_reactions_counter = collections.Counter()
-    message_reactions_count = {}
-    reactions_by_date = collections.defaultdict(int)
-    author_post_count = collections.Counter()
-    posts_by_date = {}
-
-    words_dir = config.get('words_dir', 'words')
-    stop_words_type = config.get('stop_words_type', 'minimal')
-    stop_words_file = os.path.join(words_dir, f'stop_words_{stop_words_type}.txt')
-    profanity_words_file = os.path.join(words_dir, 'profanity_words.txt')
-    stop_words = load_word_list(stop_words_file)
-    english_stop_words_file = os.path.join(words_dir, 'stop_words_english.txt')
-    english_stop_words = load_word_list(english_stop_words_file)
-    stop_words.update(english_stop_words)
-    if not stop_words:
-        stop_words = set(['и','в','не','на','с','что','а','как','это','по','но','из','у','за','о','же','то','к','для','до','вы','мы','они','он','она','оно','так','было','только','бы','когда','уже','ли','или','со','a','the','and','or','but','if','in','on','with','for','is','was','are','were','be','to','of','at','by','an'])
-    profanity_words = load_word_list(profanity_words_file)
-    commands_identifiers = set(config.get('commands_identifiers', []))
-    emoji_pattern = config['emoji_pattern']
-
-    first_date = None
-    last_date = None
-    total_messages_processed = 0
-    spinner = ['|', '/', '-', '\\']
-    spinner_index = 0
-
-    def print_progress(current):
-        # Display progress spinner and message count
-        nonlocal spinner_index
-        current_formatted = format_number(current)
-        symbol = spinner[spinner_index % len(spinner)]
-        spinner_index += 1
-        progress = current_texts['processing'].format(current_formatted, symbol)
-        print(progress, end='\r', flush=True)
-
-    time_offset = config.get('time_offset', 0)
-    time_offset_delta = datetime.timedelta(hours=time_offset)
-
-    for message in messages:
-        total_messages_processed += 1
-        if message is None or message.get('type') != 'message':
-            continue
-        try:
-            if 'text' not in message:
-                continue
 
-            user = message.get('author', current_texts.get('unknown_author','Unknown Author'))
-            from_id = message.get('from_id', '')
-            if from_id:
-                if isinstance(from_id, str):
-                    if from_id.startswith('user'):
-                        user_id = from_id.replace('user', '')
-                    elif from_id.startswith('channel'):
-                        user_id = from_id.replace('channel', '')
-                    else:
-                        user_id = from_id
-                else:
-                    user_id = str(from_id)
-                user_ids[user] = user_id
-            else:
-                user_id = ''
-                user_ids[user] = user_id
-
-            if config.get('exclude_bots', True) and is_bot(user, config.get('bot_identifiers', [])):
+class ChannelAggregate:
+    # Running totals of analyze_channel over a contiguous run of posts.
+    # Posts do not depend on each other, so chunks built by the parallel engine
+    # (chunk=True) only have to be added up in file order.
+    # Every per-user field holds AuthorRegistry keys; results() turns them back into names.
+    def __init__(self, options, chunk=False):
+        self.options = options
+        self.processed = 0
+        self.user_counts = collections.Counter()
+        self.user_symbols = collections.Counter()
+        self.words = token_counter(options['token_capacity'])
+        self.phrases_2 = token_counter(options['token_capacity'])
+        self.phrases_3 = token_counter(options['token_capacity'])
+        self.hours = collections.Counter()
+        # weekdays by weekday() (0 is Monday); months and posts_by_date by year * 12 + month - 1.
+        self.weekdays = collections.Counter()
+        self.months = collections.Counter()
+        self.years = collections.Counter()
+        # Per-day counts; the top days are the largest date_messages.
+        self.date_messages = DailySeries()
+        self.date_symbols = DailySeries()
+        self.unprocessed_messages = 0
+        self.error_count = 0
+        self.errors = []
+        self.message_counts = new_message_counts()
+        self.profanity_counts = collections.Counter()
+        self.mention_counts = collections.Counter()
+        self.hashtag_counts = collections.Counter()
+        self.authors = AuthorRegistry(options['bot_identifiers'])
+        self.emoji_reactions_counter = collections.Counter()
+        self.top_posts = TopPosts(options['top_posts_count'])
+        self.reactions_by_date = DailySeries()
+        self.author_post_count = collections.Counter()
+        self.posts_by_date = {}
+        self.first_date = None
+        self.last_date = None
+        # Checkpoint for incremental analysis: the highest message id seen and that message's date.
+        self.last_id = None
+        self.last_checkpoint_date = None
+
+    def __getstate__(self):
+        # Options (word lists, texts, config) stay behind when a chunk result is sent between processes.
+        state = self.__dict__.copy()
+        state['options'] = None
+        return state
+
+    def consume(self, messages, progress=None):
+        # Messages dated outside the range are dropped before they are extracted and tokenized.
+        records = extract_in_range(profiled(messages, 'parse'), date_range(self.options), channel=True)
+        return self._consume_records(records, progress)
+
+    def consume_records(self, records, progress=None):
+        # records: MessageRecords in export order, from extract_message or from the export cache.
+        return self._consume_records(records_in_range(records, date_range(self.options)), progress)
+
+    def _consume_records(self, records, progress):
+        # With a profiler active, the time spent getting each record is parse and normalize,
+        # and the rest of the loop is aggregate.
+        with profile_stage('aggregate', exclude=('parse', 'normalize')) as stage:
+            processed = self.processed
+            self._count_records(profiled(records, 'normalize', inner='parse'), progress)
+            if stage is not None:
+                stage['messages'] += self.processed - processed
+        return self
+
+    def _count_records(self, records, progress):
+        options = self.options
+        current_texts = options['current_texts']
+        stop_words = options['stop_words']
+        exclude_bots = options['exclude_bots']
+        bot_identifiers = options['bot_identifiers']
+        time_offset_delta = datetime.timedelta(hours=options['time_offset'])
+        count_message = message_counter(self.message_counts, options, self.profanity_counts)
+        unknown_author = current_texts.get('unknown_author','Unknown Author')
+
+        user_counts = self.user_counts
+        user_symbols = self.user_symbols
+        words = self.words
+        phrases_2 = self.phrases_2
+        phrases_3 = self.phrases_3
+        mention_counts = self.mention_counts
+        hashtag_counts = self.hashtag_counts
+        hours = self.hours
+        weekdays = self.weekdays
+        months = self.months
+        years = self.years
+        date_messages = self.date_messages
+        date_symbols = self.date_symbols
+        errors = self.errors
+        authors = self.authors
+        author_keys = authors.keys
+        author_ids = authors.ids
+        author_bots = authors.bots
+        emoji_reactions_counter = self.emoji_reactions_counter
+        top_posts = self.top_posts
+        reactions_by_date = self.reactions_by_date
+        author_post_count = self.author_post_count
+        posts_by_date = self.posts_by_date
+
+        first_date = self.first_date
+        last_date = self.last_date
+        last_id = self.last_id
+        last_checkpoint_date = self.last_checkpoint_date
+        total_messages_processed = self.processed
+
+        for record in records:
+            total_messages_processed += 1
+            if record.kind == SKIPPED:
                 continue
+            message_id = record.id
+            if type(message_id) is int and (last_id is None or message_id > last_id):
+                last_id = message_id
+                last_checkpoint_date = record.date
+            try:
+                name = record.user
+                if name is NO_AUTHOR:
+                    name = unknown_author
+                user = author_keys.get(name)
+                if user is None:
+                    user = authors.add(name)
+                author_ids[user] = record.user_id
+
+                if exclude_bots:
+                    bot = author_bots[user]
+                    if bot is None:
+                        bot = is_bot(name, bot_identifiers)
+                    if bot:
+                        continue
+
+                if record.error_stage == PROCESS_ERROR:
+                    raise record.error
+
+                text = record.text
+                symbols = len(text)
+                user_counts[user] += 1
+                user_symbols[user] += symbols
+                author_post_count[user] += 1
+
+                date_time = record.date
+                date_only = None
+                if date_time is not None or record.bad_date is not None:
+                    try:
+                        if date_time is None:
+                            datetime.datetime.fromisoformat(record.bad_date)
+                        date_time += time_offset_delta
+                        if first_date is None or date_time < first_date:
+                            first_date = date_time
+                        if last_date is None or date_time > last_date:
+                            last_date = date_time
+
+                        date_only = date_time.date()
+                        date_messages.add(date_only)
+                        date_symbols.add(date_only, symbols)
+                        hours[date_time.hour] += 1
+                        weekdays[date_time.weekday()] += 1
+                        month_key = date_time.year * 12 + date_time.month - 1
+                        months[month_key] += 1
+                        years[date_time.year] += 1
+
+                        if month_key not in posts_by_date:
+                            posts_by_date[month_key] = collections.Counter()
+                        posts_by_date[month_key][user] += 1
+
+                    except (ValueError, KeyError):
+                        e_str = current_texts['error_processing_date'].format(record.error_id, "invalid_date")
+                        errors.append(e_str)
+
+                words_filtered = [w for w in record.tokens if w not in stop_words]
+                words.update(words_filtered)
+                phrases_2.update([f"{a} {b}" for a, b in zip(words_filtered, words_filtered[1:])])
+                phrases_3.update([f"{a} {b} {c}" for a, b, c in
+                                  zip(words_filtered, words_filtered[1:], words_filtered[2:])])
 
-            message_counts_local, words_local, p2_local, p3_local, links_in_message = process_message(
-                message, config, stop_words, profanity_words, commands_identifiers, emoji_pattern
-            )
-
-            text = message.get('text', '')
-            if isinstance(text, list):
-                text_pieces = []
-                for t_piece in text:
-                    if isinstance(t_piece, dict):
-                        text_pieces.append(t_piece.get('text', ''))
-                    elif isinstance(t_piece, str):
-                        text_pieces.append(t_piece)
-                text = ''.join(text_pieces)
-            if text is None:
-                text = ''
-            symbols = len(text)
-            user_counts[user] += 1
-            user_symbols[user] += symbols
-            author_post_count[user] += 1
-
-            message_date = message.get('date')
-            date_only = None
-            if message_date:
-                try:
-                    date_time = datetime.datetime.fromisoformat(message_date)
-                    date_time += time_offset_delta
-                    if start_date and end_date:
-                        if not (start_date.date() <= date_time.date() <= end_date.date()):
-                            for k, v in message_counts_local.items():
-                                message_counts[k] += v
-                            continue
-                    if first_date is None or date_time < first_date:
-                        first_date = date_time
-                    if last_date is None or date_time > last_date:
-                        last_date = date_time
-
-                    date_only = date_time.date()
-                    date_messages[date_only] += 1
-                    date_symbols[date_only] += symbols
-                    hours[date_time.hour] += 1
-                    weekday_index = date_time.weekday()
-                    weekday_name = day_names_list[weekday_index]
-                    weekdays[weekday_name] += 1
-                    month_name = f"{month_names_list[date_time.month -1]} {date_time.year}"
-                    months[month_name] += 1
-                    years[date_time.year] += 1
-                    dates[date_only] += 1
-
-                    date_month = date_time.strftime("%Y-%m")
-                    if date_month not in posts_by_date:
-                        posts_by_date[date_month] = collections.Counter()
-                    posts_by_date[date_month][user] += 1
-
-                except (ValueError, KeyError):
-                    msg_id = message.get('id', 'Unknown')
-                    e_str = current_texts['error_processing_date'].format(msg_id, "invalid_date")
-                    errors.append(e_str)
-
-            words.extend(words_local)
-            phrases_2.extend(p2_local)
-            phrases_3.extend(p3_local)
-
-            for k, v in message_counts_local.items():
-                message_counts[k] += v
-
-            reactions = message.get('reactions', [])
-            total_reactions_for_message = 0
-            for r in reactions:
-                if r.get('type') == 'emoji':
-                    count = r.get('count', 0)
-                    emoji_reactions_counter[r['emoji']] += count
+                count_message(record)
+                if record.mentions:
+                    mention_counts.update(record.mentions)
+                if record.hashtags:
+                    hashtag_counts.update(record.hashtags)
+
+                total_reactions_for_message = 0
+                for emoji, count in record.reactions:
+                    emoji_reactions_counter[emoji] += count
                     total_reactions_for_message += count
-            message_id = message.get('id', 0)
-            message_reactions_count[message_id] = total_reactions_for_message
-
-            if date_only is not None and total_reactions_for_message > 0:
-                reactions_by_date[date_only] += total_reactions_for_message
-
-        except Exception as e:
-            unprocessed_messages += 1
-            error_count += 1
-            msg_id = message.get('id', 'Unknown')
-            errors.append(current_texts['error_processing_message'].format(msg_id, e))
-            continue
-
-        if total_messages_processed % 1000 == 0:
-            print_progress(total_messages_processed)
-
-    print_progress(total_messages_processed)
-    print('\n')
-
-    total_msgs = sum(user_counts.values())
-    if total_msgs == 0:
-        return {}, {'errors': errors, 'unprocessed_messages': unprocessed_messages}
-
-    print(current_texts['messages_analyzed'].format(format_number(total_msgs)))
-
-    total_symbols = sum(user_symbols.values())
-    avg_message_length = total_symbols / total_msgs if total_msgs else 0
-    all_phrases = phrases_2 + phrases_3
-    common_words = collections.Counter(words).most_common(config.get('top_words_count', 100))
-    common_phrases = collections.Counter(all_phrases).most_common(config.get('top_phrases_count', 100))
-    activity = {
-        'hours': hours.most_common(3) if hours else [],
-        'weekdays': weekdays.most_common(3) if weekdays else [],
-        'months': months.most_common(3) if months else [],
-        'years': years.most_common(3) if years else [],
-    }
-    top_days = dates.most_common(config.get('top_days_count', 10))
-    top_emojis = emoji_reactions_counter.most_common()
-    top_posts_by_reactions = sorted(message_reactions_count.items(), key=lambda x: x[1], reverse=True)
-
-    analysis_results = {
-        'chat_name': chat_name,
-        'type': chat_type,
-        'total_messages': total_msgs,
-        'total_symbols': total_symbols,
-        'avg_message_length': avg_message_length,
-        'common_words': common_words,
-        'common_phrases': common_phrases,
-        'activity': activity,
-        'top_days': top_days,
-        'message_counts': message_counts,
-        'user_counts': user_counts,
-        'user_symbols': user_symbols,
-        'dates': dates,
-        'date_messages': date_messages,
-        'date_symbols': date_symbols,
-        'includes_media': includes_media,
-        'first_date': first_date,
-        'last_date': last_date,
-        'top_emojis': top_emojis,
-        'top_posts_by_reactions': top_posts_by_reactions,
-        'user_ids': user_ids,
-        'author_post_count': author_post_count,
-        'posts_by_date': posts_by_date,
-        'reactions_by_date': reactions_by_date,
-    }
+                if record.error_stage == REACTIONS_ERROR:
+                    raise record.error
+                top_posts.add(total_reactions_for_message, record.reaction_key, date_time, user, text)
 
-    error_info = {
-        'errors': errors,
-        'unprocessed_messages': unprocessed_messages,
-    }
+                if date_only is not None and total_reactions_for_message > 0:
+                    reactions_by_date.add(date_only, total_reactions_for_message)
+
+            except Exception as e:
+                self.unprocessed_messages += 1
+                self.error_count += 1
+                errors.append(current_texts['error_processing_message'].format(record.error_id, e))
+                continue
+
+            if progress and total_messages_processed % 1000 == 0:
+                progress(total_messages_processed)
+
+        self.processed = total_messages_processed
+        self.first_date = first_date
+        self.last_date = last_date
+        self.last_id = last_id
+        self.last_checkpoint_date = last_checkpoint_date
+        return self
+
+    def _adopt_authors(self, other):
+        # Registers the authors of other and rewrites its per-user fields with this aggregate's keys.
+        keys = self.authors.merge(other.authors)
+        for name in ('user_counts', 'user_symbols', 'author_post_count'):
+            setattr(other, name, rekeyed(getattr(other, name), keys))
+        other.posts_by_date = {date_month: rekeyed(counter, keys) for date_month, counter in other.posts_by_date.items()}
+        other.top_posts = other.top_posts.rekeyed(keys)
+
+    def merge(self, other):
+        # Appends the totals of the chunk that directly follows this one in the export.
+        self._adopt_authors(other)
+        for name in ('user_counts', 'user_symbols', 'words', 'phrases_2', 'phrases_3', 'hours', 'weekdays',
+                     'months', 'years', 'date_messages', 'date_symbols', 'reactions_by_date',
+                     'emoji_reactions_counter', 'author_post_count', 'profanity_counts', 'mention_counts',
+                     'hashtag_counts'):
+            getattr(self, name).update(getattr(other, name))
+        for date_month, counter in other.posts_by_date.items():
+            self.posts_by_date.setdefault(date_month, collections.Counter()).update(counter)
+        for k, v in other.message_counts.items():
+            self.message_counts[k] += v
+        self.top_posts.update(other.top_posts)
+        self.errors.extend(other.errors)
+        self.unprocessed_messages += other.unprocessed_messages
+        self.error_count += other.error_count
+        self.processed += other.processed
+        if other.last_id is not None and (self.last_id is None or other.last_id > self.last_id):
+            self.last_id = other.last_id
+            self.last_checkpoint_date = other.last_checkpoint_date
+        if other.first_date is not None and (self.first_date is None or other.first_date < self.first_date):
+            self.first_date = other.first_date
+        if other.last_date is not None and (self.last_date is None or other.last_date > self.last_date):
+            self.last_date = other.last_date
+        return self
+
+    def results(self, chat_name, chat_type):
+        config = self.options['config']
+        errors = self.errors
+        total_msgs = sum(self.user_counts.values())
+        if total_msgs == 0:
+            return {}, {'errors': errors, 'unprocessed_messages': self.unprocessed_messages}
+        authors = self.authors
+
+        total_symbols = sum(self.user_symbols.values())
+        avg_message_length = total_symbols / total_msgs if total_msgs else 0
+        # Bigrams first, then trigrams: the same order a Counter over phrases_2 + phrases_3 would see.
+        all_phrases = collections.Counter(self.phrases_2)
+        all_phrases.update(self.phrases_3)
+        common_words = self.words.most_common(config.get('top_words_count', 100))
+        common_phrases = all_phrases.most_common(config.get('top_phrases_count', 100))
+        # Bigrams and trigrams never share a phrase, so the larger error bounds both.
+        common_words_error = count_error(self.words)
+        common_phrases_error = max(count_error(self.phrases_2), count_error(self.phrases_3))
+        hours, weekdays, months, years = self.hours, self.weekdays, self.months, self.years
+        activity = {
+            'hours': hours.most_common(3) if hours else [],
+            'weekdays': weekdays.most_common(3) if weekdays else [],
+            'months': months.most_common(3) if months else [],
+            'years': years.most_common(3) if years else [],
+        }
+        top_days = self.date_messages.most_common(config.get('top_days_count', 10))
+        top_emojis = self.emoji_reactions_counter.most_common()
+        top_profanity = self.profanity_counts.most_common(config.get('top_profanity_count', 10))
+        top_mentions = self.mention_counts.most_common(config.get('top_mentions_count', 10))
+        top_hashtags = self.hashtag_counts.most_common(config.get('top_hashtags_count', 10))
+
+        analysis_results = {
+            'chat_name': chat_name,
+            'type': chat_type,
+            'language': self.options['language'],
+            'total_messages': total_msgs,
+            'total_symbols': total_symbols,
+            'avg_message_length': avg_message_length,
+            'common_words': common_words,
+            'common_phrases': common_phrases,
+            'common_words_error': common_words_error,
+            'common_phrases_error': common_phrases_error,
+            'activity': activity,
+            'top_days': top_days,
+            'message_counts': self.message_counts,
+            'user_counts': authors.named(self.user_counts),
+            'user_symbols': authors.named(self.user_symbols),
+            'dates': self.date_messages,
+            'date_messages': self.date_messages,
+            'date_symbols': self.date_symbols,
+            'includes_media': 0,
+            'first_date': self.first_date,
+            'last_date': self.last_date,
+            'top_emojis': top_emojis,
+            'top_posts_by_reactions': self.top_posts.most_common(authors.names),
+            'top_profanity': top_profanity,
+            'top_mentions': top_mentions,
+            'top_hashtags': top_hashtags,
+            'user_ids': authors.user_ids(),
+            'author_post_count': authors.named(self.author_post_count),
+            'posts_by_date': {date_month: authors.named(counter) for date_month, counter in self.posts_by_date.items()},
+            'reactions_by_date': self.reactions_by_date,
+        }
+
+        error_info = {
+            'errors': errors,
+            'unprocessed_messages': self.unprocessed_messages,
+        }
+
+        return analysis_results, error_info
+
+def analyze_channel(input_file, config, current_texts, start_date=None, end_date=None, language='en', use_streaming=False, progress=None, log=None):
+    # input_file may be a path or an ExportReader already opened by the caller.
+    # progress(snapshot) is called with the snapshots of modules.progress instead of drawing the
+    # progress line on the console, and log(line) with the status lines instead of printing them.
+    # With use_streaming=True posts are read one by one instead of json.load-ing the whole export.
+    options = channel_options(config, current_texts, start_date, end_date, language)
+    log = log or print
+    aggregate, header_data = run_analysis(input_file, config, ChannelAggregate, options, channel=True,
+                                          use_streaming=use_streaming, progress=progress)
+
+    # Read after the loop so that name/type stored behind the messages array are known too.
+    chat_name = header_data.get("name", current_texts.get('no_name','Name'))
+    chat_type = header_data.get("type", "public_channel")
 
-    return analysis_results, error_info
\ No newline at end of file
+    with profile_stage('finalize') as stage:
+        analysis_results, error_info = aggregate.results(chat_name, chat_type)
+        if stage is not None:
+            stage['messages'] += aggregate.processed
+    if analysis_results:
+        log(current_texts['messages_analyzed'].format(format_number(analysis_results['total_messages'])))
+    return analysis_results, error_info
@@ -1,41 +1,140 @@
-import datetime
-import ijson
 import json
-import re
 import os
+import types
+from .json_backend import HEADER_FIELDS, compression_of_start, open_binary, open_decompressed, open_stream, select_backend
+from .profanity import ProfanityMatcher
+
+class ExportReader:
+    # Reads a Telegram export with a single open file and a single parser stream.
+    # The header fields (name, type, id) are taken from what precedes the messages array,
+    # and messages() keeps consuming the same stream, so the header scan, the chat type
+    # check and the message loop no longer open the file three times.
+    # backend is a name from json_backend (None or 'auto' picks the fastest available one).
+    def __init__(self, input_file, backend=None):
+        self.input_file = input_file
+        self.backend = select_backend(backend)
+        self.header = {}
+        self.has_messages = False
+        # The file on disk is opened here so that bytes_read() can tell how far into it the
+        # stream has read, also through a decompressing stream.
+        self._raw = open(input_file, 'rb')
+        self.total_bytes = os.fstat(self._raw.fileno()).st_size
+        self._bytes_read = 0
+        self._file = None
+        try:
+            # Detected once from the open file; load(), token_capacity() and the parallel engine reuse it.
+            self.compression = compression_of_start(self._raw.peek(6)[:6])
+            # Byte offsets of messages (message_offset / seek_messages) need the 'bulk' stream on a plain file.
+            self.seekable = self.backend == 'bulk' and self.compression is None
+            self._file = open_decompressed(input_file, self.compression, self._raw)
+            self._stream = open_stream(self._file, self.backend, track_offsets=self.seekable)
+            self.has_messages = self._stream.read_header(self.header)
+        except:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # For a plain export _file is _raw itself.
+        if self._raw is not None:
+            self._bytes_read = self._raw.tell()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+
+    def bytes_read(self):
+        # Bytes of the export file (compressed ones for a compressed export) read so far. The
+        # parsers read ahead in blocks, so this runs up to a block ahead of the messages.
+        return self._raw.tell() if self._raw is not None else self._bytes_read
+
+    @property
+    def header_complete(self):
+        return all(field in self.header for field in HEADER_FIELDS)
+
+    def messages(self):
+        # Yields messages from the already open stream. Header fields stored after the
+        # messages array end up in self.header once the loop is done.
+        if self._file is None or not self.has_messages:
+            return
+        try:
+            yield from self._stream.messages(self.header)
+        finally:
+            self.close()
+
+    def message_offset(self):
+        # While messages() is yielding a message: the byte offset right behind it. Needs seekable.
+        return self._stream.byte_offset()
+
+    def seek_messages(self, offset):
+        # Makes messages() start behind the message whose message_offset() was offset.
+        self._stream.seek_messages(offset)
+
+    def complete_header(self):
+        # For exports that put messages before name/type/id the header is only known after
+        # the array. Callers that need it up front (start.py picks the analyzer by type)
+        # get it from a separate header scan; the usual layout never needs one.
+        if not self.header_complete and self.has_messages:
+            for field, value in load_json_header(self.input_file).items():
+                self.header.setdefault(field, value)
+        return self.header
+
+    def load(self):
+        # Loads the whole export with json.load. The file is opened again rather than rewound:
+        # decompressing streams cannot seek back.
+        self.close()
+        self._raw = open(self.input_file, 'rb')
+        self._file = open_decompressed(self.input_file, self.compression, self._raw)
+        try:
+            data = json.load(self._file)
+        finally:
+            self.close()
+        if isinstance(data, dict) and isinstance(data.get('messages'), list):
+            # Null items are dropped, as messages() drops them: otherwise they would break a run of
+            # messages by one author here but not when streaming.
+            data['messages'] = [message for message in data['messages'] if message is not None]
+        return data
+
+def open_export(input_file, backend=None):
+    # Accepts a path or an ExportReader that the caller already opened for the header.
+    if isinstance(input_file, ExportReader):
+        return input_file
+    return ExportReader(input_file, backend)
 
 def load_json_header(input_file):
     # This function extracts only the header fields (name, type, id) from the JSON file
     # using a streaming parser without loading the entire file.
-    header_fields = ['name', 'type', 'id']
+    import ijson
+
     header_data = {}
-    with open(input_file, 'r', encoding='utf-8') as f:
+    with open_binary(input_file) as f:
         parser = ijson.parse(f)
         current_field = None
         for prefix, event, value in parser:
             if prefix == '' and event == 'map_key':
                 current_field = value
-            elif current_field in header_fields and event in ('string', 'number'):
+            elif current_field in HEADER_FIELDS and event in ('string', 'number'):
                 header_data[current_field] = value
-            if all(field in header_data for field in header_fields):
+            if all(field in header_data for field in HEADER_FIELDS):
                 break
     return header_data
 
 def load_json_file(input_file):
     # Loads the entire JSON data into memory.
     # Useful for smaller files or when we need all messages at once.
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data
+    return open_export(input_file).load()
 
 def parse_messages_streaming(input_file):
     # Streams through messages without loading all at once.
     # This approach helps handle large JSON exports more efficiently.
-    with open(input_file, 'r', encoding='utf-8') as f:
-        messages = ijson.items(f, 'messages.item')
-        for message in messages:
-            if message is not None:
-                yield message
+    return open_export(input_file).messages()
 
 def is_bot(user_name, bot_identifiers):
     # Checks if a user name contains a known bot identifier.
@@ -50,13 +149,199 @@ def format_number(number):
     parts.reverse()
     return ' '.join(parts)
 
+# Word lists read so far: path -> (size, mtime_ns, words). A process that runs many analyses
+# reads each list once, and again only when the file changes.
+_word_lists = {}
+
 def load_word_list(file_path):
-    # Loads words from a given file into a set, one word per line.
+    # Loads words from a given file into a set, one word per line. The set is the caller's own.
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return set()
+    cached = _word_lists.get(file_path)
+    if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return set(cached[2])
     words = set()
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                w = line.strip().lower()
-                if w:
-                    words.add(w)
-    return words
\ No newline at end of file
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            w = line.strip().lower()
+            if w:
+                words.add(w)
+    _word_lists[file_path] = (stat.st_size, stat.st_mtime_ns, frozenset(words))
+    return words
+
+DEFAULT_STOP_WORDS = ['и','в','не','на','с','что','а','как','это','по','но','из','у','за','о','же','то','к','для','до','вы','мы',
+                      'они','он','она','оно','так','было','только','бы','когда','уже','ли','или','со','a','the','and','or','but',
+                      'if','in','on','with','for','is','was','are','were','be','to','of','at','by','an']
+
+MESSAGE_COUNT_KEYS = ('text', 'sticker', 'picture', 'video', 'gif', 'voice_message', 'audio', 'file',
+                      'commands', 'forwards', 'emojis', 'profanity', 'replies', 'poll', 'links')
+
+def load_stop_words(config):
+    # Stop words of the configured type plus the English list. If no stop words are found, use a basic default set.
+    words_dir = config.get('words_dir', 'words')
+    stop_words_type = config.get('stop_words_type', 'minimal')
+    stop_words = load_word_list(os.path.join(words_dir, f'stop_words_{stop_words_type}.txt'))
+    stop_words.update(load_word_list(os.path.join(words_dir, 'stop_words_english.txt')))
+    if not stop_words:
+        stop_words = set(DEFAULT_STOP_WORDS)
+    return stop_words
+
+def load_profanity_words(config):
+    return load_word_list(os.path.join(config.get('words_dir', 'words'), 'profanity_words.txt'))
+
+def plain_config(config):
+    # The config dict without modules and dunder entries that vars(config) drags along,
+    # so that it can be sent to worker processes.
+    return {key: value for key, value in config.items()
+            if not key.startswith('__') and not isinstance(value, types.ModuleType)}
+
+def new_message_counts():
+    return dict.fromkeys(MESSAGE_COUNT_KEYS, 0)
+
+def message_counter(message_counts, options, profanity_counts=None):
+    # Returns count_message(record): adds what process_message counted for a MessageRecord to message_counts,
+    # and to profanity_counts the number of messages each profanity word appears in.
+    commands_prefixes = tuple(options['commands_identifiers'])
+    emoji_pattern = options['emoji_pattern']
+    profanity_words = options['profanity_words']
+    profanity = ProfanityMatcher(profanity_words)
+
+    def count_message(record):
+        text = record.text
+        if record.media is not None:
+            message_counts[record.media] += 1
+        if record.links:
+            message_counts['links'] += record.links
+        if record.command or text.strip().startswith(commands_prefixes):
+            message_counts['commands'] += 1
+        if emoji_pattern.search(text):
+            message_counts['emojis'] += 1
+        if profanity_words and profanity.search(record.lower):
+            message_counts['profanity'] += 1
+            if profanity_counts is not None:
+                profanity_counts.update(profanity.found(record.lower))
+        if record.forwarded:
+            message_counts['forwards'] += 1
+        if record.reply:
+            message_counts['replies'] += 1
+
+    return count_message
+
+def normalize_user_id(from_id):
+    # Telegram exports store ids as strings like 'user123' or 'channel123'.
+    if not from_id:
+        return ''
+    if isinstance(from_id, str):
+        if from_id.startswith('user'):
+            return from_id.replace('user', '')
+        if from_id.startswith('channel'):
+            return from_id.replace('channel', '')
+        return from_id
+    return str(from_id)
+
+def run_analysis(input_file, config, aggregate_class, options, channel, use_streaming=False, progress=None,
+                 on_loaded=None):
+    # The driver of analyze_messages and analyze_channel: fills an aggregate_class aggregate from
+    # the date index, the export cache, the saved incremental state or a full pass, whichever
+    # applies first, and returns it with the header of the export.
+    # on_loaded(messages) is called with the messages of a json.load-ed full pass; when it
+    # returns False nothing is analyzed and the aggregate returned is None.
+    # The stages are imported here: they import this module themselves, and start.py imports it
+    # before it knows whether an analysis will run at all.
+    from .analysis_state import StaleStateError, load_analysis_state, messages_after, save_analysis_state
+    from .analyzer_parallel import analysis_workers, analyze_in_chunks
+    from .date_range import date_range
+    from .export_cache import ExportCacheWriter, load_export_cache
+    from .export_index import ExportIndexWriter, load_export_index
+    from .heavy_hitters import token_capacity
+    from .profiler import profile_stage, profiled
+    from .progress import Progress, console_progress
+
+    print_progress = Progress(progress) if progress else console_progress(options['current_texts'])
+    reader = open_export(input_file, config.get('json_backend'))
+    options['token_capacity'] = token_capacity(config, reader.input_file, reader.compression)
+    workers = analysis_workers(config)
+
+    header_data = reader.header
+    aggregate = None
+    use_cache = config.get('analysis_cache', False)
+    incremental = config.get('incremental_analysis', False)
+    use_index = config.get('analysis_index', False)
+    messages_range = date_range(options)
+    if use_index and messages_range is not None and use_streaming and reader.seekable:
+        # Tried before the cache: only the part of the export around the range is parsed, while
+        # the cache would replay the rows of the whole export to pick the ones in the range.
+        index = load_export_index(reader.input_file)
+        if index is not None and index.ordered:
+            aggregate = aggregate_class(options).consume(index.range_messages(reader, messages_range), print_progress)
+            header_data = reader.complete_header()
+    if aggregate is None and use_cache:
+        cache = load_export_cache(reader.input_file, channel=channel)
+        if cache is not None:
+            reader.close()
+            header_data = cache.header
+            print_progress.expect(len(cache))
+            aggregate = aggregate_class(options).consume_records(cache.records(messages_range), print_progress)
+    if aggregate is None and incremental:
+        aggregate = load_analysis_state(reader.input_file, aggregate_class, options, reader.complete_header())
+        if aggregate is not None:
+            try:
+                if use_streaming:
+                    print_progress.track(reader.bytes_read, reader.total_bytes)
+                    messages = reader.messages()
+                else:
+                    with profile_stage('parse'):
+                        header_data = reader.load()
+                    messages = header_data.get('messages', [])
+                    print_progress.expect(len(messages))
+                aggregate.consume(messages_after(messages, aggregate), print_progress)
+            except StaleStateError:
+                # Not the same export plus new messages: start over on a fresh reader.
+                aggregate = None
+                reader.close()
+                reader = open_export(reader.input_file, reader.backend)
+                header_data = reader.header
+    if aggregate is None:
+        # Building the cache needs the serial pass, so that run skips the parallel engine. The cache
+        # would tokenize the messages outside the range too and is left for a run without one. The
+        # index is written along the way by a serial streaming pass over the whole export.
+        writer = ExportCacheWriter(reader.input_file, channel=channel) if use_cache and messages_range is None else None
+        build_index = (use_streaming and use_index and messages_range is None and reader.seekable
+                       and load_export_index(reader.input_file) is None)
+        indexer = None
+        if use_streaming and workers > 1 and writer is None:
+            # Returns None when the export cannot be memory-mapped; the serial path below takes over.
+            aggregate = analyze_in_chunks(reader, aggregate_class, options, workers, print_progress)
+        if aggregate is None:
+            if use_streaming:
+                print_progress.track(reader.bytes_read, reader.total_bytes)
+                messages = reader.messages()
+                if build_index:
+                    indexer = ExportIndexWriter(reader)
+                    messages = indexer.track(messages)
+            else:
+                with profile_stage('parse'):
+                    header_data = reader.load()
+                messages = header_data.get('messages', [])
+                print_progress.expect(len(messages))
+                if on_loaded is not None and on_loaded(messages) is False:
+                    if writer is not None:
+                        writer.abort()
+                    return None, header_data
+            if writer is not None:
+                aggregate = aggregate_class(options).consume_records(writer.extract(profiled(messages, 'parse')), print_progress)
+                writer.save(header_data)
+            else:
+                aggregate = aggregate_class(options).consume(messages, print_progress)
+            if indexer is not None:
+                indexer.save()
+    if incremental:
+        save_analysis_state(reader.input_file, aggregate, options, header_data)
+
+    print_progress(aggregate.processed, final=True)
+    if not progress:
+        # Moves on from the progress line.
+        print('\n')
+    return aggregate, header_data
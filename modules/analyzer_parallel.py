@@ -0,0 +1,148 @@
+import json
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from .json_backend import BulkStream
+
+# Exports smaller than this are analyzed serially: starting the pool would cost more than it saves.
+PARALLEL_MIN_SIZE = 16 * 1024 * 1024
+CHUNK_MIN_SIZE = 4 * 1024 * 1024
+CHUNK_MAX_SIZE = 64 * 1024 * 1024
+
+# Candidate start of a message: '{"id":' right after the comma that separates array items.
+# Telegram writes "id" as the first key of every message and nested objects never start with it,
+# and a quote inside a JSON string is always escaped, so this never matches inside text.
+# Candidates are still only trusted once the chunk before them has been parsed up to them exactly.
+_ITEM_START = re.compile(rb'\}\s*,\s*(\{)\s*"id"\s*:')
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+_worker = {}
+
+def worker_count(workers):
+    # 1 keeps the single-process path, 0 or None uses every core.
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+def analysis_workers(config):
+    return worker_count(config.get('analysis_workers', 1))
+
+def _messages_offset(input_file):
+    # Byte offset right after the '[' of the messages array, or None if there is no array.
+    # Only called for plain exports.
+    with open(input_file, 'rb') as f:
+        stream = BulkStream(f, track_offsets=True)
+        if not stream.read_header({}):
+            return None
+        return stream.byte_offset()
+
+def _chunk_ranges(mapped, start, workers):
+    # Splits the messages array into byte ranges that start at candidate message boundaries.
+    size = len(mapped) - start
+    chunk_size = min(max(size // (workers * 4), CHUNK_MIN_SIZE), CHUNK_MAX_SIZE)
+    boundaries = [start]
+    position = start + chunk_size
+    while position < len(mapped):
+        match = _ITEM_START.search(mapped, position)
+        if match is None:
+            break
+        boundaries.append(match.start(1))
+        position = match.start(1) + chunk_size
+    boundaries.append(len(mapped))
+    return [(boundaries[i], boundaries[i + 1], i == len(boundaries) - 2) for i in range(len(boundaries) - 1)]
+
+def _chunk_messages(text, last, outcome):
+    # Yields the messages of one chunk. outcome['complete'] is set only if the chunk ended exactly
+    # on an item boundary (or on the closing bracket of the array for the last chunk).
+    pos = _WHITESPACE.match(text, 0).end()
+    end = len(text)
+    if last and text.startswith(']', pos):
+        outcome['complete'] = True
+        return
+    while True:
+        message, pos = _decoder.raw_decode(text, pos)
+        if message is not None:
+            yield message
+        pos = _WHITESPACE.match(text, pos).end()
+        char = text[pos:pos + 1]
+        if char == ',':
+            pos = _WHITESPACE.match(text, pos + 1).end()
+            if not last and pos == end:
+                outcome['complete'] = True
+                return
+        elif char == ']' and last:
+            outcome['complete'] = True
+            return
+        else:
+            return
+
+def _analyze_range(mapped, start, stop, last, aggregate_class, options):
+    # Returns the aggregate of the messages in [start, stop), or None if the range turned out
+    # not to start and end on message boundaries.
+    outcome = {'complete': False}
+    aggregate = aggregate_class(options, chunk=True)
+    try:
+        text = mapped[start:stop].decode('utf-8')
+        aggregate.consume(_chunk_messages(text, last, outcome))
+    except ValueError:
+        return None
+    return aggregate if outcome['complete'] else None
+
+def _init_worker(input_file, aggregate_class, options):
+    f = open(input_file, 'rb')
+    _worker['mapped'] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker['file'] = f
+    _worker['aggregate_class'] = aggregate_class
+    _worker['options'] = options
+
+def _analyze_chunk(chunk):
+    start, stop, last = chunk
+    return _analyze_range(_worker['mapped'], start, stop, last, _worker['aggregate_class'], _worker['options'])
+
+def analyze_in_chunks(reader, aggregate_class, options, workers, progress=None):
+    # Memory-maps the export, cuts the messages array into byte ranges and lets a process pool
+    # build one partial aggregate per range. The partial aggregates are merged in file order,
+    # which gives exactly the serial result. A range whose candidate boundary turned out to be
+    # wrong is redone in this process together with the next one.
+    # Returns None when the export is too small or cannot be mapped (compressed exports cannot),
+    # so the caller goes serial.
+    input_file = reader.input_file
+    try:
+        if reader.total_bytes < PARALLEL_MIN_SIZE or reader.compression is not None:
+            return None
+        start = _messages_offset(input_file)
+        if start is None:
+            return None
+        f = open(input_file, 'rb')
+    except (OSError, ValueError):
+        return None
+
+    with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        chunks = _chunk_ranges(mapped, start, workers)
+        total = aggregate_class(options)
+        done = start
+        if progress:
+            progress.track(lambda: done, len(mapped), start)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(input_file, aggregate_class, options)) as executor:
+            redo_start = None
+            for (chunk_start, stop, last), aggregate in zip(chunks, executor.map(_analyze_chunk, chunks)):
+                if redo_start is not None:
+                    aggregate = _analyze_range(mapped, redo_start, stop, last, aggregate_class, options)
+                    chunk_start = redo_start
+                if aggregate is None:
+                    if last:
+                        raise ValueError(f"Malformed messages array in '{input_file}'")
+                    redo_start = chunk_start
+                    continue
+                redo_start = None
+                total.merge(aggregate)
+                done = stop
+                if progress:
+                    progress(total.processed)
+
+    reader.close()
+    reader.complete_header()
+    return total
@@ -1,5 +1,9 @@
+import datetime
 import re
 
+from .analyzer_common import normalize_user_id
+from .profanity import ProfanityMatcher
+
 def process_message(message, config, stop_words, profanity_words, commands_identifiers, emoji_pattern):
     # Minimal comments if needed: process a single message and return partial stats.
     message_counts_local = {
@@ -20,12 +24,101 @@ def process_message(message, config, stop_words, profanity_words, commands_ident
         'links': 0,
     }
 
-    words_local = []
-    phrases_2_local = []
-    phrases_3_local = []
-    links_in_message = set()
+    # The same normalization as extract_message, so both count a message alike.
+    text, text_lower, tokens, links_in_message, _, _, command = normalize_text(message)
+    message_counts_local['links'] += len(links_in_message)
+
+    # words, commands, emojis, profanity
+    words_local = [w for w in tokens if w not in stop_words]
+    phrases_2_local = [f"{a} {b}" for a, b in zip(words_local, words_local[1:])]
+    phrases_3_local = [f"{a} {b} {c}" for a, b, c in zip(words_local, words_local[1:], words_local[2:])]
+
+    if command or text.strip().startswith(tuple(commands_identifiers)):
+        message_counts_local['commands'] += 1
+    if emoji_pattern.search(text):
+        message_counts_local['emojis'] += 1
+    # profanity_words may also be a ProfanityMatcher compiled once by the caller.
+    if isinstance(profanity_words, ProfanityMatcher):
+        has_profanity = profanity_words.search(text_lower)
+    else:
+        has_profanity = any(pw in text_lower for pw in profanity_words)
+    if has_profanity:
+        message_counts_local['profanity'] += 1
+
+    if 'forwarded_from' in message:
+        message_counts_local['forwards'] += 1
+    if 'reply_to_message_id' in message:
+        message_counts_local['replies'] += 1
+
+    media = media_key(message)
+    if media is not None:
+        message_counts_local[media] += 1
+
+    return message_counts_local, words_local, phrases_2_local, phrases_3_local, links_in_message
 
-    text = message.get('text', '')
+MEDIA_KEYS = ('text', 'sticker', 'picture', 'video', 'gif', 'voice_message', 'audio', 'file', 'poll')
+
+# MessageRecord.kind
+SKIPPED = 0   # None, service entries and messages without 'text': only counted as processed
+MESSAGE = 1
+
+# MessageRecord.error_stage: where the original message loop raised the stored exception.
+PROCESS_ERROR = 1     # while process_message ran, before any counter was touched
+REACTIONS_ERROR = 2   # while walking the reactions, after everything else was counted
+
+# Channel posts without an 'author' field; the analyzer substitutes the localized placeholder.
+NO_AUTHOR = object()
+
+_NO_ID = object()
+
+class MessageRecord:
+    # What the analyzers take from one entry of the messages array, before any config
+    # (stop words, bots, profanity, date range, time offset) is applied. Built by
+    # extract_message from JSON and by export_cache from the columnar cache.
+    # text is flattened once and lowercased once (lower); every counter reads these instead of the raw message.
+    __slots__ = ('kind', 'id', 'user', 'user_id', 'text', 'lower', 'tokens', 'links', 'mentions', 'hashtags',
+                 'command', 'media', 'forwarded', 'reply',
+                 'date', 'bad_date', 'reactions', 'error', 'error_stage')
+
+    def __init__(self, kind=SKIPPED):
+        self.kind = kind
+        self.id = _NO_ID
+        self.user = None
+        self.user_id = ''
+        self.text = ''
+        self.lower = ''
+        self.tokens = ()
+        self.links = 0
+        self.mentions = ()
+        self.hashtags = ()
+        self.command = False
+        self.media = None
+        self.forwarded = False
+        self.reply = False
+        self.date = None
+        self.bad_date = None
+        self.reactions = ()
+        self.error = None
+        self.error_stage = 0
+
+    @property
+    def has_id(self):
+        return self.id is not _NO_ID
+
+    @property
+    def reaction_key(self):
+        # message.get('id', 0)
+        return self.id if self.id is not _NO_ID else 0
+
+    @property
+    def error_id(self):
+        # message.get('id', 'Unknown')
+        return self.id if self.id is not _NO_ID else 'Unknown'
+
+SKIPPED_RECORD = MessageRecord()
+
+def flatten_text(text):
+    # Telegram stores formatted text as a list of plain strings and entity dicts.
     if isinstance(text, list):
         text_pieces = []
         for t_piece in text:
@@ -36,83 +129,175 @@ def process_message(message, config, stop_words, profanity_words, commands_ident
         text = ''.join(text_pieces)
     if text is None:
         text = ''
+    return text
 
-    # links
-    text_content = message.get('text', [])
-    if isinstance(text_content, list):
-        for part in text_content:
-            if isinstance(part, dict) and part.get('type') == 'text_link':
-                href = part.get('href')
-                if href:
-                    links_in_message.add(href)
-    text_entities = message.get('text_entities', [])
-    for entity in text_entities:
-        if entity.get('type') == 'text_link':
-            href = entity.get('href')
-            if href:
-                links_in_message.add(href)
-    message_counts_local['links'] += len(links_in_message)
+_PUNCTUATION = re.compile(r'[^\w\s]')
 
-    # words, commands, emojis, profanity
-    text_clean = re.sub(r'[^\w\s]', '', text.lower())
-    words_in_text = [w for w in text_clean.split() if w.isalpha()]
-    words_filtered = [w for w in words_in_text if w not in stop_words]
+# text_entities types whose text is not prose: left out of the words and phrases.
+NON_WORD_ENTITIES = frozenset(('link', 'email', 'phone', 'mention', 'mention_name', 'hashtag', 'cashtag',
+                               'bot_command', 'bank_card'))
 
-    for i in range(len(words_filtered) - 1):
-        phrase_2 = f"{words_filtered[i]} {words_filtered[i+1]}"
-        phrases_2_local.append(phrase_2)
-        if i < len(words_filtered) - 2:
-            phrase_3 = f"{words_filtered[i]} {words_filtered[i+1]} {words_filtered[i+2]}"
-            phrases_3_local.append(phrase_3)
+def tokenize(text_lower):
+    # Words of an already lowercased text without punctuation, in order; stop words are removed later.
+    # Removing punctuation never joins or splits the pieces of split(), so only the pieces that
+    # are not all letters need the regex.
+    words = []
+    for piece in text_lower.split():
+        if piece.isalpha():
+            words.append(piece)
+        else:
+            piece = _PUNCTUATION.sub('', piece)
+            if piece.isalpha():
+                words.append(piece)
+    return words
 
-    words_local.extend([w for w in words_in_text if w not in stop_words])
+def read_entities(entities):
+    # What the typed text_entities of a message tell without looking at the text: the text to take
+    # words from (None when every entity is prose, i.e. the whole text), the 'link' URLs, the
+    # lowercased mentions and hashtags, and whether the message starts with a bot command.
+    # None when the entities are missing or malformed; the caller then falls back to the text alone.
+    if not entities or not isinstance(entities, list):
+        return None
+    pieces = []
+    urls = []
+    mentions = []
+    hashtags = []
+    command = None
+    prose_only = True
+    for entity in entities:
+        if not isinstance(entity, dict):
+            return None
+        piece = entity.get('text', '')
+        if not isinstance(piece, str):
+            return None
+        entity_type = entity.get('type')
+        if command is None and not piece.isspace() and piece:
+            command = entity_type == 'bot_command'
+        if entity_type in NON_WORD_ENTITIES:
+            prose_only = False
+            pieces.append(' ')
+            if entity_type == 'link':
+                urls.append(piece)
+            elif entity_type == 'mention':
+                mentions.append(piece.lower())
+            elif entity_type == 'hashtag':
+                hashtags.append(piece.lower())
+        else:
+            pieces.append(piece)
+    return None if prose_only else ''.join(pieces), urls, mentions, hashtags, bool(command)
 
-    if text.strip().startswith(tuple(commands_identifiers)):
-        message_counts_local['commands'] += 1
-    if emoji_pattern.search(text):
-        message_counts_local['emojis'] += 1
+def normalize_text(message):
+    # (text, lowercased text, tokens, link set, mentions, hashtags, starts with a bot command)
+    # of a raw message. With text_entities, links, mentions, hashtags and commands come from the
+    # entities and words only from the prose ones; without, everything comes from the text.
+    text = flatten_text(message.get('text', ''))
+    links = text_links(message)
     text_lower = text.lower()
-    if any(pw in text_lower for pw in profanity_words):
-        message_counts_local['profanity'] += 1
+    entities = read_entities(message.get('text_entities'))
+    if entities is None:
+        return text, text_lower, tokenize(text_lower), links, (), (), False
+    words_text, urls, mentions, hashtags, command = entities
+    links.update(urls)
+    tokens = tokenize(text_lower if words_text is None else words_text.lower())
+    return text, text_lower, tokens, links, mentions, hashtags, command
 
-    if 'forwarded_from' in message:
-        message_counts_local['forwards'] += 1
-    if 'reply_to_message_id' in message:
-        message_counts_local['replies'] += 1
-
-    # media type
+def media_key(message):
+    # The message_counts key of the message's media, or None for unknown media types.
     if 'media_type' in message:
         media_type = message['media_type']
         file_name = message.get('file', '') or message.get('file_name', '')
         if media_type == 'sticker':
-            message_counts_local['sticker'] += 1
+            return 'sticker'
         elif media_type == 'photo':
-            message_counts_local['picture'] += 1
+            return 'picture'
         elif media_type == 'video_file':
-            if 'gif' in file_name.lower():
-                message_counts_local['gif'] += 1
-            else:
-                message_counts_local['video'] += 1
+            return 'gif' if 'gif' in file_name.lower() else 'video'
         elif media_type in ('voice_message', 'video_message'):
-            message_counts_local['voice_message'] += 1
+            return 'voice_message'
         elif media_type == 'audio_file':
-            message_counts_local['audio'] += 1
+            return 'audio'
         elif media_type == 'document':
-            message_counts_local['file'] += 1
+            return 'file'
         elif media_type == 'animation':
-            message_counts_local['gif'] += 1
+            return 'gif'
         elif media_type == 'poll':
-            message_counts_local['poll'] += 1
-        else:
-            # count as media if needed
-            pass
+            return 'poll'
+        return None
+    if 'photo' in message:
+        return 'picture'
+    elif 'file' in message:
+        return 'file'
+    return 'text'
+
+def text_links(message):
+    # The distinct hrefs of the message's text links.
+    links_in_message = set()
+    text_content = message.get('text', [])
+    if isinstance(text_content, list):
+        for part in text_content:
+            if isinstance(part, dict) and part.get('type') == 'text_link':
+                href = part.get('href')
+                if href:
+                    links_in_message.add(href)
+    for entity in message.get('text_entities', []):
+        if entity.get('type') == 'text_link':
+            href = entity.get('href')
+            if href:
+                links_in_message.add(href)
+    return links_in_message
+
+def extract_message(message, channel=False, date_time=None):
+    # Turns one raw message into a MessageRecord. Errors the message loops used to hit are
+    # stored in the record and re-raised by the aggregate at the same point of the loop,
+    # so that partially counted broken messages stay counted exactly as before.
+    # date_time is the message's date when the caller already parsed it (the date range filter).
+    if message is None or message.get('type') != 'message' or 'text' not in message:
+        return SKIPPED_RECORD
+    record = MessageRecord(MESSAGE)
+    record.id = message.get('id', _NO_ID)
+    if channel:
+        record.user = message.get('author', NO_AUTHOR)
+        record.user_id = normalize_user_id(message.get('from_id', ''))
     else:
-        # if no media_type but photo or file keys
-        if 'photo' in message:
-            message_counts_local['picture'] += 1
-        elif 'file' in message:
-            message_counts_local['file'] += 1
-        else:
-            message_counts_local['text'] += 1
+        record.user = message.get('from', '') or message.get('actor', 'Unknown')
+        from_id = message.get('from_id', '') or message.get('actor_id', '') or message.get('id', '')
+        record.user_id = normalize_user_id(from_id)
+
+    # The date comes first so that every record of a dated message has it, as date_range expects.
+    message_date = message.get('date')
+    if date_time is not None:
+        record.date = date_time
+    elif message_date:
+        try:
+            record.date = datetime.datetime.fromisoformat(message_date)
+        except Exception:
+            # Parsed again by the aggregate, which reports the error where the loop always did.
+            record.bad_date = message_date
+
+    try:
+        text, text_lower, tokens, links, mentions, hashtags, command = normalize_text(message)
+        record.text = text
+        record.lower = text_lower
+        record.tokens = tokens
+        record.links = len(links)
+        record.mentions = mentions
+        record.hashtags = hashtags
+        record.command = command
+        record.forwarded = 'forwarded_from' in message
+        record.reply = 'reply_to_message_id' in message
+        record.media = media_key(message)
+    except Exception as e:
+        record.error = e
+        record.error_stage = PROCESS_ERROR
+        return record
 
-    return message_counts_local, words_local, phrases_2_local, phrases_3_local, links_in_message
\ No newline at end of file
+    reactions = []
+    try:
+        for r in message.get('reactions', []):
+            if r.get('type') == 'emoji':
+                reactions.append((r['emoji'], r.get('count', 0)))
+    except Exception as e:
+        record.error = e
+        record.error_stage = REACTIONS_ERROR
+    record.reactions = reactions
+    return record
@@ -0,0 +1,188 @@
+import datetime
+import time
+
+from .analyzer_common import ExportReader, plain_config
+from .json_backend import select_backend
+from .locales import load_texts
+from .report_generator import generate_text_report, generate_json_report
+
+# The analysis as a library, for programs that run it themselves (a service, a worker process):
+# nothing here prompts or writes to stdout. analyze() returns an Analysis, and the reports and
+# plots are separate calls that take it.
+#
+#   from modules import api
+#   analysis = api.analyze('result.json', {'stop_words_type': 'extended'}, date_range=(start, end),
+#                          engine='parallel', progress=on_progress, log=logger.info)
+#   if not analysis.empty:
+#       api.text_report(analysis, 'report.txt')
+#       api.plots(analysis, 'plot_<year>.png')
+#
+# Locales and word lists are read once per process and reused by later calls (a word list is
+# read again when its file changes), so a long-lived process pays for them once. Importing this
+# module is cheap: the analyzers and matplotlib are imported by the first call that needs them.
+
+AUTHOR_GITHUB_LINK = 'https://github.com/TheTeslak/TesTeleStat'
+AUTHOR_TELEGRAM_CHANNEL = 'https://t.me/TesNot'
+
+# streaming: one pass over the export in this process. parallel: the export split between
+# analysis_workers processes (every core when the config says 1). load: json.load of the whole
+# export, which needs it in memory. auto: streaming with the analysis_workers of the config.
+ENGINES = ('auto', 'streaming', 'parallel', 'load')
+CHANNEL_TYPES = ('public_channel', 'private_channel')
+
+class InvalidExportError(ValueError):
+    # The file is not a JSON export of a Telegram chat (an HTML export, a truncated file, ...).
+    pass
+
+class Analysis:
+    # What analyze() found in one export. results is the dict the reports are generated from
+    # ({} when no message was in the date range); errors are the messages that could not be
+    # processed, unprocessed_messages their number.
+    def __init__(self, path, chat_type, results, error_info, config, language, texts, seconds):
+        self.path = path
+        self.chat_type = chat_type
+        self.results = results
+        self.errors = error_info['errors']
+        self.unprocessed_messages = error_info['unprocessed_messages']
+        self.config = config
+        self.language = language
+        self.texts = texts
+        self.seconds = seconds
+
+    @property
+    def empty(self):
+        return not self.results.get('total_messages', 0)
+
+    @property
+    def total_messages(self):
+        return self.results.get('total_messages', 0)
+
+    @property
+    def chat_name(self):
+        return self.results.get('chat_name')
+
+    @property
+    def is_personal_chat(self):
+        return self.chat_type == 'personal_chat'
+
+    @property
+    def is_channel(self):
+        return self.chat_type in CHANNEL_TYPES
+
+def _ignore(*args):
+    pass
+
+def settings(config=None):
+    # config.py with the settings of config (a dict or a module like config.py) on top.
+    import config as config_module
+    run_config = plain_config(vars(config_module))
+    if config is not None:
+        run_config.update(plain_config(config if isinstance(config, dict) else vars(config)))
+    return run_config
+
+def _as_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    raise TypeError(f"expected a date or a datetime, got {type(value).__name__}")
+
+def _date_range(date_range):
+    if date_range is None:
+        return None, None
+    start_date, end_date = (_as_datetime(value) for value in date_range)
+    if end_date < start_date:
+        raise ValueError(f"the date range ends ({end_date:%d.%m.%Y}) before it starts ({start_date:%d.%m.%Y})")
+    return start_date, end_date
+
+def _use_streaming(engine, run_config):
+    # Adjusts run_config to engine; returns the use_streaming of the analyzers.
+    from .analyzer_parallel import worker_count
+
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+    if engine == 'streaming':
+        run_config['analysis_workers'] = 1
+    elif engine == 'parallel' and worker_count(run_config.get('analysis_workers', 1)) == 1:
+        run_config['analysis_workers'] = 0
+    return engine != 'load'
+
+def analyze(path, config=None, date_range=None, engine='auto', language='en', progress=None, log=None):
+    # Analyzes the export at path (which may be compressed) and returns an Analysis.
+    # config: settings that override config.py, as a dict or a module. date_range: (start, end)
+    # as dates or datetimes, both days included; None covers the whole export. language: of the
+    # day and month names and of the texts the reports are written in.
+    # progress(snapshot) gets the snapshots of modules.progress, log(line) the status lines the
+    # console would print. Raises FileNotFoundError, or InvalidExportError for a file that is
+    # not an export.
+    from .analyzer_chats import analyze_messages
+    from .analyzer_channels import analyze_channel
+
+    run_config = settings(config)
+    use_streaming = _use_streaming(engine, run_config)
+    start_date, end_date = _date_range(date_range)
+    texts = load_texts(language)
+    log = log or _ignore
+    start_time = time.perf_counter()
+
+    try:
+        reader = ExportReader(path, select_backend(run_config.get('json_backend', 'auto')))
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        raise InvalidExportError(texts['invalid_json']) from e
+    with reader:
+        try:
+            header_data = reader.complete_header()
+        except Exception as e:
+            raise InvalidExportError(texts['invalid_json']) from e
+        if not header_data:
+            raise InvalidExportError(texts['invalid_json'])
+        chat_type = header_data.get('type', 'group')
+        log(texts['json_backend_active'].format(reader.backend))
+        if chat_type in CHANNEL_TYPES:
+            results, error_info = analyze_channel(
+                reader, run_config, texts, start_date=start_date, end_date=end_date, language=language,
+                use_streaming=use_streaming, progress=progress or _ignore, log=log)
+        else:
+            results, error_info = analyze_messages(
+                reader, run_config, texts, chat_type == 'personal_chat', use_streaming=use_streaming,
+                start_date=start_date, end_date=end_date, language=language, progress=progress or _ignore, log=log)
+    return Analysis(path, chat_type, results, error_info, run_config, language, texts,
+                    time.perf_counter() - start_time)
+
+def _require_messages(analysis):
+    if analysis.empty:
+        raise ValueError(f"'{analysis.path}' has no messages to report on")
+
+def text_report(analysis, output_filename, author_links=(AUTHOR_GITHUB_LINK, AUTHOR_TELEGRAM_CHANNEL)):
+    # The text report of analysis; the author links are written when the config's
+    # show_author_links is on.
+    _require_messages(analysis)
+    generate_text_report(analysis.results, analysis.config, analysis.texts, output_filename, *author_links,
+                         is_personal_chat=analysis.is_personal_chat)
+    return output_filename
+
+def json_report(analysis, output_filename):
+    _require_messages(analysis)
+    generate_json_report(analysis.results, output_filename)
+    return output_filename
+
+def plots(analysis, plot_filename_template):
+    # One plot per year, saved to plot_filename_template with <year> replaced; returns their paths.
+    # matplotlib is only imported by the first call.
+    from . import visualization
+
+    _require_messages(analysis)
+    results = analysis.results
+    if analysis.is_personal_chat:
+        visualization.generate_personal_chat_plots(results, plot_filename_template, analysis.config, analysis.texts)
+        years = results['daily_user_messages'].years()
+    elif analysis.is_channel:
+        visualization.generate_channel_plots(results, plot_filename_template, analysis.config, analysis.texts)
+        years = sorted({year for key in ('date_messages', 'reactions_by_date') if results.get(key)
+                        for year in results[key].years()})
+    else:
+        visualization.generate_group_chat_plots(results, plot_filename_template, analysis.config, analysis.texts)
+        years = results['date_messages'].years()
+    return [plot_filename_template.replace('<year>', str(year)) for year in years]
@@ -0,0 +1,54 @@
+import collections
+
+from .analyzer_common import is_bot
+
+class AuthorRegistry:
+    # Small-integer keys for the authors of an analysis, in the order they first appear.
+    # The per-user counters of the aggregates are indexed by key, so each distinct name is hashed
+    # into the registry and checked against bot_identifiers once instead of on every message,
+    # and only results() turns the keys back into names.
+    # Authors are told apart by name, as the counters always did: ids[key] is the normalized id
+    # of the author's latest message.
+    def __init__(self, bot_identifiers):
+        self.bot_identifiers = bot_identifiers
+        self.names = []
+        self.ids = []
+        # is_bot() of each name, or None if it raised; the aggregate then calls it again to
+        # report the error on every message of that author, as before.
+        self.bots = []
+        self.keys = {}
+
+    def add(self, name):
+        # Key of name, registering it if it is new. Raises TypeError for unhashable names.
+        key = self.keys.get(name)
+        if key is None:
+            key = self.keys[name] = len(self.names)
+            self.names.append(name)
+            self.ids.append('')
+            try:
+                self.bots.append(is_bot(name, self.bot_identifiers))
+            except Exception:
+                self.bots.append(None)
+        return key
+
+    def merge(self, other):
+        # Adds the authors of the chunk that follows this one; returns the list that maps
+        # other's keys to keys of this registry.
+        keys = []
+        for other_key, name in enumerate(other.names):
+            key = self.add(name)
+            self.ids[key] = other.ids[other_key]
+            keys.append(key)
+        return keys
+
+    def named(self, counter):
+        # counter with the keys replaced by author names.
+        names = self.names
+        return collections.Counter({names[key]: value for key, value in counter.items()})
+
+    def user_ids(self):
+        return dict(zip(self.names, self.ids))
+
+def rekeyed(counter, keys):
+    # counter with its author keys mapped through keys (from AuthorRegistry.merge).
+    return collections.Counter({keys[key]: value for key, value in counter.items()})
@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import datetime
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak memory is not reported.
+    resource = None
+
+from .analyzer_common import ExportReader, plain_config
+from .analyzer_chats import analyze_messages
+from .analyzer_channels import analyze_channel
+from .json_backend import select_backend
+from .profiler import config_profiler, profile_stage, profiling
+from .report_generator import generate_text_report, generate_json_report
+
+# Headless mode of start.py: analyzes every export given on the command line with the settings
+# of the config, without prompts. Each export is analyzed in a process of its own pool, so one
+# export that fails (or crashes its process) is reported and the others go on.
+#
+#   python start.py exports/*/result.json --config confignew.py --date-range 01.01.2024-31.12.2024 --format txt json --jobs 4
+
+FORMATS = ('txt', 'json', 'plots')
+CHANNEL_TYPES = ('public_channel', 'private_channel')
+
+def expand_paths(patterns):
+    # Export paths of the command line with globs expanded, in order and without repeats. A
+    # pattern that matches nothing is kept as it is, so that it is reported as not found.
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches or [pattern]:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def load_config_file(path, defaults):
+    # A config file is Python like config.py (or the confignew.py the console configuration
+    # saves); its settings override defaults.
+    settings = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        exec(f.read(), settings)
+    config = dict(defaults)
+    config.update(settings)
+    return plain_config(config)
+
+def parse_date_range(text):
+    # 'DD.MM.YYYY-DD.MM.YYYY', as the console asks for it.
+    try:
+        start_str, end_str = text.split('-')
+        start_date = datetime.datetime.strptime(start_str.strip(), "%d.%m.%Y")
+        end_date = datetime.datetime.strptime(end_str.strip(), "%d.%m.%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected DD.MM.YYYY-DD.MM.YYYY, got '{text}'")
+    if end_date < start_date:
+        raise argparse.ArgumentTypeError(f"the range '{text}' ends before it starts")
+    return start_date, end_date
+
+def peak_memory_mb():
+    # Peak resident memory of this process and of the largest process it started, or None.
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def output_filename(job, chat_name):
+    chat_name = chat_name.replace(' ', '_').replace('/', '_')
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    filename = job['config']['output_filename_pattern'].replace('<chat_name>', chat_name).replace('<timestamp>', timestamp)
+    if job['numbered']:
+        # Exports of the same chat finishing in the same second must not overwrite each other.
+        root, ext = os.path.splitext(filename)
+        filename = f"{root}_{job['index']}{ext}"
+    return os.path.join(job['output_dir'], filename)
+
+def analyze_export(job):
+    # Analyzes one export and writes its reports; runs in a worker process. Returns the summary
+    # that run_batch prints: status is 'ok', 'empty' or 'failed'.
+    path = job['path']
+    summary = {'path': path, 'status': 'failed', 'messages': 0, 'seconds': 0.0, 'peak_mb': None,
+               'output': None, 'error': None}
+    config = job['config']
+    current_texts = job['texts']
+    profiler = config_profiler(config)
+    start_time = time.perf_counter()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), profiling(profiler):
+            try:
+                with profile_stage('header'):
+                    reader = ExportReader(path, select_backend(config.get('json_backend', 'auto')))
+                    header_data = reader.complete_header()
+            except FileNotFoundError:
+                summary['error'] = current_texts['file_not_found'].format(path)
+                return summary
+            if not header_data:
+                reader.close()
+                summary['error'] = current_texts['invalid_json']
+                return summary
+            chat_type = header_data.get('type', 'group')
+            with profile_stage('analyze'):
+                if chat_type in CHANNEL_TYPES:
+                    analysis_results, error_info = analyze_channel(
+                        reader, config, current_texts, start_date=job['start_date'], end_date=job['end_date'],
+                        language=job['language'], use_streaming=True)
+                else:
+                    analysis_results, error_info = analyze_messages(
+                        reader, config, current_texts, chat_type == 'personal_chat', use_streaming=True,
+                        start_date=job['start_date'], end_date=job['end_date'], language=job['language'])
+
+            if not analysis_results.get('total_messages', 0):
+                summary['status'] = 'empty'
+                return summary
+
+            filename = output_filename(job, analysis_results['chat_name'])
+            formats = job['formats']
+            if 'txt' in formats:
+                with profile_stage('text_report'):
+                    generate_text_report(analysis_results, config, current_texts, filename, *job['author_links'],
+                                         is_personal_chat=(chat_type == 'personal_chat'))
+            if 'json' in formats:
+                with profile_stage('json_report'):
+                    generate_json_report(analysis_results, filename.replace('.txt', '.json'))
+            if 'plots' in formats:
+                # matplotlib is only loaded by the exports that get plots.
+                from .visualization import generate_personal_chat_plots, generate_group_chat_plots
+                with profile_stage('plots'):
+                    if chat_type == 'personal_chat':
+                        generate_personal_chat_plots(analysis_results, filename.replace('.txt', '_plot_<year>.png'),
+                                                     config, current_texts)
+                    elif chat_type not in CHANNEL_TYPES:
+                        generate_group_chat_plots(analysis_results, filename.replace('.txt', '_group_plot_<year>.png'),
+                                                  config, current_texts)
+            errors = error_info['errors']
+            if errors:
+                with open(os.path.splitext(filename)[0] + '_errors.txt', 'w', encoding='utf-8') as error_log:
+                    for err in errors:
+                        error_log.write(err + "\n")
+
+        if profiler is not None:
+            profiler.save(filename.replace('.txt', '_profile.json'), input_file=path, chat_type=chat_type,
+                          messages=analysis_results['total_messages'])
+        summary.update(status='ok', messages=analysis_results['total_messages'], output=filename)
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        summary['seconds'] = time.perf_counter() - start_time
+        summary['peak_mb'] = peak_memory_mb()
+    return summary
+
+def _executor(jobs):
+    # One process per export, so that peak memory is that export's alone and a leak or a crash
+    # does not carry over. max_tasks_per_child needs Python 3.11.
+    try:
+        return ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1)
+    except TypeError:
+        return ProcessPoolExecutor(max_workers=jobs)
+
+def _failed(job, error):
+    return {'path': job['path'], 'status': 'failed', 'messages': 0, 'seconds': 0.0, 'peak_mb': None,
+            'output': None, 'error': f"{type(error).__name__}: {error}"}
+
+def print_summary(summary, current_texts):
+    path = summary['path']
+    if summary['status'] == 'ok':
+        seconds = summary['seconds']
+        rate = summary['messages'] / seconds if seconds else 0
+        peak = f"{summary['peak_mb']:.0f} MB" if summary['peak_mb'] is not None else '—'
+        print(current_texts['batch_file_done'].format(path, summary['messages'], seconds, f"{rate:.0f}", peak, summary['output']))
+    elif summary['status'] == 'empty':
+        print(current_texts['batch_file_empty'].format(path))
+    else:
+        print(current_texts['batch_file_failed'].format(path, summary['error']))
+
+def run_batch(jobs, workers, current_texts):
+    # Runs analyze_export over jobs with workers processes; returns the summaries in job order.
+    summaries = {}
+    broken = []
+    with _executor(workers) as executor:
+        futures = {executor.submit(analyze_export, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                summary = future.result()
+            except BrokenProcessPool:
+                broken.append(job)
+                continue
+            except Exception as e:
+                summary = _failed(job, e)
+            summaries[job['index']] = summary
+            print_summary(summary, current_texts)
+    # A worker that died (killed for memory, crashed in native code) takes the pool and every
+    # export in flight with it. Those run again one at a time, so only the one that crashed fails.
+    for job in sorted(broken, key=lambda job: job['index']):
+        with _executor(1) as executor:
+            try:
+                summary = executor.submit(analyze_export, job).result()
+            except Exception as e:
+                summary = _failed(job, e)
+        summaries[job['index']] = summary
+        print_summary(summary, current_texts)
+    return [summaries[job['index']] for job in jobs]
+
+def main(argv, config_module, load_texts, languages, author_links):
+    # Entry point of `python start.py <exports>`. Returns the exit status: 1 if an export failed.
+    parser = argparse.ArgumentParser(prog='start.py', description="Analyze Telegram exports without prompts.")
+    parser.add_argument('exports', nargs='+', help='Export files or glob patterns (quote them to let start.py expand **)')
+    parser.add_argument('--config', help='Python config file like config.py; its settings override config.py')
+    parser.add_argument('--date-range', type=parse_date_range, help='DD.MM.YYYY-DD.MM.YYYY')
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=['txt', 'plots'], dest='formats',
+                        help='Reports to write (default: txt plots)')
+    parser.add_argument('--output-dir', default='.', help='Folder for the reports (default: current folder)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Exports analyzed at the same time; 0 uses every core (default: 1)')
+    parser.add_argument('--language', choices=languages, default='en' if 'en' in languages else languages[0])
+    parser.add_argument('--profile', action='store_true', help='Write a JSON profile of the stages next to each report')
+    args = parser.parse_args(argv)
+
+    config = plain_config(vars(config_module))
+    if args.config:
+        config = load_config_file(args.config, config)
+    if args.profile:
+        config['profile'] = True
+    workers = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    if workers > 1:
+        # The exports already share the cores; a pool per export on top would oversubscribe them.
+        config['analysis_workers'] = 1
+    current_texts = load_texts(args.language)
+    start_date, end_date = args.date_range or (None, None)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    paths = expand_paths(args.exports)
+    jobs = [{
+        'index': index,
+        'path': path,
+        'numbered': len(paths) > 1,
+        'config': config,
+        'texts': current_texts,
+        'language': args.language,
+        'start_date': start_date,
+        'end_date': end_date,
+        'formats': set(args.formats),
+        'output_dir': args.output_dir,
+        'author_links': author_links,
+    } for index, path in enumerate(paths, 1)]
+
+    start_time = time.perf_counter()
+    summaries = run_batch(jobs, min(workers, len(jobs)), current_texts)
+    failed = sum(1 for summary in summaries if summary['status'] == 'failed')
+    analyzed = sum(1 for summary in summaries if summary['status'] == 'ok')
+    print(current_texts['batch_summary'].format(time.perf_counter() - start_time, analyzed, len(jobs), failed))
+    return 1 if failed else 0
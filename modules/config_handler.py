@@ -76,9 +76,24 @@ def configure_in_console(config, current_texts, is_personal_chat):
     temp_config['day_names'] = config.day_names
     temp_config['month_names'] = config.month_names
     temp_config['top_days_count'] = config.top_days_count
+    temp_config['top_profanity_count'] = getattr(config, 'top_profanity_count', 10)
+    temp_config['top_mentions_count'] = getattr(config, 'top_mentions_count', 10)
+    temp_config['top_hashtags_count'] = getattr(config, 'top_hashtags_count', 10)
+    temp_config['top_posts_count'] = getattr(config, 'top_posts_count', 10)
     temp_config['bot_identifiers'] = config.bot_identifiers
     temp_config['emojis'] = config.emojis
     temp_config['words_dir'] = config.words_dir
+    temp_config['json_backend'] = getattr(config, 'json_backend', 'auto')
+    temp_config['analysis_workers'] = getattr(config, 'analysis_workers', 1)
+    temp_config['analysis_cache'] = getattr(config, 'analysis_cache', False)
+    temp_config['incremental_analysis'] = getattr(config, 'incremental_analysis', False)
+    temp_config['analysis_index'] = getattr(config, 'analysis_index', False)
+    temp_config['token_counting'] = getattr(config, 'token_counting', 'auto')
+    temp_config['approximate_counting_threshold_mb'] = getattr(config, 'approximate_counting_threshold_mb', 1024)
+    temp_config['approximate_counting_capacity'] = getattr(config, 'approximate_counting_capacity', 100000)
+    temp_config['profile'] = getattr(config, 'profile', False)
+    temp_config['profile_memory'] = getattr(config, 'profile_memory', False)
+    temp_config['profile_cprofile'] = getattr(config, 'profile_cprofile', False)
 
     return temp_config
 
@@ -0,0 +1,298 @@
+import collections
+import datetime
+from collections.abc import Mapping
+
+import numpy as np
+
+# Per-day statistics of the aggregates. Instead of dicts keyed by datetime.date they are NumPy
+# arrays indexed by day, so a day costs 8 bytes instead of a dict entry and a date object, top
+# days and per-year slices are array operations, and the plots get the arrays as they are.
+# Both classes read like the dicts they replace: iterating yields the dates that were added, in
+# order, and series[day] / series.get(day, 0) look a day up.
+#
+# add() is called once per message, and a NumPy element update from Python costs more than a
+# dict update. Exports are in date order, so add() sums the values of the current day in Python
+# and only writes them to the arrays when the next day starts; every read writes them first.
+
+_EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+def day_dates(ordinals):
+    # datetime64[D] array of date ordinals, which matplotlib plots as dates.
+    return (np.asarray(ordinals, dtype=np.int64) - _EPOCH).astype('datetime64[D]')
+
+def day_years(ordinals):
+    return day_dates(ordinals).astype('datetime64[Y]').astype(np.int64) + 1970
+
+class DailySeries(Mapping):
+    # One total per day: values[i] belongs to the day with ordinal start + i. The array grows in
+    # both directions as days outside it come in, doubling so that a series of n days is only
+    # reallocated log(n) times. present marks the days that were added, as the keys of the dict
+    # were: a day of stickers only has a symbol total of 0 and is still a day of the series.
+    # Totals are int64; a value that is not an integer (a broken reaction count) turns the
+    # series into float64 rather than being truncated.
+    def __init__(self):
+        self.start = None
+        self.values = np.zeros(0, dtype=np.int64)
+        self.present = np.zeros(0, dtype=bool)
+        self._day = None
+        self._pending = 0
+
+    def add(self, day, value=1):
+        # day is a datetime.date.
+        if day == self._day:
+            self._pending += value
+        else:
+            self._flush()
+            self._day = day
+            self._pending = value
+
+    def _flush(self):
+        if self._day is not None:
+            # _index() may replace values, so it runs before values is looked up.
+            index = self._index(self._day.toordinal())
+            pending = self._pending
+            if not isinstance(pending, (int, np.integer)):
+                self.values = self.values.astype(np.float64)
+                pending = float(pending)
+            self.values[index] += pending
+            self.present[index] = True
+            self._day = None
+            self._pending = 0
+
+    def _index(self, ordinal):
+        # Index of ordinal in values and present, growing the arrays to cover it.
+        if self.start is None:
+            self.start = ordinal
+            self.values = np.zeros(64, dtype=self.values.dtype)
+            self.present = np.zeros(64, dtype=bool)
+        index = ordinal - self.start
+        size = len(self.values)
+        if index < 0:
+            extra = max(-index, size)
+            self.values = np.concatenate((np.zeros(extra, dtype=self.values.dtype), self.values))
+            self.present = np.concatenate((np.zeros(extra, dtype=bool), self.present))
+            self.start -= extra
+            index += extra
+        elif index >= size:
+            extra = max(index + 1, 2 * size) - size
+            self.values = np.concatenate((self.values, np.zeros(extra, dtype=self.values.dtype)))
+            self.present = np.concatenate((self.present, np.zeros(extra, dtype=bool)))
+        return index
+
+    def update(self, other):
+        # Adds the totals of another DailySeries.
+        self._flush()
+        other._flush()
+        if other.start is None:
+            return
+        end = other.start + len(other.values)
+        self._index(end - 1)
+        offset = self._index(other.start)
+        if self.values.dtype != other.values.dtype:
+            self.values = self.values.astype(np.result_type(self.values, other.values))
+        self.values[offset:offset + len(other.values)] += other.values
+        self.present[offset:offset + len(other.present)] |= other.present
+
+    def ordinals(self):
+        # Ordinals of the days that were added, ascending.
+        self._flush()
+        return np.flatnonzero(self.present) + (self.start or 0)
+
+    def totals(self, ordinals):
+        # Totals of the given day ordinals, 0 outside the series.
+        self._flush()
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        result = np.zeros(len(ordinals), dtype=self.values.dtype)
+        if self.start is not None:
+            index = ordinals - self.start
+            inside = (index >= 0) & (index < len(self.values))
+            result[inside] = self.values[index[inside]]
+        return result
+
+    def most_common(self, n=None):
+        # [(date, total)] of the n largest totals; equal totals keep date order.
+        self._flush()
+        if n is not None and n <= 0:
+            return []
+        index = np.flatnonzero(self.present)
+        values = self.values[index]
+        if n is not None and n < len(index):
+            # Only the days that can reach the top n are sorted.
+            cut = np.partition(values, len(values) - n)[len(values) - n]
+            keep = values >= cut
+            index, values = index[keep], values[keep]
+        order = np.argsort(-values, kind='stable')[:n]
+        return [(datetime.date.fromordinal(int(self.start + index[i])), values[i].item()) for i in order]
+
+    def years(self):
+        return sorted(set(day_years(self.ordinals()).tolist()))
+
+    def __getitem__(self, day):
+        self._flush()
+        if self.start is None:
+            return 0
+        index = day.toordinal() - self.start
+        return self.values[index].item() if 0 <= index < len(self.values) else 0
+
+    def __iter__(self):
+        return (datetime.date.fromordinal(int(ordinal)) for ordinal in self.ordinals())
+
+    def __len__(self):
+        self._flush()
+        return int(np.count_nonzero(self.present))
+
+    def __contains__(self, day):
+        if not isinstance(day, datetime.date):
+            return False
+        self._flush()
+        index = day.toordinal() - (self.start or 0)
+        return self.start is not None and 0 <= index < len(self.present) and bool(self.present[index])
+
+    def __getstate__(self):
+        self._flush()
+        return self.__dict__.copy()
+
+class DailyUserSeries(Mapping):
+    # Per-day, per-author counts: a users × days matrix kept sparse as parallel arrays of
+    # (day ordinal, author key, count) entries, so its size follows the (day, author) pairs that
+    # occur and not the number of authors times the number of days.
+    # series[day] is a Counter of the authors of that day; rows() gives dense rows for plotting.
+    # Authors are AuthorRegistry keys; named() returns a view labelled with author names.
+    def __init__(self):
+        self.days = np.zeros(0, dtype=np.int64)
+        self.users = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.size = 0
+        self.labels = None
+        # Whether the entries are sorted by day and author with no (day, author) pair twice;
+        # appending clears it and _entries() restores it.
+        self._compact = True
+        self._day = None
+        self._pending = {}
+
+    def add(self, day, user, value=1):
+        # day is a datetime.date, user an author key.
+        if day != self._day:
+            self._flush()
+            self._day = day
+        pending = self._pending
+        pending[user] = pending.get(user, 0) + value
+
+    def _flush(self):
+        if self._day is not None:
+            pending = self._pending
+            self._append(np.full(len(pending), self._day.toordinal(), dtype=np.int64),
+                         np.fromiter(pending.keys(), dtype=np.int64, count=len(pending)),
+                         np.fromiter(pending.values(), dtype=np.int64, count=len(pending)))
+            self._day = None
+            self._pending = {}
+
+    def _append(self, days, users, counts):
+        size = self.size
+        end = size + len(days)
+        if end > len(self.days):
+            capacity = max(end, 2 * len(self.days), 64)
+            for name in ('days', 'users', 'counts'):
+                grown = np.zeros(capacity, dtype=np.int64)
+                grown[:size] = getattr(self, name)[:size]
+                setattr(self, name, grown)
+        if len(days):
+            self._compact = False
+        self.days[size:end] = days
+        self.users[size:end] = users
+        self.counts[size:end] = counts
+        self.size = end
+
+    def _entries(self):
+        # (days, users, counts) sorted by day and author, duplicates summed.
+        self._flush()
+        size = self.size
+        days, users, counts = self.days[:size], self.users[:size], self.counts[:size]
+        if not self._compact:
+            order = np.lexsort((users, days))
+            days, users, counts = days[order], users[order], counts[order]
+            starts = np.flatnonzero(np.concatenate(([True], (days[1:] != days[:-1]) | (users[1:] != users[:-1]))))
+            counts = np.add.reduceat(counts, starts) if size else counts
+            days, users = days[starts], users[starts]
+            self.days, self.users, self.counts = days.copy(), users.copy(), counts.copy()
+            self.size = len(days)
+            self._compact = True
+        return days, users, counts
+
+    def update(self, other):
+        # Adds the counts of another DailyUserSeries with the same author keys.
+        days, users, counts = other._entries()
+        self._flush()
+        self._append(days, users, counts)
+
+    def rekeyed(self, keys):
+        # Copy with the author keys mapped through keys (from AuthorRegistry.merge).
+        days, users, counts = self._entries()
+        result = DailyUserSeries()
+        if len(days):
+            result._append(days, np.asarray(keys, dtype=np.int64)[users], counts)
+        return result
+
+    def named(self, names):
+        # View whose authors are names[key] instead of keys.
+        days, users, counts = self._entries()
+        result = DailyUserSeries()
+        result.days, result.users, result.counts, result.size = days, users, counts, len(days)
+        result.labels = list(names)
+        return result
+
+    def _key(self, user):
+        return user if self.labels is None else self.labels.index(user)
+
+    def ordinals(self):
+        # Ordinals of the days with any count, ascending.
+        return np.unique(self._entries()[0])
+
+    def rows(self, users, ordinals=None):
+        # Dense matrix of the counts of users (one row each) over ordinals, by default every day
+        # of the series.
+        days, entry_users, counts = self._entries()
+        if ordinals is None:
+            ordinals = np.unique(days)
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        matrix = np.zeros((len(users), len(ordinals)), dtype=np.int64)
+        columns = np.searchsorted(ordinals, days)
+        inside = columns < len(ordinals)
+        inside[inside] = ordinals[columns[inside]] == days[inside]
+        for row, user in enumerate(users):
+            try:
+                key = self._key(user)
+            except ValueError:
+                continue
+            mask = inside & (entry_users == key)
+            matrix[row, columns[mask]] = counts[mask]
+        return matrix
+
+    def years(self):
+        return sorted(set(day_years(self.ordinals()).tolist()))
+
+    def __getitem__(self, day):
+        days, users, counts = self._entries()
+        ordinal = day.toordinal()
+        low, high = np.searchsorted(days, [ordinal, ordinal + 1])
+        labels = self.labels
+        return collections.Counter({(int(users[i]) if labels is None else labels[users[i]]): int(counts[i])
+                                    for i in range(low, high)})
+
+    def __iter__(self):
+        return (datetime.date.fromordinal(int(ordinal)) for ordinal in self.ordinals())
+
+    def __len__(self):
+        return len(self.ordinals())
+
+    def __contains__(self, day):
+        if not isinstance(day, datetime.date):
+            return False
+        days = self._entries()[0]
+        ordinal = day.toordinal()
+        index = np.searchsorted(days, ordinal)
+        return bool(index < len(days) and days[index] == ordinal)
+
+    def __getstate__(self):
+        self._flush()
+        return self.__dict__.copy()
@@ -1,77 +1,229 @@
+import heapq
 import json
 import os
 import re
-import ijson
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .analyzer_common import ExportReader
 
-def load_json_file_streaming(input_file, header_only=False):
+def load_json_file_streaming(input_file, header_only=False, backend=None):
     # Streams through JSON to find header info and possibly messages.
     # If header_only=True, stop after reading basic info without loading messages.
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            parser = ijson.parse(f)
-            data = {}
-            current_key = None
-            for prefix, event, value in parser:
-                if prefix == '' and event == 'map_key':
-                    current_key = value
-                elif current_key == 'name' and prefix == 'name' and event == 'string':
-                    data['name'] = value
-                elif current_key == 'type' and prefix == 'type' and event == 'string':
-                    data['type'] = value
-                elif current_key == 'id' and prefix == 'id' and event in ('number', 'string'):
-                    data['id'] = value
-                elif current_key == 'messages' and event == 'start_array':
-                    if header_only:
-                        break
-                    else:
-                        data['messages'] = []
-                        for msg in ijson.items(f, 'messages.item'):
-                            data['messages'].append(msg)
-                    break
+        with ExportReader(input_file, backend) as reader:
+            data = dict(reader.header)
+            if reader.has_messages and not header_only:
+                data['messages'] = list(reader.messages())
             return data
     except:
         return None
 
-def merge_json_files(folder_path, output_file, current_texts):
+# merge_json_files keeps at most this many bytes of serialized messages in memory; the rest
+# waits in sorted runs on disk next to the output file.
+MERGE_RUN_SIZE = 64 * 1024 * 1024
+# Runs merged at once. With more runs they are first merged into longer ones.
+MERGE_FAN_IN = 64
+
+class MergeSpillError(Exception):
+    # Writing the sorted runs of merge_json_files failed (usually a full disk).
+    pass
+
+def _write_run(directory, lines, runs):
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    runs.append(path)
+    with open(fd, 'wb') as f:
+        f.writelines(lines)
+    return path
+
+def _read_run(path):
+    # Yields (id, file index, position in file, message JSON) from a run written by _spill_file.
+    with open(path, 'rb') as f:
+        for line in f:
+            message_id, file_index, position, message = line.split(b'\t', 3)
+            yield json.loads(message_id), int(file_index), int(position), message[:-1]
+
+def _run_line(message_id, file_index, position, message):
+    return b'%s\t%d\t%d\t%s\n' % (json.dumps(message_id, ensure_ascii=False).encode('utf-8'),
+                                   file_index, position, message)
+
+def _spill_file(messages, file_index, directory, runs):
+    # Serializes the messages of one export into sorted runs and returns how many it wrote.
+    # Batches are sorted and deduplicated in memory and appended to the current run while they
+    # continue its order, so an export that is already ordered by id ends up as a single run
+    # read straight through by the merge.
+    batch = []
+    batch_size = 0
+    run = None
+    run_last = None
+    written = 0
+
+    def flush():
+        nonlocal run, run_last, written
+        batch.sort(key=lambda item: (item[0], item[1]))
+        # Of several messages with one id only the last one can survive the merge.
+        unique = [item for item, following in zip(batch, batch[1:] + [None])
+                  if following is None or following[0] != item[0]]
+        if run is None or unique[0][0] < run_last:
+            if run is not None:
+                run.close()
+            run = open(_write_run(directory, [], runs), 'ab')
+        run.writelines(_run_line(message_id, file_index, position, message)
+                       for message_id, position, message in unique)
+        run_last = unique[-1][0]
+        written += len(unique)
+        batch.clear()
+
+    try:
+        for position, message in enumerate(messages):
+            message_id = message.get('id') if isinstance(message, dict) else None
+            if message_id is None:
+                continue
+            data = json.dumps(message, ensure_ascii=False, default=float).encode('utf-8')
+            batch.append((message_id, position, data))
+            batch_size += len(data)
+            if batch_size >= MERGE_RUN_SIZE:
+                flush()
+                batch_size = 0
+        if batch:
+            flush()
+        return written
+    except OSError as e:
+        # Parse errors surface from the messages generator as ValueError or ijson errors; an OSError
+        # here almost always means the runs could not be written.
+        raise MergeSpillError(e) from e
+    finally:
+        if run is not None:
+            run.close()
+
+def _spill_part(file_index, file_path, backend, directory):
+    # Reads one export into sorted runs; runs in the merge workers as well as in-process.
+    # Returns (header, has_messages, runs, messages written, seconds), or None if the file
+    # cannot be read completely: it is then skipped as a whole.
+    started = time.perf_counter()
+    runs = []
+    try:
+        with ExportReader(file_path, backend) as reader:
+            header = dict(reader.header)
+            has_messages = reader.has_messages
+            written = _spill_file(reader.messages(), file_index, directory, runs) if has_messages else 0
+    except MergeSpillError:
+        raise
+    except Exception:
+        for path in runs:
+            os.remove(path)
+        return None
+    return header, has_messages, runs, written, time.perf_counter() - started
+
+def _report_part(current_texts, file_path, part):
+    if part is None:
+        return
+    _, _, _, written, seconds = part
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    speed = size_mb / seconds if seconds > 0 else 0.0
+    print(current_texts['merge_file_done'].format(file_path, written, size_mb, seconds, speed))
+
+def _spill_parts(files, backend, directory, workers, current_texts):
+    # Yields (file path, _spill_part result) in file order. With several workers the files
+    # are parsed by a process pool and reported as they finish.
+    if workers <= 1 or len(files) < 2:
+        for file_index, file_path in enumerate(files):
+            print(current_texts['processing_file'].format(file_path))
+            part = _spill_part(file_index, file_path, backend, directory)
+            _report_part(current_texts, file_path, part)
+            yield file_path, part
+        return
+    for file_path in files:
+        print(current_texts['processing_file'].format(file_path))
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        futures = {executor.submit(_spill_part, file_index, file_path, backend, directory): file_path
+                   for file_index, file_path in enumerate(files)}
+        for future in as_completed(futures):
+            if future.exception() is None:
+                _report_part(current_texts, futures[future], future.result())
+        for future, file_path in futures.items():
+            yield file_path, future.result()
+
+def _merge_runs(runs, directory):
+    # Merges sorted runs into one ordered stream, first reducing them to MERGE_FAN_IN runs.
+    runs = list(runs)
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        for start in range(0, len(runs), MERGE_FAN_IN):
+            group = runs[start:start + MERGE_FAN_IN]
+            lines = (_run_line(*item) for item in heapq.merge(*(_read_run(path) for path in group)))
+            _write_run(directory, lines, merged)
+            for path in group:
+                os.remove(path)
+        runs = merged
+    return heapq.merge(*(_read_run(path) for path in runs))
+
+def _unique_messages(entries):
+    # Keeps one message per id: the one from the file listed last, as the id-keyed dict did.
+    pending = None
+    for message_id, _, _, message in entries:
+        if pending is not None and message_id != pending[0]:
+            yield pending[1]
+        pending = (message_id, message)
+    if pending is not None:
+        yield pending[1]
+
+def merge_json_files(folder_path, output_file, current_texts, backend=None, workers=1):
     # Merges multiple resultX.json files into one, preserving message order.
-    merged_messages = {}
-    pattern = re.compile(r'^result\d*\.json$')
+    # Messages are streamed from every file into sorted runs on disk and written out by a
+    # k-way merge, so memory use does not grow with the size of the exports. The output is
+    # the same json.dump of the header plus the id-sorted messages as before.
+    # With workers > 1 the files are parsed in parallel, one process per file.
+    # Compressed parts (result1.json.gz...) are read as they are.
+    pattern = re.compile(r'^result\d*\.json(\.(gz|bz2|xz|zst))?$')
     header_data = None
     if not os.path.isdir(folder_path) or folder_path == '':
         folder_path = '.'
+    output_dir = os.path.dirname(os.path.abspath(output_file))
 
-    files_found = False
-    for filename in os.listdir(folder_path):
-        if pattern.match(filename):
-            files_found = True
-            file_path = os.path.join(folder_path, filename)
-            print(current_texts['processing_file'].format(file_path))
-            data = load_json_file_streaming(file_path)
-            if data:
-                if header_data is None:
-                    header_data = {k: data[k] for k in data if k != 'messages'}
-                for message in data.get('messages', []):
-                    message_id = message.get('id')
-                    if message_id is not None:
-                        merged_messages[message_id] = message
-    if not files_found:
+    files = [os.path.join(folder_path, filename) for filename in os.listdir(folder_path) if pattern.match(filename)]
+    if not files:
         print(current_texts['no_files_found_pattern'])
         return False
 
-    if not merged_messages:
-        print(current_texts['no_messages_found_merge'])
-        return False
-
-    sorted_messages = sorted(merged_messages.values(), key=lambda x: x.get('id'))
-    if header_data:
-        header_data['messages'] = sorted_messages
+    with tempfile.TemporaryDirectory(prefix='merge-', dir=output_dir) as directory:
+        runs = []
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(header_data, f, ensure_ascii=False)
-            return True
-        except Exception as e:
+            for file_path, part in _spill_parts(files, backend, directory, workers, current_texts):
+                if part is None:
+                    continue
+                header, has_messages, file_runs, _, _ = part
+                if header or has_messages:
+                    if header_data is None:
+                        header_data = header
+                    runs.extend(file_runs)
+        except MergeSpillError as e:
             print(current_texts['error_writing_merged_file'].format(e))
             return False
-    else:
-        print(current_texts['no_header_data_merge'])
-        return False
\ No newline at end of file
+
+        if not runs:
+            print(current_texts['no_messages_found_merge'])
+            return False
+
+        if header_data:
+            # json.dump(header_data + messages) written piece by piece.
+            header = json.dumps(header_data, ensure_ascii=False)
+            temp_output = output_file + '.tmp'
+            try:
+                with open(temp_output, 'wb') as f:
+                    f.write(f'{header[:-1]}, "messages": ['.encode('utf-8'))
+                    for i, message in enumerate(_unique_messages(_merge_runs(runs, directory))):
+                        if i:
+                            f.write(b', ')
+                        f.write(message)
+                    f.write(b']}')
+                os.replace(temp_output, output_file)
+                return True
+            except Exception as e:
+                if os.path.exists(temp_output):
+                    os.remove(temp_output)
+                print(current_texts['error_writing_merged_file'].format(e))
+                return False
+        else:
+            print(current_texts['no_header_data_merge'])
+            return False
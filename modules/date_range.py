@@ -0,0 +1,65 @@
+import datetime
+
+from .analyzer_utils import MESSAGE, extract_message
+
+# Date range pushdown: messages outside start_date..end_date are dropped before extract_message,
+# so they are neither tokenized nor counted. Messages whose date is missing or broken stay in:
+# the aggregates count them and report the broken dates as before.
+
+class DateRange:
+    # A message is in range when its date shifted by time_offset falls on one of the days from
+    # start_date to end_date, both included.
+    def __init__(self, start_date, end_date, time_offset=0):
+        self.first_day = start_date.date()
+        self.last_day = end_date.date()
+        self.offset = datetime.timedelta(hours=time_offset)
+
+    def position(self, date_time):
+        # -1 before the range, 0 inside it, 1 after it. A date that cannot be shifted counts as
+        # inside, so that the aggregate runs into the same error it always did.
+        try:
+            day = (date_time + self.offset).date()
+        except (OverflowError, TypeError):
+            return 0
+        if day < self.first_day:
+            return -1
+        if day > self.last_day:
+            return 1
+        return 0
+
+def date_range(options):
+    # The DateRange of an analysis, or None when it covers the whole export.
+    if options['start_date'] and options['end_date']:
+        return DateRange(options['start_date'], options['end_date'], options['time_offset'])
+    return None
+
+def message_date(message):
+    # The date extract_message would give the record of a raw message, or None if the message
+    # is skipped, has no date or a broken one.
+    if not isinstance(message, dict) or message.get('type') != 'message' or 'text' not in message:
+        return None
+    value = message.get('date')
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except Exception:
+        return None
+
+def extract_in_range(messages, date_range, channel=False):
+    # MessageRecords of the raw messages, without the ones dated outside date_range. The date the
+    # filter parsed goes on to extract_message, which would otherwise parse it a second time.
+    if date_range is None:
+        return (extract_message(message, channel) for message in messages)
+    return (extract_message(message, channel, date_time)
+            for message, date_time in ((message, message_date(message)) for message in messages)
+            if _in_range(date_time, date_range))
+
+def records_in_range(records, date_range):
+    # The same filter over MessageRecords (export cache, cache writer).
+    if date_range is None:
+        return records
+    return (record for record in records if record.kind != MESSAGE or _in_range(record.date, date_range))
+
+def _in_range(date_time, date_range):
+    return date_time is None or not date_range.position(date_time)
@@ -0,0 +1,311 @@
+import array
+import datetime
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+
+from .analyzer_utils import MEDIA_KEYS, MESSAGE, NO_AUTHOR, SKIPPED, SKIPPED_RECORD, MessageRecord, extract_message
+
+# Columnar cache of parsed exports, written next to the export on the first analysis and
+# read instead of the JSON by later runs:
+#   <export>.cache.npz  NumPy columns plus a JSON 'meta' entry with the file signature, the header
+#                       and the string table. 'kind' has one row per entry of the messages array,
+#                       the other columns one row per MESSAGE entry (reaction_* one per reaction).
+#   <export>.tokens     per text message: its flattened text followed by its tokens, mentions and
+#                       hashtags and '\n' (tokens are letters only, mentions start with '@', hashtags with '#'),
+#                       UTF-8 encoded; the 'size' column has the bytes each row takes
+# The cache stores only what extract_message produces, so stop words, bots, date ranges,
+# time offset and top-N settings can all change between runs without rebuilding it.
+# Bump CACHE_VERSION whenever extract_message or the layout changes.
+CACHE_VERSION = 3
+# Rows the columns cannot represent exactly (broken dates, timezone-aware dates, messages that
+# made the analyzers raise...) keep the raw message in meta and are extracted again on load.
+RAW = 2
+
+FINGERPRINT_BLOCK = 64 * 1024
+# Rows of a column turned into Python values at a time while the cache is replayed.
+REPLAY_BLOCK = 64 * 1024
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_NO_DATE = -2 ** 63
+_MIN_DATE = (datetime.datetime.min - _EPOCH) // _MICROSECOND
+_MAX_DATE = (datetime.datetime.max - _EPOCH) // _MICROSECOND
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+_MEDIA_CODES = {key: code for code, key in enumerate(MEDIA_KEYS)}
+_FORWARDED = 1
+_REPLY = 2
+_COMMAND = 4
+_COLUMNS = (('kind', 'b'), ('id', 'q'), ('date', 'q'), ('user', 'i'), ('user_id', 'i'), ('symbols', 'i'),
+            ('size', 'i'), ('media', 'b'), ('flags', 'B'), ('links', 'i'), ('reactions', 'i'),
+            ('reaction_emoji', 'i'), ('reaction_count', 'q'))
+
+def cache_paths(input_file):
+    return input_file + '.cache.npz', input_file + '.tokens'
+
+def file_signature(input_file):
+    # Size, mtime and a hash of the first, middle and last 64 KB: cheap even for gigabyte exports,
+    # and an export that is rewritten in place with the same size and mtime still gets noticed.
+    stat = os.stat(input_file)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(input_file, 'rb') as f:
+        for offset in (0, max(0, stat.st_size // 2 - FINGERPRINT_BLOCK // 2), max(0, stat.st_size - FINGERPRINT_BLOCK)):
+            f.seek(offset)
+            digest.update(f.read(FINGERPRINT_BLOCK))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'fingerprint': digest.hexdigest()}
+
+def _values(column):
+    # The values of a NumPy column, converted a block at a time so that a replay does not hold a
+    # Python object per row of the whole export.
+    for start in range(0, len(column), REPLAY_BLOCK):
+        yield from column[start:start + REPLAY_BLOCK].tolist()
+
+def _skip(iterator, count):
+    next(itertools.islice(iterator, count, count), None)
+
+def _rows_in_range(dates, date_range):
+    # DateRange.position() == 0 over the date column. Rows without a date stay in, and so do the
+    # dates the time offset pushes out of what a datetime can hold, as position() keeps those too.
+    offset = date_range.offset // _MICROSECOND
+    offset = max(min(offset, _MAX_DATE - _MIN_DATE + 1), _MIN_DATE - _MAX_DATE - 1)
+    first = (datetime.datetime.combine(date_range.first_day, datetime.time.min) - _EPOCH) // _MICROSECOND
+    last = (datetime.datetime.combine(date_range.last_day, datetime.time.max) - _EPOCH) // _MICROSECOND
+    undated = dates == _NO_DATE
+    shifted = np.where(undated, 0, dates) + offset
+    return undated | (shifted < _MIN_DATE) | (shifted > _MAX_DATE) | ((shifted >= first) & (shifted <= last))
+
+def load_export_cache(input_file, channel=False):
+    # Returns the ExportCache of input_file, or None if there is none or it is stale.
+    cache_file, tokens_file = cache_paths(input_file)
+    try:
+        with np.load(cache_file, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if (meta.get('version') != CACHE_VERSION or meta.get('channel') != channel
+                    or meta.get('signature') != file_signature(input_file)
+                    or meta.get('tokens_size') != os.path.getsize(tokens_file)):
+                return None
+            columns = {name: data[name] for name, _ in _COLUMNS}
+    except (OSError, ValueError, KeyError):
+        return None
+    return ExportCache(meta, columns, tokens_file)
+
+class ExportCache:
+    def __init__(self, meta, columns, tokens_file):
+        self.header = meta['header']
+        self.channel = meta['channel']
+        self._strings = meta['strings']
+        self._raw = meta['raw']
+        self._columns = columns
+        self._tokens_file = tokens_file
+
+    def __len__(self):
+        return len(self._columns['kind'])
+
+    def records(self, date_range=None):
+        # MessageRecords in export order, equal to what extract_message returned when the cache was built.
+        # With a date_range, the MESSAGE rows that records_in_range() would drop are left out, picked
+        # from the date column so that their text is never read.
+        # The side file is read along with the rows: a row takes its next `size` bytes, the first
+        # `symbols` characters of which are its text (texts may contain '\n'), the rest its words.
+        if date_range is None:
+            in_range = itertools.repeat(True)
+        else:
+            in_range = _values(_rows_in_range(self._columns['date'], date_range))
+        with open(self._tokens_file, 'rb') as side:
+            yield from self._records(side, in_range)
+
+    def _records(self, side, in_range):
+        strings = self._strings
+        raw = iter(self._raw)
+        columns = self._columns
+        emojis = (strings[i] for i in _values(columns['reaction_emoji']))
+        counts = _values(columns['reaction_count'])
+        rows = zip(*(_values(columns[name]) for name in
+                     ('id', 'date', 'user', 'user_id', 'symbols', 'size', 'media', 'flags', 'links', 'reactions')),
+                   in_range)
+        read = side.read
+        # Bytes of the rows left out since the last one read.
+        skipped = 0
+        for kind in _values(columns['kind']):
+            if kind == SKIPPED:
+                yield SKIPPED_RECORD
+                continue
+            if kind == RAW:
+                yield extract_message(next(raw), self.channel)
+                continue
+            message_id, date, user, user_id, symbols, size, media, flags, links, reactions, keep = next(rows)
+            if not keep:
+                skipped += size
+                _skip(emojis, reactions)
+                _skip(counts, reactions)
+                continue
+            if skipped:
+                side.seek(skipped, os.SEEK_CUR)
+                skipped = 0
+            line = read(size).decode('utf-8')
+            record = MessageRecord(MESSAGE)
+            record.id = message_id
+            record.user = strings[user] if user >= 0 else NO_AUTHOR
+            record.user_id = strings[user_id]
+            record.text = line[:symbols]
+            record.lower = record.text.lower()
+            words = line[symbols:-1]
+            if '@' in words or '#' in words:
+                words = words.split()
+                record.tokens = [word for word in words if word[0] not in '@#']
+                record.mentions = [word for word in words if word[0] == '@']
+                record.hashtags = [word for word in words if word[0] == '#']
+            else:
+                record.tokens = words.split()
+            record.links = links
+            record.media = MEDIA_KEYS[media] if media >= 0 else None
+            record.forwarded = bool(flags & _FORWARDED)
+            record.reply = bool(flags & _REPLY)
+            record.command = bool(flags & _COMMAND)
+            if date != _NO_DATE:
+                record.date = _EPOCH + date * _MICROSECOND
+            if reactions:
+                record.reactions = list(zip(itertools.islice(emojis, reactions), itertools.islice(counts, reactions)))
+            else:
+                record.reactions = []
+            yield record
+
+def _single_word(value, prefix):
+    # Whether value survives the split() of the tokens line and is told apart from tokens by prefix.
+    return value.startswith(prefix) and value.split() == [value]
+
+class ExportCacheWriter:
+    # Builds the cache while the analyzer reads the export:
+    #     writer = ExportCacheWriter(input_file, channel)
+    #     aggregate.consume_records(writer.extract(messages))
+    #     writer.save(header)
+    # Any OSError just leaves the export uncached.
+    def __init__(self, input_file, channel=False):
+        self.input_file = input_file
+        self.channel = channel
+        self._signature = file_signature(input_file)
+        self._columns = {name: array.array(typecode) for name, typecode in _COLUMNS}
+        self._strings = {}
+        self._raw = []
+        self._cache_file, self._tokens_file = cache_paths(input_file)
+        self._side = None
+        try:
+            self._side = open(self._tokens_file + '.tmp', 'wb')
+        except OSError:
+            pass
+
+    def _string(self, value):
+        index = self._strings.get(value)
+        if index is None:
+            index = self._strings[value] = len(self._strings)
+        return index
+
+    def _columnar(self, record):
+        # Whether the columns reproduce the record exactly; otherwise the raw message is kept.
+        if record.error is not None or record.bad_date is not None:
+            return False
+        if type(record.id) is not int or not _INT64_MIN < record.id <= _INT64_MAX:
+            return False
+        if not (isinstance(record.user, str) or record.user is NO_AUTHOR) or not isinstance(record.user_id, str):
+            return False
+        if record.date is not None and record.date.tzinfo is not None:
+            return False
+        if not all(_single_word(mention, '@') for mention in record.mentions):
+            return False
+        if not all(_single_word(hashtag, '#') for hashtag in record.hashtags):
+            return False
+        return all(isinstance(emoji, str) and type(count) is int and _INT64_MIN < count <= _INT64_MAX
+                   for emoji, count in record.reactions)
+
+    def _write_text(self, record):
+        # Text and tokens of a columnar row, and their size. False if the text cannot be stored as
+        # UTF-8 (lone surrogates from \u escapes); the row is then kept raw.
+        try:
+            line = f"{record.text}{' '.join([*record.tokens, *record.mentions, *record.hashtags])}\n".encode('utf-8')
+            self._side.write(line)
+        except UnicodeEncodeError:
+            return False
+        except OSError:
+            self.abort()
+            return False
+        self._columns['size'].append(len(line))
+        return True
+
+    def extract(self, messages):
+        # extract_message over messages, recording every record on the way.
+        columns = self._columns
+        kinds = columns['kind']
+        side = self._side
+        for message in messages:
+            record = extract_message(message, self.channel)
+            if side is None:
+                pass
+            elif record is SKIPPED_RECORD:
+                kinds.append(SKIPPED)
+            elif not self._columnar(record) or not self._write_text(record):
+                kinds.append(RAW)
+                self._raw.append(message)
+            else:
+                kinds.append(MESSAGE)
+                columns['id'].append(record.id)
+                columns['date'].append(_NO_DATE if record.date is None else (record.date - _EPOCH) // _MICROSECOND)
+                columns['user'].append(-1 if record.user is NO_AUTHOR else self._string(record.user))
+                columns['user_id'].append(self._string(record.user_id))
+                columns['symbols'].append(len(record.text))
+                columns['media'].append(-1 if record.media is None else _MEDIA_CODES[record.media])
+                columns['flags'].append((_FORWARDED if record.forwarded else 0) | (_REPLY if record.reply else 0)
+                                        | (_COMMAND if record.command else 0))
+                columns['links'].append(record.links)
+                columns['reactions'].append(len(record.reactions))
+                for emoji, count in record.reactions:
+                    columns['reaction_emoji'].append(self._string(emoji))
+                    columns['reaction_count'].append(count)
+            side = self._side
+            yield record
+
+    def abort(self):
+        if self._side is not None:
+            self._side.close()
+            self._side = None
+            try:
+                os.remove(self._tokens_file + '.tmp')
+            except OSError:
+                pass
+
+    def save(self, header):
+        # Writes the cache if the whole export went through extract() and did not change meanwhile.
+        if self._side is None:
+            return False
+        try:
+            self._side.close()
+            if file_signature(self.input_file) != self._signature:
+                self.abort()
+                return False
+            meta = {
+                'version': CACHE_VERSION,
+                'channel': self.channel,
+                'signature': self._signature,
+                'tokens_size': os.path.getsize(self._tokens_file + '.tmp'),
+                'header': {key: value for key, value in header.items() if key != 'messages'},
+                'strings': list(self._strings),
+                'raw': self._raw,
+            }
+            columns = {name: np.frombuffer(values, dtype=values.typecode) if values else np.array([], dtype=values.typecode)
+                       for name, values in self._columns.items()}
+            with open(self._cache_file + '.tmp', 'wb') as f:
+                np.savez(f, meta=np.array(json.dumps(meta, ensure_ascii=False, default=float)), **columns)
+            os.replace(self._tokens_file + '.tmp', self._tokens_file)
+            os.replace(self._cache_file + '.tmp', self._cache_file)
+        except (OSError, TypeError, ValueError):
+            self.abort()
+            for path in (self._cache_file + '.tmp', self._cache_file):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return False
+        finally:
+            self._side = None
+        return True
@@ -0,0 +1,143 @@
+import datetime
+import json
+import os
+
+from .date_range import message_date
+from .export_cache import file_signature
+
+# Sparse date -> byte offset index of an export, written next to it (<export>.index) by a full
+# single-process analysis. An analysis with a date range then seeks to the last entry before
+# the range and stops reading once it has passed the range, instead of parsing the whole export.
+# Both shortcuts rely on the dates of the export never going backwards, which the writer checks;
+# an index of an export whose dates do go backwards is kept only to record that.
+# Bump INDEX_VERSION whenever the layout or the meaning of the entries changes.
+INDEX_VERSION = 1
+# Messages between two entries: a seek lands at most this many messages before the range.
+INDEX_STEP = 1000
+
+def index_path(input_file):
+    return input_file + '.index'
+
+def load_export_index(input_file):
+    # Returns the ExportIndex of input_file, or None if there is none or it is stale.
+    try:
+        with open(index_path(input_file), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION or meta.get('signature') != file_signature(input_file):
+            return None
+        return ExportIndex(meta)
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+class ExportIndex:
+    def __init__(self, meta):
+        self.ordered = meta['ordered']
+        self.entries = [(datetime.datetime.fromisoformat(date), offset) for date, offset in meta['entries']]
+        # Offsets right behind the first and the last message that has no usable date. Those
+        # messages are always analyzed, so neither a seek nor an early stop may skip them.
+        self.first_undated = meta['first_undated']
+        self.last_undated = meta['last_undated']
+
+    def seek_offset(self, date_range):
+        # Offset of the last entry whose messages all come before the range, or None.
+        offset = None
+        for date_time, entry_offset in self.entries:
+            if date_range.position(date_time) >= 0:
+                break
+            if self.first_undated is not None and entry_offset >= self.first_undated:
+                break
+            offset = entry_offset
+        return offset
+
+    def range_messages(self, reader, date_range):
+        # The messages of reader that extract_in_range() can keep: seeks over the messages
+        # before the range and stops at the first one after it. reader must be seekable and
+        # not have started messages() yet; it is closed when this returns.
+        try:
+            if self.ordered:
+                offset = self.seek_offset(date_range)
+                if offset is not None:
+                    reader.seek_messages(offset)
+            stop = self.ordered
+            for message in reader.messages():
+                if stop:
+                    date_time = message_date(message)
+                    if date_time is not None and date_range.position(date_time) > 0:
+                        if self.last_undated is None or reader.message_offset() > self.last_undated:
+                            return
+                        # A message without a date still follows: read on to the end.
+                        stop = False
+                yield message
+        finally:
+            reader.close()
+
+class ExportIndexWriter:
+    # Builds the index while the analyzer reads the whole export:
+    #     writer = ExportIndexWriter(reader)
+    #     aggregate.consume(writer.track(reader.messages()))
+    #     writer.save()
+    def __init__(self, reader):
+        self.reader = reader
+        self.input_file = reader.input_file
+        self._signature = file_signature(reader.input_file)
+        self._entries = []
+        self._ordered = True
+        self._first_undated = None
+        self._last_undated = None
+        self._complete = False
+
+    def track(self, messages):
+        # Passes messages through, taking the offset behind every INDEX_STEP-th of them.
+        reader = self.reader
+        entries = self._entries
+        last_date = None
+        count = 0
+        for message in messages:
+            count += 1
+            date_time = message_date(message)
+            if date_time is not None:
+                if last_date is not None and self._ordered:
+                    try:
+                        if date_time < last_date:
+                            self._ordered = False
+                    except TypeError:
+                        # Dates with and without a timezone cannot be ordered.
+                        self._ordered = False
+                if last_date is None or self._ordered:
+                    last_date = date_time
+            elif isinstance(message, dict) and message.get('type') == 'message' and 'text' in message:
+                offset = reader.message_offset()
+                if self._first_undated is None:
+                    self._first_undated = offset
+                self._last_undated = offset
+            if count % INDEX_STEP == 0 and last_date is not None and self._ordered:
+                entries.append((last_date.isoformat(), reader.message_offset()))
+            yield message
+        self._complete = True
+
+    def save(self):
+        # Writes the index if every message went through track() and the export did not change meanwhile.
+        if not self._complete:
+            return False
+        path = index_path(self.input_file)
+        try:
+            if file_signature(self.input_file) != self._signature:
+                return False
+            meta = {
+                'version': INDEX_VERSION,
+                'signature': self._signature,
+                'ordered': self._ordered,
+                'entries': self._entries if self._ordered else [],
+                'first_undated': self._first_undated,
+                'last_undated': self._last_undated,
+            }
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            try:
+                os.remove(path + '.tmp')
+            except OSError:
+                pass
+            return False
+        return True
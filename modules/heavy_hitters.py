@@ -0,0 +1,76 @@
+import collections
+import heapq
+from collections.abc import Mapping
+
+from .json_backend import estimated_json_size
+
+# Word and phrase counts of the aggregates. By default every distinct word, bigram and trigram
+# gets an exact count, so memory grows with the vocabulary of the export. With approximate
+# counting each of them is a HeavyHitters summary of fixed size instead.
+
+class HeavyHitters(Mapping):
+    # Misra–Gries summary: counts tokens like a Counter, but once it holds more than
+    # 2 * capacity of them, the (capacity + 1)-th largest count is subtracted from all and the
+    # tokens left at zero or below are dropped. Every cut removes at least capacity + 1 times
+    # its size from the stream total, so after N tokens:
+    #   - a kept count is at most error below the true count, and error <= N / (capacity + 1);
+    #   - a dropped token occurred at most error times, so a token occurring more often is kept.
+    # Summaries of consecutive chunks merge with update() under the same bound.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = collections.Counter()
+        self.error = 0
+
+    def update(self, tokens):
+        # tokens is an iterable of tokens, or another HeavyHitters to merge into this one.
+        if isinstance(tokens, HeavyHitters):
+            self.counts.update(tokens.counts)
+            self.error += tokens.error
+        else:
+            self.counts.update(tokens)
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        cut = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+        self.error += cut
+        self.counts = collections.Counter({token: count - cut for token, count in self.counts.items() if count > cut})
+
+    def most_common(self, n=None):
+        return self.counts.most_common(n)
+
+    def __getitem__(self, token):
+        return self.counts[token]
+
+    def __contains__(self, token):
+        return token in self.counts
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __len__(self):
+        return len(self.counts)
+
+def token_capacity(config, input_file, compression):
+    # Size of the HeavyHitters summaries for an analysis of input_file, or None to count exactly.
+    # compression is the one ExportReader detected for it.
+    mode = config.get('token_counting', 'exact')
+    if mode == 'auto':
+        # The size of the JSON, not of the file: a compressed export holds many times more.
+        try:
+            size = estimated_json_size(input_file, compression)
+        except OSError:
+            size = 0
+        mode = 'approximate' if size >= config.get('approximate_counting_threshold_mb', 1024) * 1024 * 1024 else 'exact'
+    if mode != 'approximate':
+        return None
+    # A summary smaller than the top list would cut into the list itself.
+    return max(config.get('approximate_counting_capacity', 100000),
+               config.get('top_words_count', 100), config.get('top_phrases_count', 100))
+
+def token_counter(capacity):
+    return collections.Counter() if capacity is None else HeavyHitters(capacity)
+
+def count_error(counter):
+    # How far the counts of counter may be below the true ones: 0 for an exact Counter.
+    return getattr(counter, 'error', 0)
@@ -0,0 +1,298 @@
+import bz2
+import codecs
+import gzip
+import json
+import lzma
+import os
+import re
+
+# Backends in order of preference. 'bulk' decodes each message in one call to the json
+# module's C scanner and measured 2-3x faster than the ijson C backend on Telegram exports
+# (see benchmarks/bench_json_backends.py); the pure-Python ijson backend is the last resort.
+IJSON_BACKENDS = ('yajl2_c', 'yajl2_cffi', 'yajl2', 'python')
+BACKEND_PREFERENCE = ('bulk', 'yajl2_c', 'yajl2_cffi', 'yajl2', 'python')
+HEADER_FIELDS = ('name', 'type', 'id')
+
+READ_SIZE = 1024 * 1024
+# A single top-level value larger than this is treated as malformed input rather than read on.
+MAX_VALUE_SIZE = 256 * 1024 * 1024
+
+# Compressed exports are recognized by their first bytes, whatever the file is called, and
+# decompressed while they are parsed. zstd needs the optional zstandard package.
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+# How many times larger than the file on disk an export of each format is taken to be once
+# decompressed. Set at the high end of what exports compress to (a synthetic one: gzip 10x,
+# bz2 16x, xz 15x), so that an estimate errs towards too large.
+COMPRESSION_RATIO = {'gzip': 10, 'bz2': 16, 'xz': 16, 'zstd': 12}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# A value cut by the end of the buffer fails to decode at most this many characters before it
+# ('-Infinit', a cut \uXXXX escape), except for a cut string, which fails where it starts.
+_INCOMPLETE_MARGIN = 16
+# Characters that may follow the part of a number decoded so far.
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+_available = None
+
+def _ijson_backend(name):
+    # ijson is only imported once one of its backends is asked for: 'auto' resolves to 'bulk'
+    # without it.
+    import ijson
+    return ijson.get_backend(name)
+
+def _load_ijson_backend(name):
+    try:
+        return _ijson_backend(name)
+    except Exception:
+        return None
+
+def _usable(name):
+    return name not in IJSON_BACKENDS or _load_ijson_backend(name) is not None
+
+def available_backends():
+    # Returns the usable backends in order of preference. Computed once per process.
+    global _available
+    if _available is None:
+        _available = [name for name in BACKEND_PREFERENCE if _usable(name)]
+    return list(_available)
+
+def select_backend(name=None):
+    # Resolves 'auto' (or None) to the fastest available backend.
+    # A backend forced through config.json_backend must be available, otherwise this raises.
+    if not name or name == 'auto':
+        # The first usable one; the backends after it are not probed.
+        return next(name for name in BACKEND_PREFERENCE if _usable(name))
+    if name not in BACKEND_PREFERENCE:
+        raise ValueError(f"Unknown JSON backend '{name}', expected one of: auto, {', '.join(BACKEND_PREFERENCE)}")
+    if not _usable(name):
+        raise ValueError(f"JSON backend '{name}' is not available in this environment")
+    return name
+
+def compression_of(input_file):
+    # 'gzip', 'bz2', 'xz' or 'zstd' for a compressed export, None for plain JSON.
+    with open(input_file, 'rb') as f:
+        return compression_of_start(f.read(6))
+
+def compression_of_start(start):
+    # The same from the first bytes of the file, for a caller that already has it open.
+    for magic, name in COMPRESSION_MAGIC:
+        if start.startswith(magic):
+            return name
+    return None
+
+def estimated_json_size(input_file, compression):
+    # Size in bytes of the JSON in input_file: the file size for plain JSON, an estimate from
+    # COMPRESSION_RATIO for a compressed export.
+    return os.path.getsize(input_file) * COMPRESSION_RATIO.get(compression, 1)
+
+def _open_zstd(input_file, raw=None):
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(f"'{input_file}' is zstd-compressed; install the zstandard package to read it") from None
+    # read_across_frames: exports compressed by parallel zstd tools consist of several frames.
+    return zstandard.ZstdDecompressor().stream_reader(raw or open(input_file, 'rb'), read_across_frames=True,
+                                                      closefd=raw is None)
+
+def open_binary(input_file, raw=None):
+    # All readers work on bytes: ijson skips its text-to-bytes wrapper and 'bulk' decodes UTF-8 itself.
+    # Compressed exports come back as a decompressing stream; nothing is unpacked to disk.
+    # raw is the export already opened with open(input_file, 'rb') by a caller that wants to see
+    # how far into the file on disk the stream has read (raw.tell()); the caller closes it.
+    return open_decompressed(input_file, compression_of(input_file), raw)
+
+def open_decompressed(input_file, compression, raw=None):
+    # open_binary for a caller that already knows the compression of input_file.
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb') if raw else gzip.open(input_file, 'rb')
+    if compression == 'bz2':
+        return bz2.open(raw or input_file, 'rb')
+    if compression == 'xz':
+        return lzma.open(raw or input_file, 'rb')
+    if compression == 'zstd':
+        return _open_zstd(input_file, raw)
+    return raw or open(input_file, 'rb')
+
+def open_stream(f, backend, track_offsets=False):
+    # track_offsets only applies to 'bulk', the one stream that can report and seek to byte offsets.
+    if backend == 'bulk':
+        return BulkStream(f, track_offsets)
+    return IjsonStream(f, _ijson_backend(backend))
+
+class IjsonStream:
+    # Header and messages from one ijson event stream.
+    def __init__(self, f, backend_module):
+        self._backend = backend_module
+        # Floats as float like json.load gives them, not Decimal, so every backend yields the
+        # same values.
+        self._events = backend_module.parse(f, use_float=True)
+
+    def read_header(self, header):
+        # Consumes events up to the start of the messages array. Returns whether it was found.
+        for prefix, event, value in self._events:
+            if prefix in HEADER_FIELDS and event in ('string', 'number'):
+                header[prefix] = value
+            elif prefix == 'messages' and event == 'start_array':
+                return True
+        return False
+
+    def _collect_header(self, events, header):
+        # Passes events through while picking up header fields that follow the messages array.
+        for item in events:
+            prefix, event, value = item
+            if prefix in HEADER_FIELDS and event in ('string', 'number'):
+                header[prefix] = value
+            yield item
+
+    def messages(self, header):
+        # When the header was complete before the array the raw events go straight to items(),
+        # otherwise they are tapped so that trailing name/type/id still reach the header.
+        events = self._events
+        if not all(field in header for field in HEADER_FIELDS):
+            events = self._collect_header(events, header)
+        for message in self._backend.items(events, 'messages.item'):
+            if message is not None:
+                yield message
+
+class BulkStream:
+    # Walks the top-level object itself and hands every value, including each item of the
+    # messages array, to json.JSONDecoder.raw_decode. The file is read in large blocks that
+    # are decoded from UTF-8 once, and each message is decoded in one call to the C scanner
+    # instead of being assembled from individual parser events.
+    # With track_offsets=True byte_offset() tells where in the file the stream currently is,
+    # and seek_messages() can later continue the messages array from such an offset.
+    def __init__(self, f, track_offsets=False):
+        self._file = f
+        self._track_offsets = track_offsets
+        self._consumed_bytes = 0
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._read_size = READ_SIZE
+        self._after_message = False
+
+    def _fill(self):
+        # Appends the next block, dropping the part of the buffer that was already consumed.
+        if self._eof:
+            return False
+        data = self._file.read(self._read_size)
+        if not data:
+            self._eof = True
+            tail = self._utf8.decode(b'', final=True)
+        else:
+            tail = self._utf8.decode(data)
+        if self._track_offsets:
+            self._consumed_bytes += len(self._buf[:self._pos].encode('utf-8'))
+        self._buf = self._buf[self._pos:] + tail
+        self._pos = 0
+        return True
+
+    def byte_offset(self):
+        return self._consumed_bytes + len(self._buf[:self._pos].encode('utf-8'))
+
+    def _skip_whitespace(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return
+
+    def _peek(self):
+        self._skip_whitespace()
+        if self._pos >= len(self._buf):
+            raise ValueError('Unexpected end of JSON data')
+        return self._buf[self._pos]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at position {self._pos} of the current block")
+        self._pos += 1
+
+    def _value(self):
+        # Decodes the value at the current position, reading more data while it is incomplete.
+        # A number cut by the end of the block still decodes, to its first part ('1.|5' as 1), so
+        # a number only counts once a character that cannot continue it follows in the buffer.
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                # Only an error at the end of the buffer can be a value the next block completes;
+                # anywhere else the export is broken and more data would not help.
+                incomplete = e.pos >= len(self._buf) - _INCOMPLETE_MARGIN or e.msg == 'Unterminated string starting at'
+                if not incomplete or len(self._buf) - self._pos > MAX_VALUE_SIZE or not self._fill():
+                    raise
+                continue
+            if (isinstance(value, (int, float)) and _NUMBER_TAIL.match(self._buf, end).end() == len(self._buf)
+                    and self._fill()):
+                continue
+            self._pos = end
+            return value
+
+    def _keys(self):
+        # Yields top-level keys; the caller consumes each value before asking for the next key.
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            yield key
+            char = self._peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' after the value of '{key}'")
+
+    def read_header(self, header):
+        self._top = self._keys()
+        for key in self._top:
+            if key == 'messages' and self._peek() == '[':
+                self._pos += 1
+                return True
+            value = self._value()
+            if key in HEADER_FIELDS and isinstance(value, (str, int)):
+                header[key] = value
+        return False
+
+    def seek_messages(self, offset):
+        # Moves to an offset that byte_offset() returned while a message was being yielded, so that
+        # messages() goes on with the message after that one. Called before messages() starts.
+        self._file.seek(offset)
+        self._utf8.reset()
+        self._consumed_bytes = offset
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._after_message = True
+
+    def messages(self, header):
+        # After seek_messages() the stream stands behind a message, in front of its separator.
+        after_message = self._after_message
+        if not after_message and self._peek() == ']':
+            self._pos += 1
+        else:
+            while True:
+                if not after_message:
+                    message = self._value()
+                    if message is not None:
+                        yield message
+                after_message = False
+                char = self._peek()
+                self._pos += 1
+                if char == ']':
+                    break
+                if char != ',':
+                    raise ValueError("Expected ',' or ']' between messages")
+        # Header fields stored after the messages array.
+        for key in self._top:
+            value = self._value()
+            if key in HEADER_FIELDS and isinstance(value, (str, int)):
+                header[key] = value
@@ -0,0 +1,25 @@
+import importlib.util
+import os
+
+# The texts of the interface and the reports, one locales/<language>.py per language. Each table
+# is loaded once per process and shared by every later call, so callers must not change it.
+# A table is loaded as a module rather than exec'd from its source, so that Python reuses the
+# bytecode it cached in locales/__pycache__ instead of compiling the file on every start.
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'locales')
+
+_texts = {}
+
+def available_languages(locales_dir=LOCALES_DIR):
+    return sorted(os.path.splitext(filename)[0] for filename in os.listdir(locales_dir) if filename.endswith('.py'))
+
+def load_texts(language_code, locales_dir=LOCALES_DIR):
+    key = (locales_dir, language_code)
+    texts = _texts.get(key)
+    if texts is None:
+        lang_file = os.path.join(locales_dir, f'{language_code}.py')
+        spec = importlib.util.spec_from_file_location(f'_locale_{language_code}', lang_file)
+        lang_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(lang_module)
+        texts = _texts[key] = lang_module.texts
+    return texts
@@ -0,0 +1,82 @@
+import collections
+import re
+
+class ProfanityMatcher:
+    # Profanity words contained in a lowercased text, with the substring semantics of
+    # any(word in text for word in words), compiled once per run.
+    # search() is a single re.search over the whole list arranged as a trie, so the regex engine
+    # looks at each position of the text once instead of once per word. found() walks an
+    # Aho–Corasick automaton that also reports overlapping and nested words; it only has to run
+    # on the texts search() matched, which keeps per-word counts cheap.
+    def __init__(self, words):
+        self.words = sorted(word for word in set(words) if word)
+        self._pattern = re.compile(_trie_pattern(self.words)) if self.words else None
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for word in self.words:
+            self._add(word)
+        self._link()
+
+    def _add(self, word):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = (word,)
+
+    def _link(self):
+        # Breadth-first: the failure link of a state is the longest proper suffix of its path that
+        # is also in the trie, and its output includes the words ending at that suffix.
+        goto, fail, output = self._goto, self._fail, self._output
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                suffix = fail[state]
+                while suffix and char not in goto[suffix]:
+                    suffix = fail[suffix]
+                fail[next_state] = goto[suffix].get(char, 0)
+                output[next_state] = output[next_state] + output[fail[next_state]]
+
+    def search(self, text):
+        # Whether text contains any of the words.
+        return self._pattern is not None and self._pattern.search(text) is not None
+
+    def found(self, text):
+        # The set of words text contains.
+        goto, fail, output = self._goto, self._fail, self._output
+        words = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                words.update(output[state])
+        return words
+
+def _trie_pattern(words):
+    # Regex alternation of words with shared prefixes factored out. A branch stops where a word
+    # ends: for "does the text contain a word" the longer words through that node add nothing.
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = True
+
+    def branch(node):
+        if None in node:
+            return ''
+        parts = [re.escape(char) + branch(child) for char, child in sorted(node.items())]
+        return parts[0] if len(parts) == 1 else '(?:' + '|'.join(parts) + ')'
+
+    return branch(trie)
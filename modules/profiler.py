@@ -0,0 +1,157 @@
+import contextlib
+import cProfile
+import json
+import time
+import tracemalloc
+
+# Stage timings of one analysis, written as JSON next to the report when config['profile'] is on.
+# The profiler of the running analysis is a module global, so nothing has to be threaded through
+# the options (which are fingerprinted for incremental state and sent to worker processes); with
+# no profiler active every hook below is a single check.
+#
+# Stages that run one after another (header, analyze, finalize, reports, plots) get wall and CPU
+# time. Parse, normalize and aggregate interleave message by message inside analyze, so they are
+# timed around each message instead, with wall time only: two perf_counter() calls per message
+# and stage, about 1.5 µs per message in all. Their times exclude each other.
+# With profile_memory, tracemalloc records the peak of each stage (and slows the run down a lot);
+# with profile_cprofile, a cProfile dump of the whole run is written too.
+
+_active = None
+
+class Profiler:
+    def __init__(self, trace_memory=False, cprofile=False):
+        self.trace_memory = trace_memory
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.stages = {}
+        self._open = []
+        self._wall = self._cpu = 0.0
+
+    def entry(self, name):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {'name': name, 'wall_seconds': 0.0, 'cpu_seconds': None, 'messages': 0,
+                                         'peak_memory_bytes': None}
+        return entry
+
+    @contextlib.contextmanager
+    def stage(self, name, exclude=()):
+        # Times the block as stage name. Time that stages in exclude accumulate inside it is
+        # taken off (and then the CPU time is unknown).
+        entry = self.entry(name)
+        excluded = [self.entry(inner) for inner in exclude]
+        excluded_before = sum(inner['wall_seconds'] for inner in excluded)
+        if self.trace_memory:
+            self._enter_memory()
+        self._open.append(entry)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield entry
+        finally:
+            cpu = time.process_time() - cpu_start
+            wall = time.perf_counter() - wall_start
+            self._open.pop()
+            entry['wall_seconds'] += wall - (sum(inner['wall_seconds'] for inner in excluded) - excluded_before)
+            if not excluded:
+                entry['cpu_seconds'] = (entry['cpu_seconds'] or 0.0) + cpu
+            if self.trace_memory:
+                self._exit_memory(entry)
+
+    def _enter_memory(self):
+        # tracemalloc keeps one peak: the stages already open take it before it is reset.
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self._open:
+            entry['peak_memory_bytes'] = max(entry['peak_memory_bytes'] or 0, peak)
+        tracemalloc.reset_peak()
+
+    def _exit_memory(self, entry):
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_entry in self._open + [entry]:
+            open_entry['peak_memory_bytes'] = max(open_entry['peak_memory_bytes'] or 0, peak)
+
+    def timed(self, name, iterable, inner=None):
+        # Yields the items of iterable, adding the time spent getting each one to stage name
+        # (minus what stage inner accumulated meanwhile) and counting them as its messages.
+        # The totals are updated per item, so that an enclosing stage can exclude them as it goes.
+        entry = self.entry(name)
+        inner_entry = self.entry(inner) if inner else {'wall_seconds': 0.0}
+        clock = time.perf_counter
+        iterator = iter(iterable)
+        while True:
+            inner_before = inner_entry['wall_seconds']
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                entry['wall_seconds'] += clock() - start - (inner_entry['wall_seconds'] - inner_before)
+                return
+            entry['wall_seconds'] += clock() - start - (inner_entry['wall_seconds'] - inner_before)
+            entry['messages'] += 1
+            yield item
+
+    def results(self):
+        return {
+            'wall_seconds': self._wall,
+            'cpu_seconds': self._cpu,
+            'trace_memory': self.trace_memory,
+            'stages': list(self.stages.values()),
+        }
+
+    def save(self, path, **info):
+        # Writes the profile to path (and the cProfile dump next to it); failing to write it does
+        # not fail the analysis.
+        profile = dict(info)
+        profile.update(self.results())
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, ensure_ascii=False, indent=4, default=str)
+            if self.cprofile is not None:
+                self.cprofile.dump_stats(path.rsplit('.', 1)[0] + '.prof')
+        except OSError:
+            return False
+        return True
+
+@contextlib.contextmanager
+def profiling(profiler):
+    # Makes profiler the active one for the block; profiler may be None.
+    global _active
+    if profiler is None:
+        yield None
+        return
+    previous = _active
+    _active = profiler
+    started_tracing = profiler.trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if profiler.cprofile is not None:
+        profiler.cprofile.enable()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield profiler
+    finally:
+        profiler._wall += time.perf_counter() - wall_start
+        profiler._cpu += time.process_time() - cpu_start
+        if profiler.cprofile is not None:
+            profiler.cprofile.disable()
+        if started_tracing:
+            tracemalloc.stop()
+        _active = previous
+
+def config_profiler(config):
+    # The Profiler a run with this config should use, or None.
+    if not config.get('profile', False):
+        return None
+    return Profiler(config.get('profile_memory', False), config.get('profile_cprofile', False))
+
+def profile_stage(name, exclude=()):
+    # Stage of the active profiler, or a no-op block.
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name, exclude)
+
+def profiled(iterable, name, inner=None):
+    # iterable timed as stage name of the active profiler, or iterable itself.
+    if _active is None:
+        return iterable
+    return _active.timed(name, iterable, inner)
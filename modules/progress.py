@@ -0,0 +1,108 @@
+import time
+
+from .analyzer_common import format_number
+
+# Progress of an analysis. The aggregates report the number of processed messages every 1000
+# messages; Progress only looks at the clock then and passes a snapshot on at most every
+# interval seconds, so the message loop pays one perf_counter() per 1000 messages.
+# How far along the run is comes from the bytes of the export read so far when the messages
+# are streamed (track), or from the number of messages when it is known up front (expect).
+
+# Seconds between two snapshots.
+PROGRESS_INTERVAL = 0.5
+
+class Progress:
+    def __init__(self, callback, interval=PROGRESS_INTERVAL):
+        # callback(snapshot) gets the dicts described in snapshot().
+        self.callback = callback
+        self.interval = interval
+        self._position = None
+        self._start_bytes = 0
+        self.total_bytes = None
+        self.total_messages = None
+        self._start_time = time.perf_counter()
+        self._next_time = self._start_time + interval
+
+    def track(self, position, total_bytes, start_bytes=0):
+        # position() is the number of bytes of the export read so far, out of total_bytes;
+        # the run starts at start_bytes.
+        self._position = position
+        self.total_bytes = total_bytes
+        self._start_bytes = start_bytes
+        self.total_messages = None
+
+    def expect(self, total_messages):
+        # The run processes total_messages messages.
+        self.total_messages = total_messages
+        self._position = None
+        self.total_bytes = None
+
+    def __call__(self, messages, final=False):
+        now = time.perf_counter()
+        if now < self._next_time and not final:
+            return
+        self._next_time = now + self.interval
+        self.callback(self.snapshot(messages, now, final))
+
+    def snapshot(self, messages, now=None, final=False):
+        # messages: processed so far; bytes_read / total_bytes: of the export file, None when
+        # the run is not tracked by bytes; fraction and eta_seconds: None when unknown.
+        elapsed = (now or time.perf_counter()) - self._start_time
+        bytes_read = self._position() if self._position is not None else None
+        fraction = None
+        if final:
+            fraction = 1.0
+        elif bytes_read is not None and self.total_bytes and self.total_bytes > self._start_bytes:
+            fraction = (bytes_read - self._start_bytes) / (self.total_bytes - self._start_bytes)
+        elif self.total_messages:
+            fraction = messages / self.total_messages
+        if fraction is not None:
+            fraction = min(max(fraction, 0.0), 1.0)
+        eta = None
+        if fraction is not None and fraction > 0 and elapsed > 0:
+            eta = elapsed * (1 - fraction) / fraction
+        return {
+            'messages': messages,
+            'bytes_read': bytes_read,
+            'total_bytes': self.total_bytes,
+            'fraction': fraction,
+            'elapsed_seconds': elapsed,
+            'messages_per_second': messages / elapsed if elapsed > 0 else 0.0,
+            'bytes_per_second': (bytes_read - self._start_bytes) / elapsed if bytes_read is not None and elapsed > 0 else None,
+            'eta_seconds': eta,
+            'final': final,
+        }
+
+def format_duration(seconds):
+    # 'm:ss', or 'h:mm:ss' from an hour on.
+    seconds = int(seconds + 0.5)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+def console_progress(current_texts, interval=PROGRESS_INTERVAL):
+    # Progress that redraws one console line: percent, MB/s, messages/s and ETA when the total
+    # is known, otherwise a spinner with the number of processed messages.
+    spinner = ['|', '/', '-', '\\']
+    spinner_index = 0
+    width = 0
+
+    def draw(snapshot):
+        nonlocal spinner_index, width
+        messages = format_number(snapshot['messages'])
+        rate = format_number(snapshot['messages_per_second'])
+        if snapshot['final']:
+            line = current_texts['processing_done'].format(messages, format_duration(snapshot['elapsed_seconds']), rate)
+        elif snapshot['fraction'] is not None:
+            speed = snapshot['bytes_per_second']
+            mb_per_second = f"{speed / (1024 * 1024):.1f}" if speed is not None else '—'
+            eta = format_duration(snapshot['eta_seconds']) if snapshot['eta_seconds'] is not None else '—'
+            line = current_texts['processing_progress'].format(snapshot['fraction'] * 100, messages, mb_per_second, rate, eta)
+        else:
+            line = current_texts['processing'].format(messages, spinner[spinner_index % len(spinner)])
+            spinner_index += 1
+        # Padded to the previous line, which \r does not clear.
+        print(line.ljust(width), end='\r', flush=True)
+        width = len(line)
+
+    return Progress(draw, interval)
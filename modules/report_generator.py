@@ -39,6 +39,22 @@ def generate_text_report(analysis_results, config, current_texts, output_filenam
                     return f"{target_months[m_idx].capitalize()} {year_str}"
         return m
 
+    # The analyzers count weekdays by weekday() and months by year * 12 + month - 1; the names are
+    # only built here, in the language the analysis ran in.
+    language = analysis_results.get('language', 'en')
+    day_names = config['day_names'].get(language, config['day_names']['en'])
+    month_names = config['month_names'].get(language, config['month_names']['en'])
+
+    def day_label(day):
+        return day_names[day] if isinstance(day, int) else day
+
+    def month_label(month):
+        return f"{month_names[month % 12]} {month // 12}" if isinstance(month, int) else month
+
+    def numeric_month_label(month):
+        # Channel posts by month, as strftime('%Y-%m') used to key them.
+        return f"{month // 12}-{month % 12 + 1:02d}" if isinstance(month, int) else month
+
     first_date = analysis_results.get('first_date', None)
     last_date = analysis_results.get('last_date', None)
     date_range_str = ''
@@ -98,7 +114,7 @@ def generate_text_report(analysis_results, config, current_texts, output_filenam
             if posts_by_date:
                 f.write(current_texts['posts_by_month_and_author'] + "\n")
                 for month, authors_cnt in posts_by_date.items():
-                    f.write(f"{month}:\n")
+                    f.write(f"{numeric_month_label(month)}:\n")
                     for author, cnt in authors_cnt.items():
                         f.write(f"  {author}: {format_number(cnt)}\n")
                 f.write("\n")
@@ -182,14 +198,20 @@ def generate_text_report(analysis_results, config, current_texts, output_filenam
             if top_posts:
                 f.write(current_texts['top_posts_by_reactions'] + "\n")
                 rank = 1
-                for mid, rcount in top_posts[:10]:
-                    f.write(f"{rank}. message_id {mid}: {format_number(rcount)}\n")
+                for mid, rcount, post_date, author, preview in top_posts:
+                    details = [post_date.strftime('%d.%m.%Y %H:%M')] if post_date else []
+                    details.append(str(author))
+                    f.write(f"{rank}. message_id {mid} ({', '.join(details)}): {format_number(rcount)}\n")
+                    if preview:
+                        f.write(f"   {preview}\n")
                     rank += 1
                 f.write("\n")
 
         w_emoji = config['emojis'].get('word', '')
         f.write(w_emoji + " " + current_texts['top_words'] + ":\n")
         rank = 1
+        if analysis_results.get('common_words_error'):
+            f.write(current_texts['approximate_counts_note'].format(format_number(analysis_results['common_words_error'])) + "\n")
         for wval, freq in analysis_results['common_words']:
             f.write(f"{rank}. {wval}: {format_number(freq)}\n")
             rank += 1
@@ -198,11 +220,24 @@ def generate_text_report(analysis_results, config, current_texts, output_filenam
         ph_emoji = config['emojis'].get('phrase', '')
         f.write(ph_emoji + " " + current_texts['top_phrases'] + ":\n")
         rank = 1
+        if analysis_results.get('common_phrases_error'):
+            f.write(current_texts['approximate_counts_note'].format(format_number(analysis_results['common_phrases_error'])) + "\n")
         for phrase, freq in analysis_results['common_phrases']:
             f.write(f"{rank}. {phrase}: {format_number(freq)}\n")
             rank += 1
         f.write("\n")
 
+        for key, emoji_key in (('top_profanity', 'profanity'), ('top_mentions', 'mention'), ('top_hashtags', 'hashtag')):
+            top_list = analysis_results.get(key)
+            if not top_list:
+                continue
+            f.write(config['emojis'].get(emoji_key, '') + " " + current_texts[key] + ":\n")
+            rank = 1
+            for word, freq in top_list:
+                f.write(f"{rank}. {word}: {format_number(freq)}\n")
+                rank += 1
+            f.write("\n")
+
         a_emoji = config['emojis'].get('activity', '')
         f.write(a_emoji + " " + current_texts['activity'] + ":\n")
         activity_data = analysis_results['activity']
@@ -212,30 +247,32 @@ def generate_text_report(analysis_results, config, current_texts, output_filenam
         ])
         f.write(hours_str + "\n")
 
+        weekday_labels = [day_label(weekday) for weekday, _ in activity_data['weekdays']]
         localized_weekdays = []
         if day_localization:
             ru_days = current_texts['day_names']['ru']
             lang_keys = list(current_texts['day_names'].keys())
             current_lang = 'en' if 'en' in lang_keys else lang_keys[0]
             target_days = current_texts['day_names'].get(current_lang, ru_days)
-            for weekday, _ in activity_data['weekdays']:
+            for weekday in weekday_labels:
                 if weekday in ru_days:
                     idx = ru_days.index(weekday)
                     localized_weekdays.append(f"{config['emojis'].get('list_item', '')} {target_days[idx]}")
                 else:
                     localized_weekdays.append(f"{config['emojis'].get('list_item', '')} {weekday}")
         else:
-            for weekday, _ in activity_data['weekdays']:
+            for weekday in weekday_labels:
                 localized_weekdays.append(f"{config['emojis'].get('list_item', '')} {weekday}")
         f.write(', '.join(localized_weekdays) + "\n")
 
+        month_labels = [month_label(month) for month, _ in activity_data['months']]
         localized_months = []
         if month_localization:
             ru_months = current_texts['month_names']['ru']
             lang_keys = list(current_texts['month_names'].keys())
             current_lang = 'en' if 'en' in lang_keys else lang_keys[0]
             target_months = current_texts['month_names'].get(current_lang, ru_months)
-            for m, _ in activity_data['months']:
+            for m in month_labels:
                 parts = m.split()
                 if len(parts) == 2:
                     month_ru = parts[0]
@@ -248,7 +285,7 @@ def generate_text_report(analysis_results, config, current_texts, output_filenam
                 else:
                     localized_months.append(f"{config['emojis'].get('list_item', '')} {m}")
         else:
-            for m, _ in activity_data['months']:
+            for m in month_labels:
                 localized_months.append(f"{config['emojis'].get('list_item', '')} {m}")
         f.write(', '.join(localized_months) + "\n")
 
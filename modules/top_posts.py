@@ -0,0 +1,59 @@
+import heapq
+
+# Characters of a post's text kept for the report.
+PREVIEW_LENGTH = 80
+
+def text_preview(text, length=PREVIEW_LENGTH):
+    # text on one line, cut to length characters.
+    text = ' '.join(text.split())
+    return text if len(text) <= length else text[:length - 1].rstrip() + '…'
+
+class TopPosts:
+    # The capacity posts with the most reactions, in a min-heap of
+    # (reactions, -order, (message_id, reactions, date, author, preview)), where order counts the
+    # posts offered so far. The least-reacted kept post sits at heap[0], so a post that cannot
+    # make the list costs one comparison and its preview is never built. On equal reactions the
+    # earlier post wins, as in a stable sort of all posts.
+    # Posts without reactions are not kept. author is an AuthorRegistry key.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.heap = []
+        self.seen = 0
+
+    def add(self, reactions, message_id, date, author, text):
+        self.seen += 1
+        heap = self.heap
+        if reactions <= 0 or self.capacity <= 0:
+            return
+        if len(heap) < self.capacity:
+            heapq.heappush(heap, (reactions, -self.seen, (message_id, reactions, date, author, text_preview(text))))
+        elif reactions > heap[0][0]:
+            heapq.heapreplace(heap, (reactions, -self.seen, (message_id, reactions, date, author, text_preview(text))))
+
+    def update(self, other):
+        # Adds the posts of the chunk that follows this one.
+        heap = self.heap
+        for reactions, order, post in other.heap:
+            entry = (reactions, order - self.seen, post)
+            if len(heap) < self.capacity:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        self.seen += other.seen
+
+    def rekeyed(self, keys):
+        # Copy with the authors mapped through keys (from AuthorRegistry.merge).
+        result = TopPosts(self.capacity)
+        result.heap = [(reactions, order, (message_id, count, date, keys[author], preview))
+                       for reactions, order, (message_id, count, date, author, preview) in self.heap]
+        result.seen = self.seen
+        return result
+
+    def most_common(self, names=None):
+        # [(message_id, reactions, date, author, preview)], most reactions first; authors are
+        # names[key] when names is given.
+        posts = [post for _, _, post in sorted(self.heap, reverse=True)]
+        if names is not None:
+            posts = [(message_id, reactions, date, names[author], preview)
+                     for message_id, reactions, date, author, preview in posts]
+        return posts
@@ -1,5 +1,21 @@
+import os
+import sys
+
+import matplotlib
+import numpy as np
+
+# This module is only imported when a plot is made, so matplotlib stays out of the runs that
+# make none. The plots are only saved to files: unless the backend was chosen already (MPLBACKEND,
+# or a program embedding the analysis that uses pyplot itself), the non-GUI Agg backend is used
+# and matplotlib does not probe for a GUI toolkit.
+if 'matplotlib.pyplot' not in sys.modules and not os.environ.get('MPLBACKEND'):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
+from .daily_series import day_dates, day_years
+
+# The per-day results are DailySeries / DailyUserSeries: each year is a slice of their arrays.
+
 def generate_personal_chat_plots(analysis_results, plot_filename_template, config, current_texts):
     if 'daily_user_messages' not in analysis_results:
         return
@@ -8,11 +24,12 @@ def generate_personal_chat_plots(analysis_results, plot_filename_template, confi
     daily_user_non_consecutive_messages = analysis_results['daily_user_non_consecutive_messages']
     daily_first_sender = analysis_results['daily_first_sender']
 
-    all_dates = sorted(daily_user_messages.keys())
-    if not all_dates:
+    all_days = daily_user_messages.ordinals()
+    if not len(all_days):
         return
 
-    years = sorted(set(date.year for date in all_dates))
+    all_dates = day_dates(all_days)
+    all_years = day_years(all_days)
     participants = list(analysis_results['user_counts'].keys())
     if len(participants) != 2:
         return
@@ -20,22 +37,21 @@ def generate_personal_chat_plots(analysis_results, plot_filename_template, confi
     chat_name = analysis_results.get('chat_name', current_texts.get('no_name','Chat'))
     use_non_consecutive = config.get('plot_non_consecutive_messages', False)
     plot_data = daily_user_non_consecutive_messages if use_non_consecutive else daily_user_messages
+    user1_all, user2_all = plot_data.rows([user1, user2], all_days)
 
-    for year in years:
-        dates = [date for date in all_dates if date.year == year]
-        if not dates:
-            continue
-        user1_counts = [plot_data[date].get(user1, 0) for date in dates]
-        user2_counts = [plot_data[date].get(user2, 0) for date in dates]
+    for year in np.unique(all_years).tolist():
+        in_year = all_years == year
+        dates = all_dates[in_year]
+        user1_counts = user1_all[in_year]
+        user2_counts = user2_all[in_year]
 
         fig, ax = plt.subplots(figsize=(12, 6))
         ax.plot(dates, user1_counts, label=user1, linewidth=2, alpha=0.7)
         ax.plot(dates, user2_counts, label=user2, linewidth=2, alpha=0.7)
 
-        combined = user1_counts + user2_counts
-        max_count = max(combined) if combined else 1
+        max_count = max(user1_counts.max(), user2_counts.max())
         triangle_y = max_count * 1.05
-        first_sender_dates = [d for d in dates if d in daily_first_sender]
+        first_sender_dates = sorted(d for d in daily_first_sender if d.year == year)
         sender_colors = ['blue' if daily_first_sender[d] == user1 else 'orange' for d in first_sender_dates]
         ax.scatter(first_sender_dates, [triangle_y]*len(first_sender_dates), color=sender_colors, marker='^', s=50, zorder=5)
 
@@ -54,20 +70,20 @@ def generate_personal_chat_plots(analysis_results, plot_filename_template, confi
         plt.close()
 
 def generate_group_chat_plots(analysis_results, plot_filename_template, config, current_texts):
-    date_messages = analysis_results.get('date_messages', {})
-    all_dates = sorted(date_messages.keys())
-    if not all_dates:
+    date_messages = analysis_results.get('date_messages')
+    if not date_messages:
         return
 
-    years = sorted(set(date.year for date in all_dates))
-    all_daily_counts = [date_messages[date] for date in all_dates]
-    max_daily_messages = max(all_daily_counts) if all_daily_counts else 1
+    all_days = date_messages.ordinals()
+    all_dates = day_dates(all_days)
+    all_years = day_years(all_days)
+    all_daily_counts = date_messages.totals(all_days)
+    max_daily_messages = all_daily_counts.max()
 
-    for year in years:
-        dates = [d for d in all_dates if d.year == year]
-        if not dates:
-            continue
-        daily_counts = [date_messages[d] for d in dates]
+    for year in np.unique(all_years).tolist():
+        in_year = all_years == year
+        dates = all_dates[in_year]
+        daily_counts = all_daily_counts[in_year]
 
         fig, ax = plt.subplots(figsize=(12, 6))
         ax.plot(dates, daily_counts, linewidth=2, alpha=0.7)
@@ -84,20 +100,23 @@ def generate_group_chat_plots(analysis_results, plot_filename_template, config,
         plt.close()
 
 def generate_channel_plots(analysis_results, plot_filename_template, config, current_texts):
-    date_messages = analysis_results.get('date_messages', {})
-    reactions_by_date = analysis_results.get('reactions_by_date', {})
-    all_dates = sorted(set(date_messages.keys()) | set(reactions_by_date.keys()))
-    if not all_dates:
+    date_messages = analysis_results.get('date_messages')
+    reactions_by_date = analysis_results.get('reactions_by_date')
+    if not date_messages and not reactions_by_date:
         return
 
-    years = sorted(set(d.year for d in all_dates))
-
-    for year in years:
-        dates = [d for d in all_dates if d.year == year]
-        if not dates:
-            continue
-        daily_posts = [date_messages.get(d, 0) for d in dates]
-        daily_reactions = [reactions_by_date.get(d, 0) for d in dates]
+    all_days = np.union1d(date_messages.ordinals() if date_messages else [],
+                          reactions_by_date.ordinals() if reactions_by_date else []).astype(np.int64)
+    all_dates = day_dates(all_days)
+    all_years = day_years(all_days)
+    all_posts = date_messages.totals(all_days) if date_messages else np.zeros(len(all_days), dtype=np.int64)
+    all_reactions = reactions_by_date.totals(all_days) if reactions_by_date else np.zeros(len(all_days), dtype=np.int64)
+
+    for year in np.unique(all_years).tolist():
+        in_year = all_years == year
+        dates = all_dates[in_year]
+        daily_posts = all_posts[in_year]
+        daily_reactions = all_reactions[in_year]
 
         fig, ax1 = plt.subplots(figsize=(12,6))
         ax1.plot(dates, daily_posts, color='tab:blue', linewidth=2, alpha=0.7, label=current_texts.get('posts_count_label','Posts'))
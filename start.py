@@ -2,22 +2,25 @@ import sys
 import os
 import time
 import datetime
-from collections import Counter, defaultdict
 import locale
 
 import config
-from modules.data_loader import load_json_file_streaming, merge_json_files
-from modules.analyzer_common import load_json_header
-from modules.analyzer_chats import analyze_messages as analyze_chats
-from modules.analyzer_channels import analyze_channel
-from modules.report_generator import generate_text_report, generate_json_report
-from modules.visualization import generate_personal_chat_plots, generate_group_chat_plots
+from modules.analyzer_common import ExportReader
+from modules.json_backend import select_backend
 from modules.config_handler import configure_in_console, save_config_to_file
+from modules.profiler import config_profiler, profile_stage, profiling
+from modules.api import AUTHOR_GITHUB_LINK, AUTHOR_TELEGRAM_CHANNEL
+from modules.locales import available_languages, load_texts
+
+# The menu only needs the modules above; each action imports the rest when it runs. The merge
+# does not load the analyzers and numpy, and matplotlib is only loaded to draw a plot
+# (benchmarks/bench_startup.py times every path).
 
 def main():
-    author_github_link = 'https://github.com/TheTeslak/TesTeleStat'
-    author_telegram_channel = 'https://t.me/TesNot'
+    author_github_link = AUTHOR_GITHUB_LINK
+    author_telegram_channel = AUTHOR_TELEGRAM_CHANNEL
     version = "Version 1.3"
+    json_backend = select_backend(getattr(config, 'json_backend', 'auto'))
 
     try:
         locale.setlocale(locale.LC_ALL, '')
@@ -26,25 +29,12 @@ def main():
     except:
         language_code = 'en'
 
-    locales_dir = os.path.join(os.path.dirname(__file__), 'locales')
-    available_languages = []
-    for filename in os.listdir(locales_dir):
-        if filename.endswith('.py'):
-            lang_code = os.path.splitext(filename)[0]
-            available_languages.append(lang_code)
-
-    if language_code in available_languages:
-        current_language_index = available_languages.index(language_code)
+    languages = available_languages()
+    if language_code in languages:
+        current_language_index = languages.index(language_code)
     else:
-        current_language_index = available_languages.index('en') if 'en' in available_languages else 0
-    language = available_languages[current_language_index]
-
-    def load_texts(language_code):
-        lang_module = {}
-        lang_file = os.path.join(locales_dir, f'{language_code}.py')
-        with open(lang_file, 'r', encoding='utf-8') as f:
-            exec(f.read(), lang_module)
-        return lang_module['texts']
+        current_language_index = languages.index('en') if 'en' in languages else 0
+    language = languages[current_language_index]
 
     current_texts = load_texts(language)
 
@@ -69,13 +59,17 @@ def main():
             choice = '1'
 
         if choice == '0':
-            current_language_index = (current_language_index + 1) % len(available_languages)
-            language = available_languages[current_language_index]
+            current_language_index = (current_language_index + 1) % len(languages)
+            language = languages[current_language_index]
             current_texts = load_texts(language)
             continue
         elif choice == '3':
+            from modules.data_loader import merge_json_files
+            from modules.analyzer_parallel import worker_count
+
             start_time = time.time()
-            merged = merge_json_files(config.merge_folder, config.input_file, current_texts)
+            merged = merge_json_files(config.merge_folder, config.input_file, current_texts, backend=json_backend,
+                                      workers=worker_count(getattr(config, 'analysis_workers', 1)))
             elapsed_time = time.time() - start_time
             if merged:
                 print(current_texts['processing_completed'].format(elapsed_time, config.input_file))
@@ -84,6 +78,8 @@ def main():
         elif choice == '1' or choice == '2':
             save_json = True if choice == '2' else False
             input_file = config.input_file
+            # Set up before the header is read, so its settings come from config.py.
+            profiler = config_profiler(vars(config))
             try:
                 file_size_bytes = os.path.getsize(input_file)
                 file_size_mb = file_size_bytes / (1024 * 1024)
@@ -92,15 +88,23 @@ def main():
                     print(current_texts['file_size_warning'].format(round(file_size_mb, 2)))
                 elif file_size_gb >= 1:
                     print(current_texts['file_size_large_warning'].format(round(file_size_gb, 2)))
-                header_data = load_json_file_streaming(input_file, header_only=True)
-                if not header_data:
-                    print(current_texts['invalid_json'])
-                    input(current_texts.get('press_enter_to_return', 'Press Enter to return to the main menu...'))
-                    continue
+                # The reader is kept open and handed to the analyzer, so the export is scanned once.
+                with profiling(profiler), profile_stage('header'):
+                    reader = ExportReader(input_file, json_backend)
+                    header_data = reader.complete_header()
             except FileNotFoundError:
                 print(current_texts['file_not_found'].format(input_file))
                 input(current_texts.get('press_enter_to_return', 'Press Enter to return to the main menu...'))
                 continue
+            except:
+                reader = None
+                header_data = None
+            if not header_data:
+                if reader is not None:
+                    reader.close()
+                print(current_texts['invalid_json'])
+                input(current_texts.get('press_enter_to_return', 'Press Enter to return to the main menu...'))
+                continue
 
             chat_type = header_data.get('type', 'group')
             is_personal_chat = (chat_type == 'personal_chat')
@@ -116,6 +120,7 @@ def main():
                 if save_config_choice in ('y', 'д'):
                     save_config_to_file(temp_config)
             else:
+                reader.close()
                 continue
 
             date_range_input = input(current_texts.get('date_range_prompt')).strip()
@@ -136,17 +141,24 @@ def main():
                     end_date = None
 
             print(current_texts['start_analysis'])
+            print(current_texts['json_backend_active'].format(reader.backend))
             start_time = time.time()
 
             if chat_type in ['public_channel', 'private_channel']:
-                analysis_results, error_info = analyze_channel(
-                    input_file, temp_config, current_texts, start_date=start_date, end_date=end_date, language=language
-                )
+                from modules.analyzer_channels import analyze_channel
             else:
-                analysis_results, error_info = analyze_chats(
-                    input_file, temp_config, current_texts, is_personal_chat, use_streaming=True,
-                    start_date=start_date, end_date=end_date, language=language
-                )
+                from modules.analyzer_chats import analyze_messages as analyze_chats
+            with profiling(profiler), profile_stage('analyze'):
+                if chat_type in ['public_channel', 'private_channel']:
+                    analysis_results, error_info = analyze_channel(
+                        reader, temp_config, current_texts, start_date=start_date, end_date=end_date, language=language,
+                        use_streaming=True
+                    )
+                else:
+                    analysis_results, error_info = analyze_chats(
+                        reader, temp_config, current_texts, is_personal_chat, use_streaming=True,
+                        start_date=start_date, end_date=end_date, language=language
+                    )
 
             if not analysis_results.get('total_messages', 0):
                 if start_date and end_date:
@@ -164,28 +176,40 @@ def main():
             timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
             output_filename = temp_config['output_filename_pattern'].replace('<chat_name>', chat_name).replace('<timestamp>', timestamp)
 
-            generate_text_report(analysis_results, temp_config, current_texts, output_filename, author_github_link, author_telegram_channel, is_personal_chat=(chat_type=='personal_chat'))
+            from modules.report_generator import generate_text_report, generate_json_report
+            with profiling(profiler), profile_stage('text_report'):
+                generate_text_report(analysis_results, temp_config, current_texts, output_filename, author_github_link, author_telegram_channel, is_personal_chat=(chat_type=='personal_chat'))
             if save_json:
                 json_output_filename = output_filename.replace('.txt', '.json')
-                generate_json_report(analysis_results, json_output_filename)
+                with profiling(profiler), profile_stage('json_report'):
+                    generate_json_report(analysis_results, json_output_filename)
 
             if chat_type == 'personal_chat':
+                from modules.visualization import generate_personal_chat_plots
                 plot_filename_template = output_filename.replace('.txt', '_plot_<year>.png')
-                generate_personal_chat_plots(analysis_results, plot_filename_template, temp_config, current_texts)
-                years = sorted(set(date.year for date in analysis_results['daily_user_messages'].keys()))
+                with profiling(profiler), profile_stage('plots'):
+                    generate_personal_chat_plots(analysis_results, plot_filename_template, temp_config, current_texts)
+                years = analysis_results['daily_user_messages'].years()
                 for year in years:
                     plot_filename = plot_filename_template.replace('<year>', str(year))
                     print(current_texts['communication_graph_saved'].format(plot_filename))
             elif chat_type not in ['public_channel', 'private_channel']:
+                from modules.visualization import generate_group_chat_plots
                 plot_filename_template = output_filename.replace('.txt', '_group_plot_<year>.png')
-                generate_group_chat_plots(analysis_results, plot_filename_template, temp_config, current_texts)
-                years = sorted(set(date.year for date in analysis_results['date_messages'].keys()))
+                with profiling(profiler), profile_stage('plots'):
+                    generate_group_chat_plots(analysis_results, plot_filename_template, temp_config, current_texts)
+                years = analysis_results['date_messages'].years()
                 for year in years:
                     plot_filename = plot_filename_template.replace('<year>', str(year))
                     print(current_texts['communication_graph_saved'].format(plot_filename))
 
             elapsed_time = time.time() - start_time
             print(current_texts['processing_completed'].format(elapsed_time, output_filename))
+            if profiler is not None:
+                profile_filename = output_filename.replace('.txt', '_profile.json')
+                if profiler.save(profile_filename, input_file=input_file, chat_type=chat_type,
+                                 messages=analysis_results['total_messages']):
+                    print(current_texts['profile_saved'].format(profile_filename))
 
             errors, unprocessed_messages, total_messages = error_info['errors'], error_info['unprocessed_messages'], analysis_results['total_messages']
             if unprocessed_messages > 0:
@@ -213,4 +237,9 @@ def main():
             continue
 
 if __name__ == "__main__":
+    # With export paths on the command line the analysis runs headless (modules/batch.py).
+    if len(sys.argv) > 1:
+        from modules import batch
+        sys.exit(batch.main(sys.argv[1:], config, load_texts, available_languages(),
+                            (AUTHOR_GITHUB_LINK, AUTHOR_TELEGRAM_CHANNEL)))
     main()
\ No newline at end of file